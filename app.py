@@ -1,20 +1,48 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import folium
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from folium.plugins import MeasureControl, Fullscreen, Draw, MousePosition
+from streamlit_folium import st_folium
 import matplotlib.pyplot as plt
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import json
-import re
 import os
-import unicodedata
+import time
+
+import perf
+
+from geometria import SIMPLIFY_LEVELS, encode_compact, point_coords, simplify_geojson
+from mapas import (
+    POINT_MODES, CompactGeoJson, DensityGrid, MapHtmlCache, density_levels, fit_zoom, level_for_zoom,
+    obras_point_layer, vector_tile_layer,
+)
+from registro import GROUPS, LAYER_BY_KEY, LAYERS, SHAPE_KINDS, group_layers, page_layers
+from tiles import TileSet, start_in_background
+from publicar import StaticAtlas
+from obras import (
+    INTERNAL_COLS as OBRAS_INTERNAL_COLS, ObrasCube, ObrasIndex, ObrasRegistry, parse_br_number, parse_decimal,
+)
+from exportar import (
+    FORMATS, ExportCache, FrameFeatures, write_csv, write_geojson, write_kml, write_pdf, write_shapefile,
+)
+from camadas import (
+    DATA_DIR_CANDIDATES, DISTRICT_FILE, DistrictJoin, LayerStore, content_version, data_files, data_version,
+    layer_info, properties_frame, tooltip_fields,
+)
+
+# Detalhe de polígonos e linhas no mapa
+GEOM_DETAIL = {"auto": "Automático (pelo zoom)", "alta": "Alta", "media": "Média", "baixa": "Baixa"}
 
 # =====================================================
 # Configuração inicial com tema moderno
 # =====================================================
+# Tempos por etapa deste rerun (lidos pelo benchmark.py e pelo painel ?debug=perf)
+st.session_state["perf"] = perf.start()
+
 # Estado inicial
 if 'page' not in st.session_state:
     st.session_state.page = 'home'
@@ -35,6 +63,8 @@ def _qp_get(name, default=None):
 
 qp_page = _qp_get('page')
 qp_tab  = _qp_get('tab')
+# ?debug=perf mostra os tempos do rerun no fim da página e grava a linha de log (perf.log)
+PERF_DEBUG = _qp_get('debug') == 'perf'
 if qp_page:
     st.session_state.page = qp_page
 if qp_tab:
@@ -162,6 +192,22 @@ def css_global():
                 color: white !important;
                 box-shadow: 0 4px 12px rgba(30, 58, 138, 0.3);
             }}
+            /* Navegação entre seções com a mesma aparência das abas */
+            .st-key-nav_tabs [role="radiogroup"] {{ gap: 8px; }}
+            .st-key-nav_tabs [role="radiogroup"] label {{
+                border-radius: 12px 12px 0 0;
+                padding: 1rem 2rem;
+                font-weight: 600;
+                color: {COLORS["text_light"]};
+                transition: all 0.3s ease;
+            }}
+            .st-key-nav_tabs [role="radiogroup"] label > div:first-child {{ display: none; }}
+            .st-key-nav_tabs [role="radiogroup"] label:has(input:checked) {{
+                background: {COLORS["primary"]};
+                color: white;
+                box-shadow: 0 4px 12px rgba(30, 58, 138, 0.3);
+            }}
+            .st-key-nav_tabs [role="radiogroup"] label:has(input:checked) p {{ color: white; }}
 
             .css-1d391kg, .css-1lcbmhc {{
                 background: {COLORS["sidebar_bg"]} !important;
@@ -456,23 +502,14 @@ def render_card(title_html: str, body_html: str):
 def create_sidebar():
     if st.session_state.page == 'home':
         return {
-            "show_distritos": False,
-            "show_sede": False,
-            "show_localidades": False,
-            "show_estradas": False,
-            "show_urbanas": False,
-            "show_escolas": False,
-            "show_unidades_saude": False,
-            "show_obras": False,
-            "show_tecnologias": False,
-            "show_pocos_cidade": False,
-            "show_pocos_rural": False,
-            "show_espelhos": False,
-            "show_outorgas": False,
+            **{layer.state_key: False for layer in LAYERS},
             "enable_measure": False,
             "enable_draw": False,
             "enable_fullscreen": False,
-            "show_coords": False
+            "show_coords": False,
+            "point_mode": "cluster",
+            "geom_detail": "auto",
+            "distrito": ""
         }
 
     with st.sidebar:
@@ -492,30 +529,32 @@ def create_sidebar():
         unsafe_allow_html=True
     )
 
-        with st.expander("🗾 Território", expanded=True):
-            show_distritos   = st.checkbox("Distritos", True, key="sidebar_distritos")
-            show_sede        = st.checkbox("Sede Distritos", True, key="sidebar_sede")
-            show_localidades = st.checkbox("Localidades", False, key="sidebar_localidades")
-            show_estradas    = st.checkbox("Estradas", False, key="sidebar_estradas")
-            show_urbanas     = st.checkbox("Áreas Urbanas", False, key="sidebar_urbanas")
-
-        with st.expander("🏗️ Infraestrutura", expanded=True):
-            show_escolas          = st.checkbox("Escolas Públicas", False, key="sidebar_escolas")
-            show_unidades_saude   = st.checkbox("Unidades de Saúde", False, key="sidebar_unidades_saude")
-            show_obras            = st.checkbox("Obras Municipais", True, key="sidebar_obras")
-
-        with st.expander("💧 Recursos Hídricos", expanded=False):
-            show_tecnologias   = st.checkbox("Tecnologias Sociais", False, key="sidebar_tecnologias")
-            show_pocos_cidade  = st.checkbox("Poços Cidade", False, key="sidebar_pocos_cidade")
-            show_pocos_rural   = st.checkbox("Poços Rural", False, key="sidebar_pocos_rural")
-            show_espelhos      = st.checkbox("Espelhos d'Água", False, key="sidebar_espelhos")
-            show_outorgas      = st.checkbox("Outorgas Vigentes", False, key="sidebar_outorgas")
+        join = get_district_index()
+        distritos = {} if join is None else dict(zip(join.districts["CD_DIST"], join.districts["NM_DIST"]))
+        distrito = st.selectbox(
+            "📍 Distrito", options=["", *distritos], format_func=lambda c: distritos.get(c, "Todos os distritos"),
+            key="sidebar_distrito"
+        )
+
+        # Uma seção por grupo do registro de camadas (registro.py)
+        shown = {}
+        for group, (title, expanded) in GROUPS.items():
+            with st.expander(title, expanded=expanded):
+                for layer in group_layers(group):
+                    shown[layer.state_key] = st.checkbox(layer.label, layer.default, key=layer.widget_key)
 
         with st.expander("⚙️ Ferramentas", expanded=False):
             enable_measure     = st.checkbox("Medir", True, key="sidebar_measure")
             enable_draw        = st.checkbox("Desenhar", True, key="sidebar_draw")
             enable_fullscreen  = st.checkbox("Tela Cheia", True, key="sidebar_fullscreen")
             show_coords        = st.checkbox("Coordenadas", True, key="sidebar_coords")
+            point_mode         = st.selectbox(
+                "Pontos", options=list(POINT_MODES), format_func=POINT_MODES.get, key="sidebar_point_mode"
+            )
+            geom_detail        = st.selectbox(
+                "Detalhe das geometrias", options=list(GEOM_DETAIL), format_func=GEOM_DETAIL.get,
+                key="sidebar_geom_detail"
+            )
 
         # Espaço flexível para empurrar o botão para baixo
         st.markdown("<div style='flex-grow: 1;'></div>", unsafe_allow_html=True)
@@ -532,55 +571,156 @@ def create_sidebar():
         st.markdown("</div>", unsafe_allow_html=True)
 
     return {
-        "show_distritos": show_distritos,
-        "show_sede": show_sede,
-        "show_localidades": show_localidades,
-        "show_estradas": show_estradas,
-        "show_urbanas": show_urbanas,
-        "show_escolas": show_escolas,
-        "show_unidades_saude": show_unidades_saude,
-        "show_obras": show_obras,
-        "show_tecnologias": show_tecnologias,
-        "show_pocos_cidade": show_pocos_cidade,
-        "show_pocos_rural": show_pocos_rural,
-        "show_espelhos": show_espelhos,
-        "show_outorgas": show_outorgas,
+        **shown,
         "enable_measure": enable_measure,
         "enable_draw": enable_draw,
         "enable_fullscreen": enable_fullscreen,
-        "show_coords": show_coords
+        "show_coords": show_coords,
+        "point_mode": point_mode,
+        "geom_detail": geom_detail,
+        "distrito": distrito
     }
 # =====================================================
 # Funções utilitárias
 # =====================================================
-def autodetect_coords(df: pd.DataFrame):
-    candidates_lat = [c for c in df.columns if re.search(r"(?:^|\b)(lat|latitude|y)(?:\b|$)", c, re.I)]
-    candidates_lon = [c for c in df.columns if re.search(r"(?:^|\b)(lon|long|longitude|x)(?:\b|$)", c, re.I)]
-    if candidates_lat and candidates_lon:
-        return candidates_lat[0], candidates_lon[0]
-    for c in df.columns:
-        if re.search(r"coord|coordenad", c, re.I):
-            try:
-                tmp = df[c].astype(str).str.extract(r"(-?\d+[\.,]?\d*)\s*[,;]\s*(-?\d+[\.,]?\d*)")
-                tmp.columns = ["LATITUDE", "LONGITUDE"]
-                tmp["LATITUDE"] = tmp["LATITUDE"].str.replace(",", ".", regex=False).astype(float)
-                tmp["LONGITUDE"] = tmp["LONGITUDE"].str.replace(",", ".", regex=False).astype(float)
-                df["__LAT__"], df["__LON__"] = tmp["LATITUDE"], tmp["LONGITUDE"]
-                return "__LAT__", "__LON__"
-            except Exception:
-                return None
-    return None
+@st.cache_resource
+def get_layer_store() -> LayerStore:
+    # Uma instância por processo: todas as sessões compartilham o mesmo GeoJSON decodificado
+    return LayerStore()
 
 def load_geojson_any(path_candidates):
+    store = get_layer_store()
     for p in path_candidates:
         if p and os.path.exists(p):
             try:
-                with open(p, "r", encoding="utf-8") as f:
-                    return json.load(f)
+                with perf.stage("load:geojson"):
+                    return store.get(p)
             except Exception as e:
                 st.warning(f"Erro ao ler {p}: {e}")
     return None
 
+# Arquivos só de pontos: podem ser lidos como arrays do cache colunar
+POINT_FILES = {f for layer in LAYERS if layer.kind in ("ponto", "densidade") for f in layer.files}
+
+def layer_points(fname: str):
+    """Camada de pontos `fname` em arrays (LayerStore.points), ou None para ler o GeoJSON."""
+    path = data_files(DATA_DIR_CANDIDATES).get(fname)
+    return get_layer_store().points(path) if path and fname in POINT_FILES else None
+
+def prefetch_files(paths):
+    """Pré-carrega os GeoJSON de `paths` que ainda não estão em memória (LayerStore.prefetch)."""
+    with perf.stage("load:geojson"):
+        n = get_layer_store().prefetch([p for p in paths if p.lower().endswith(".geojson")])
+    perf.count("load:paralelo", n)
+
+def prefetch_layers(layers):
+    files = data_files(DATA_DIR_CANDIDATES)
+    # Pontos que vêm do cache colunar não precisam do GeoJSON decodificado
+    prefetch_files([files[f] for layer in layers for f in layer.files if f in files and layer_points(f) is None])
+
+def loaded_layers(sidebar_state) -> set:
+    """Chaves das camadas já ligadas nesta sessão: lidas na primeira vez, mantidas depois."""
+    seen = st.session_state.setdefault("camadas_ligadas", set())
+    seen.update(layer.key for layer in LAYERS if sidebar_state[layer.state_key])
+    return seen
+
+@st.cache_resource
+def get_map_cache():
+    # HTML final dos mapas, reaproveitado entre reruns, abas e sessões
+    return MapHtmlCache()
+
+@st.cache_resource
+def get_static_atlas() -> StaticAtlas:
+    # Mapas pré-renderizados por `python publicar.py` (ATLAS_STATIC_DIR / ATLAS_STATIC_URL)
+    return StaticAtlas()
+
+def map_files(layers) -> list:
+    """Arquivos que um mapa com `layers` lê: os das camadas e o dos distritos (recorte e enquadramento)."""
+    return list(dict.fromkeys([DISTRICT_FILE, *(f for layer in layers for f in layer.files)]))
+
+def render_map(key: tuple, build, width: int, height: int, files):
+    """Exibe o mapa de `build()`, que lê os arquivos de dados `files`.
+
+    A chave inclui o conteúdo desses arquivos (não o mtime), então só mudanças neles
+    invalidam o HTML. Se a seleção foi publicada (publicar.py), o HTML vem pronto do
+    disco ou, com ATLAS_STATIC_URL, o navegador o busca direto de lá.
+    """
+    all_files = data_files(DATA_DIR_CANDIDATES)
+    key = (content_version({n: all_files[n] for n in files if n in all_files}), *key)
+    st.session_state["mapa_chave"] = key
+    tiles_base_url()  # avisos do servidor de tiles também quando o HTML vem do cache
+    atlas = get_static_atlas()
+    entry = atlas.lookup(key)
+    if entry is None:
+        perf.miss("publicado")
+    else:
+        perf.hit("publicado")
+        if atlas.url(entry):
+            with perf.stage("render_html:iframe"):
+                components.iframe(atlas.url(entry), height=height + 10, width=width)
+            return
+    html = get_map_cache().get_or_render(key, build, load=entry and (lambda: atlas.html(entry)))
+    with perf.stage("render_html:iframe"):
+        components.html(html, height=height + 10, width=width)
+
+# Catálogo e junção espacial são feitos por arquivo, na primeira vez que alguém pede:
+# as páginas padrão (distritos, sedes e obras) não leem as demais camadas de `dados/`.
+def files_version(*names) -> str:
+    """Versão (nome, mtime, tamanho) só dos arquivos `names`."""
+    files = data_files(DATA_DIR_CANDIDATES)
+    return data_version({n: files[n] for n in names if n in files})
+
+@st.cache_resource(max_entries=64)
+def _layer_info(version: str, fname: str, path: str) -> dict:
+    perf.miss("catalogo")
+    with perf.stage("parse:catalogo"):
+        return layer_info(fname, path, get_layer_store().get)
+
+def get_layer_info(fname: str):
+    """Metadados (camadas.layer_info) de um arquivo de dados; None se ele não existir."""
+    path = data_files(DATA_DIR_CANDIDATES).get(fname)
+    if path is None:
+        return None
+    with perf.lookup("catalogo"):
+        return _layer_info(files_version(fname), fname, path)
+
+@st.cache_resource(max_entries=4)
+def _district_index(version: str, path: str):
+    perf.miss("distritos")
+    with perf.stage("parse:distritos"):
+        return DistrictJoin(get_layer_store().get(path))
+
+def get_district_index():
+    """DistrictJoin sobre os polígonos dos distritos (None sem o arquivo), refeito só quando ele muda."""
+    path = data_files(DATA_DIR_CANDIDATES).get(DISTRICT_FILE)
+    if path is None:
+        return None
+    with perf.lookup("distritos"):
+        return _district_index(files_version(DISTRICT_FILE), path)
+
+@st.cache_resource(max_entries=64)
+def _district_tags(version: str, fname: str, path: str):
+    perf.miss("juncao")
+    join = get_district_index()
+    if join is None:
+        return None
+    with perf.stage("parse:distritos"):
+        try:
+            points = layer_points(fname)
+            if points is not None:
+                return join.tag_xy(points.point_xy())
+            return join.tag_layer(get_layer_store().get(path))
+        except Exception:
+            return None
+
+def district_tags(fname: str):
+    """Distrito de cada feição de `fname` (DataFrame linha a linha); None se não der para cruzar."""
+    path = data_files(DATA_DIR_CANDIDATES).get(fname)
+    if path is None or fname == DISTRICT_FILE or not fname.lower().endswith(".geojson"):
+        return None
+    with perf.lookup("juncao"):
+        return _district_tags(files_version(fname, DISTRICT_FILE), fname, path)
+
 def br_money(x):
     try:
         s = str(x).replace("R$", "").strip()
@@ -591,64 +731,34 @@ def br_money(x):
     except Exception:
         return str(x)
 
-def sniff_read_csv(path: str) -> pd.DataFrame:
+@st.cache_resource(max_entries=4)
+def get_obras_registry(path: str) -> ObrasRegistry:
+    # Tratado como somente leitura: filtros criam novos DataFrames por máscara
+    return ObrasRegistry(path)
+
+def load_obras(path: str):
+    """Cadastro de obras tipado (df, cols); quando o CSV muda, só as linhas alteradas são reprocessadas."""
     try:
-        with open(path, "r", encoding="utf-8-sig") as f:
-            sample = f.read(4096); f.seek(0)
-            sep = ";" if sample.count(";") > sample.count(",") else ","
-            return pd.read_csv(f, sep=sep)
+        with perf.lookup("obras"):
+            return get_obras_registry(path).frame()
     except Exception as e:
         st.error(f"Falha ao ler CSV em '{path}': {e}")
-        return pd.DataFrame()
-
-def to_float_series(s: pd.Series) -> pd.Series:
-    def _conv(v):
-        if pd.isna(v): return None
-        txt = str(v)
-        m = re.search(r"-?\d+[.,]?\d*", txt)
-        if not m: return None
-        try: return float(m.group(0).replace(",", "."))
-        except Exception: return None
-    return s.apply(_conv)
-
-def norm_col(c: str) -> str:
-    s = unicodedata.normalize("NFKD", str(c))
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = s.strip().lower()
-    s = re.sub(r"[^a-z0-9]+", "_", s)
-    return s.strip("_")
-
-def geojson_bounds(gj: dict):
-    if not gj:
-        return None
-    lats, lons = [], []
-
-    def _ingest_coords(coords):
-        if isinstance(coords, (list, tuple)):
-            if len(coords) == 2 and isinstance(coords[0], (int, float)) and isinstance(coords[1], (int, float)):
-                lon, lat = coords[0], coords[1]
-                lons.append(lon); lats.append(lat)
-            else:
-                for c in coords:
-                    _ingest_coords(c)
-
-    def _walk_feature(f):
-        geom = f.get("geometry", {})
-        coords = geom.get("coordinates", [])
-        _ingest_coords(coords)
-
-    t = gj.get("type")
-    if t == "FeatureCollection":
-        for f in gj.get("features", []):
-            _walk_feature(f)
-    elif t == "Feature":
-        _walk_feature(gj)
-    else:
-        _ingest_coords(gj.get("coordinates", []))
+        return pd.DataFrame(), {}
 
-    if not lats or not lons:
+def obras_updated_label() -> str:
+    """Data da última mudança de conteúdo do cadastro de obras (um `touch` não conta)."""
+    try:
+        updated = get_obras_registry(CSV_OBRAS).updated_at()
+    except OSError:
+        return "—"
+    return time.strftime("%d/%m/%Y %H:%M", time.localtime(updated))
+
+def catalog_bounds(fname: str):
+    info = get_layer_info(fname)
+    if not info or not info.get("bbox"):
         return None
-    return (min(lats), min(lons)), (max(lats), max(lons))
+    min_lon, min_lat, max_lon, max_lat = info["bbox"]
+    return (min_lat, min_lon), (max_lat, max_lon)
 
 # ==== CORREÇÃO 1: garantir uma base padrão visível e as demais no controle ====
 def add_all_base_tiles(m: folium.Map):
@@ -689,6 +799,490 @@ def FG(name: str, show: bool) -> folium.FeatureGroup:
     # overlay=True e control=True fazem a camada aparecer no LayerControl
     return folium.FeatureGroup(name=name, show=show, overlay=True, control=True)
 
+# Cadastro de obras municipais
+CSV_OBRAS_CANDIDATES = [os.path.join(b, LAYER_BY_KEY["obras"].file) for b in DATA_DIR_CANDIDATES]
+CSV_OBRAS = next((p for p in CSV_OBRAS_CANDIDATES if os.path.exists(p)), CSV_OBRAS_CANDIDATES[0])
+
+# =====================================================
+# Recorte por distrito
+# =====================================================
+def district_mask(fname: str, distrito: str):
+    """Máscara das feições de `fname` no distrito `distrito`; None se não há recorte a fazer."""
+    if not distrito:
+        return None
+    tagged = district_tags(fname)
+    return None if tagged is None else (tagged["CD_DIST"] == distrito).to_numpy()
+
+def district_features(fname: str, features: list, distrito: str) -> list:
+    """Feições de `fname` no distrito `distrito` (CD_DIST); todas, se vazio."""
+    if distrito and fname == DISTRICT_FILE:
+        return [f for f in features if (f.get("properties") or {}).get("CD_DIST") == distrito]
+    keep = district_mask(fname, distrito)
+    if keep is None:
+        return features
+    return [f for f, k in zip(features, keep) if k]
+
+def district_bounds(distrito: str = ""):
+    """((lat_min, lon_min), (lat_max, lon_max)) do distrito ou, sem seleção, do município."""
+    info = get_layer_info(DISTRICT_FILE)
+    join = get_district_index()
+    if distrito and info and join is not None:
+        rows = np.flatnonzero((join.districts["CD_DIST"] == distrito).to_numpy())
+        if len(rows):
+            min_lon, min_lat, max_lon, max_lat = info["feature_bboxes"][rows[0]]
+            return (min_lat, min_lon), (max_lat, max_lon)
+    return catalog_bounds(DISTRICT_FILE)
+
+def obras_districts(path: str) -> pd.Series:
+    """CD_DIST de cada obra (alinhado ao DataFrame de `load_obras`); só obras novas são cruzadas."""
+    df, _ = load_obras(path)
+    join = get_district_index()
+    if join is None or "__LAT__" not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype=object)
+
+    def tag(rows):
+        perf.miss("obras_distritos")
+        return join.tag(rows[["__LON__", "__LAT__"]].to_numpy())["CD_DIST"].to_numpy()
+
+    with perf.lookup("obras_distritos"):
+        tags = get_obras_registry(path).derive(df, "CD_DIST", files_version(DISTRICT_FILE), tag)
+    return pd.Series(tags, index=df.index)
+
+@st.cache_resource(max_entries=4)
+def _obras_cube(digest: str, district_version: str, path: str) -> ObrasCube:
+    perf.miss("cubo_obras")
+    df, cols = load_obras(path)
+    with perf.stage("parse:cubo_obras"):
+        return ObrasCube(df, cols, obras_districts(path), version=(digest, district_version))
+
+def obras_cube(path: str) -> ObrasCube:
+    """Agregados do cadastro por ano x andamento x secretaria x tipo x distrito, refeitos só
+    quando o conteúdo do CSV ou o arquivo de distritos muda."""
+    load_obras(path)
+    with perf.lookup("cubo_obras"):
+        return _obras_cube(get_obras_registry(path).digest, files_version(DISTRICT_FILE), path)
+
+@st.cache_resource(max_entries=4)
+def _obras_index(digest: str, district_version: str, path: str) -> ObrasIndex:
+    perf.miss("indice_obras")
+    df, cols = load_obras(path)
+    with perf.stage("parse:indice_obras"):
+        return ObrasIndex(df, cols, obras_districts(path).to_numpy())
+
+def obras_index(path: str) -> ObrasIndex:
+    """Índices de filtro do cadastro (códigos, faixas ordenadas e grade), refeitos como o cubo."""
+    load_obras(path)
+    with perf.lookup("indice_obras"):
+        return _obras_index(get_obras_registry(path).digest, files_version(DISTRICT_FILE), path)
+
+def map_view_bbox(state):
+    """(minx, miny, maxx, maxy) do retângulo devolvido pelo st_folium, ou None."""
+    bounds = (state or {}).get("bounds") or {}
+    sw, ne = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    corners = (sw.get("lng"), sw.get("lat"), ne.get("lng"), ne.get("lat"))
+    if any(v is None for v in corners):
+        return None
+    return tuple(round(float(v), 5) for v in corners)
+
+@st.cache_resource(max_entries=256)
+def _obras_figures(version: tuple, filtro: tuple, c_status: str, _celulas: pd.DataFrame):
+    # Figuras prontas por combinação de filtros: montar as do plotly.express custa mais que agregar
+    perf.miss("graficos_obras")
+    # Dados dos gráficos agregados a partir das células filtradas do cubo
+    nomes = {"ano": "ano_extraido", "status": c_status, "valor_soma": "valor_numerico"}
+
+    # Gráfico 1: Investimento por Ano (se houver anos)
+    fig_ano = None
+    invest_por_ano = ObrasCube.by(_celulas, "ano").rename(columns=nomes)
+    if not invest_por_ano.empty:
+        invest_por_ano = invest_por_ano.sort_values('ano_extraido')
+
+        fig_ano = px.bar(
+            invest_por_ano,
+            x='ano_extraido',
+            y='valor_numerico',
+            title='<b>💰 Investimento por Ano</b>',
+            labels={'ano_extraido': 'Ano', 'valor_numerico': 'Valor Investido (R$)'},
+            color='valor_numerico',
+            color_continuous_scale='viridis',
+            custom_data=['n', 'valor_max', 'medicao_soma'],
+        )
+
+        fig_ano.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#2c3e50'),
+            showlegend=False,
+            height=480
+        )
+
+        fig_ano.update_traces(
+            hovertemplate='<b>Ano %{x}</b><br>Valor: R$ %{y:,.2f}<br>Obras: %{customdata[0]}'
+                          '<br>Maior obra: R$ %{customdata[1]:,.2f}'
+                          '<br>Medido: R$ %{customdata[2]:,.2f}<extra></extra>',
+            texttemplate='R$ %{y:,.0f}',
+            textposition='outside'
+        )
+
+    # Gráfico 2: Investimento por Status/Andamento
+    por_status = ObrasCube.by(_celulas, "status").rename(columns=nomes)
+    invest_por_status = por_status.sort_values('valor_numerico', ascending=False)
+
+    fig_status = px.pie(
+        invest_por_status,
+        values='valor_numerico',
+        names=c_status,
+        title='<b>📊 Distribuição por Andamento</b>',
+        hole=0.4,
+        color_discrete_sequence=px.colors.sequential.Viridis
+    )
+
+    fig_status.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#2c3e50'),
+        height=460,
+        showlegend=True
+    )
+
+    fig_status.update_traces(
+        hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>Percentual: %{percent}<extra></extra>',
+        textinfo='percent+label'
+    )
+
+    # Gráfico 3: Quantidade de Obras por Status
+    contagem_status = por_status.rename(columns={"n": "quantidade"})[[c_status, 'quantidade']]
+    contagem_status = contagem_status.sort_values('quantidade', ascending=False, kind="stable")
+
+    fig_contagem = px.bar(
+        contagem_status,
+        x=c_status,
+        y='quantidade',
+        title='<b>📈 Quantidade de Obras por Andamento</b>',
+        labels={c_status: 'Status', 'quantidade': 'Quantidade de Obras'},
+        color='quantidade',
+        color_continuous_scale='plasma'
+    )
+
+    fig_contagem.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#2c3e50'),
+        showlegend=False,
+        height=480
+    )
+
+    fig_contagem.update_traces(
+        hovertemplate='<b>%{x}</b><br>Quantidade: %{y} obras<extra></extra>',
+        texttemplate='%{y}',
+        textposition='outside'
+    )
+    return fig_ano, fig_status, fig_contagem
+
+def obras_figures(cubo: ObrasCube, filtro: tuple, c_status: str, celulas: pd.DataFrame):
+    """(ano ou None, andamento, contagem): figuras dos gráficos de obras para as células
+    `celulas` do cubo (selecionadas por `filtro`), montadas uma vez por versão e filtro."""
+    with perf.lookup("graficos_obras"):
+        return _obras_figures(cubo.version, filtro, c_status, celulas)
+
+# Indicadores por distrito: nome da coluna -> rótulo exibido
+DISTRICT_STAT_LABELS = {
+    "NM_DIST": "Distrito",
+    "obras": "Obras",
+    "valor_obras": "Investimento (R$)",
+    "pocos": "Poços",
+    "profundidade_media": "Profundidade média (m)",
+    "vazao_media": "Vazão média (L/h)",
+    "escolas": "Escolas",
+    "unidades_saude": "Unidades de Saúde",
+    "domicilios": "Domicílios",
+    "espelhos_ha": "Espelhos d'Água (ha)",
+}
+# Destaques do distrito escolhido: (rótulo, coluna, formatação)
+DISTRICT_STAT_METRICS = [
+    ("Obras", "obras", int),
+    ("Investimento", "valor_obras", br_money),
+    ("Poços", "pocos", int),
+    ("Domicílios", "domicilios", int),
+]
+# Colunas de contagem (sem valor -> 0) e de soma (sem valor -> 0.0); médias ficam vazias
+DISTRICT_STAT_COUNTS = ["obras", "pocos", "escolas", "unidades_saude", "domicilios"]
+DISTRICT_STAT_SUMS = ["valor_obras", "espelhos_ha"]
+
+def _district_frame(fname, fields=()):
+    # Atributos da camada + CD_DIST de cada feição (vazio se a camada não cruzar com os distritos)
+    points = layer_points(fname)
+    gj = None if points is not None else load_geojson_any([os.path.join(b, fname) for b in DATA_DIR_CANDIDATES])
+    tagged = district_tags(fname) if points is not None or gj else None
+    if tagged is None:
+        return pd.DataFrame(columns=["CD_DIST", *fields])
+    df = points.properties_frame(fields) if points is not None else properties_frame(gj, fields)
+    df.insert(0, "CD_DIST", tagged["CD_DIST"].to_numpy())
+    return df
+
+def _stats_obras():
+    obras_df, _ = load_obras(CSV_OBRAS)
+    if obras_df.empty or "__VALOR__" not in obras_df.columns:
+        return {}
+    ob = pd.DataFrame({"CD_DIST": obras_districts(CSV_OBRAS).to_numpy(), "valor": obras_df["__VALOR__"].to_numpy()})
+    g = ob.groupby("CD_DIST")["valor"]
+    return {"obras": g.size(), "valor_obras": g.sum()}
+
+def _stats_pocos():
+    files = LAYER_BY_KEY["pocos_cidade"].files + LAYER_BY_KEY["pocos_rural"].files
+    wells = pd.concat([_district_frame(f, ["Profundidade_m", "Vazão_LH"]) for f in files], ignore_index=True)
+    wells["Profundidade_m"] = parse_br_number(wells["Profundidade_m"].astype(object))
+    wells["Vazão_LH"] = parse_br_number(wells["Vazão_LH"].astype(object))
+    g = wells.groupby("CD_DIST")
+    return {"pocos": g.size(), "profundidade_media": g["Profundidade_m"].mean(), "vazao_media": g["Vazão_LH"].mean()}
+
+def _stats_count(key, column):
+    frames = [_district_frame(f) for f in LAYER_BY_KEY[key].files]
+    return {column: pd.concat(frames).groupby("CD_DIST").size()}
+
+def _stats_espelhos():
+    esp = _district_frame(LAYER_BY_KEY["espelhos"].file, ["AREA1"])
+    esp["AREA1"] = parse_decimal(esp["AREA1"].astype(object))
+    return {"espelhos_ha": esp.groupby("CD_DIST")["AREA1"].sum()}
+
+# Blocos de indicadores: nome -> (camadas de que dependem, cálculo). Um bloco só é
+# calculado (e suas camadas lidas) depois que alguma dessas camadas é ligada.
+DISTRICT_STAT_BLOCKS = {
+    "obras": (("obras",), _stats_obras),
+    "pocos": (("pocos_cidade", "pocos_rural"), _stats_pocos),
+    "escolas": (("escolas",), lambda: _stats_count("escolas", "escolas")),
+    "unidades_saude": (("unidades_saude",), lambda: _stats_count("unidades_saude", "unidades_saude")),
+    "domicilios": (("domicilios",), lambda: _stats_count("domicilios", "domicilios")),
+    "espelhos": (("espelhos",), _stats_espelhos),
+}
+
+@st.cache_resource(max_entries=32)
+def _district_stat_block(version: str, block: str):
+    perf.miss("indicadores")
+    join = get_district_index()
+    stats = pd.DataFrame(DISTRICT_STAT_BLOCKS[block][1](), index=pd.Index(join.districts["CD_DIST"], name="CD_DIST"))
+    counts = [c for c in DISTRICT_STAT_COUNTS if c in stats.columns]
+    stats[counts] = stats[counts].fillna(0).astype(int)
+    sums = [c for c in DISTRICT_STAT_SUMS if c in stats.columns]
+    stats[sums] = stats[sums].fillna(0.0)
+    return stats
+
+def district_stats(layer_keys):
+    """Indicadores por distrito (índice CD_DIST) dos blocos cujas camadas estão em `layer_keys`.
+
+    Cada bloco é calculado uma vez por versão dos seus arquivos; None sem o arquivo de distritos.
+    """
+    join = get_district_index()
+    if join is None:
+        return None
+    stats = pd.DataFrame(
+        {"NM_DIST": join.districts["NM_DIST"].to_numpy()}, index=pd.Index(join.districts["CD_DIST"], name="CD_DIST")
+    )
+    for block, (keys, _) in DISTRICT_STAT_BLOCKS.items():
+        if not set(keys) & set(layer_keys):
+            continue
+        files = [f for k in keys for f in LAYER_BY_KEY[k].files]
+        with perf.lookup("indicadores"):
+            stats = stats.join(_district_stat_block(files_version(*files, DISTRICT_FILE), block))
+    return stats.reindex(columns=[c for c in DISTRICT_STAT_LABELS if c in stats.columns])
+
+# Camadas de densidade: pontos (ex.: domicílios do Censo) agregados em grade
+@st.cache_resource(max_entries=16)
+def _point_density(version: str, files: tuple, distrito: str):
+    perf.miss("densidade")
+    xy = []
+    for fname in files:
+        points = layer_points(fname)
+        if points is not None:
+            # Só as coordenadas, direto do cache colunar (sem decodificar as feições)
+            pts = np.asarray(points.point_xy())
+            keep = district_mask(fname, distrito)
+            pts = pts if keep is None else pts[keep]
+            xy.append(pts[~np.isnan(pts).any(axis=1)])
+            continue
+        gj = load_geojson_any([os.path.join(b, fname) for b in DATA_DIR_CANDIDATES])
+        if gj:
+            xy.append(point_coords(district_features(fname, gj.get("features", []), distrito)))
+    xy = np.concatenate(xy) if xy else np.empty((0, 2))
+    return density_levels(xy) if len(xy) else None
+
+def point_density(files, distrito: str = ""):
+    with perf.lookup("densidade"):
+        return _point_density(data_version(data_files(DATA_DIR_CANDIDATES)), tuple(files), distrito)
+
+# Polígonos e linhas vão simplificados e quantizados (ver geometria.SIMPLIFY_LEVELS)
+@st.cache_resource(max_entries=64)
+def _simplified_layer(version: str, fname: str, level: str, fields: tuple, distrito: str):
+    perf.miss("simplificadas")
+    gj = load_geojson_any([os.path.join(b, fname) for b in DATA_DIR_CANDIDATES])
+    if not gj:
+        return None
+    if distrito:
+        gj = {"type": "FeatureCollection", "features": district_features(fname, gj.get("features", []), distrito)}
+    tolerance, precision = SIMPLIFY_LEVELS[level]
+    return encode_compact(simplify_geojson(gj, tolerance, precision, list(fields)), precision, list(fields))
+
+def simplified_layer(fname: str, level: str, fields=(), distrito: str = ""):
+    with perf.lookup("simplificadas"):
+        return _simplified_layer(data_version(data_files(DATA_DIR_CANDIDATES)), fname, level, tuple(fields), distrito)
+
+# =====================================================
+# Exportação (exportar.py): gerada no clique do download e guardada em disco
+# =====================================================
+@st.cache_resource
+def get_export_cache() -> ExportCache:
+    return ExportCache()
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def obras_export_columns(df: pd.DataFrame) -> list:
+    return [c for c in df.columns if c not in ("ano_extraido", *OBRAS_INTERNAL_COLS)]
+
+def write_export(fmt: str, features, out, name: str, title: str, crs=None, style=None, point_color="#1E3A8A",
+                 label_fields=(), table_fields=None):
+    """Grava `features` em `out` no formato `fmt` (um id de exportar.FORMATS)."""
+    if fmt == "GEOJSON":
+        write_geojson(features, out, name, crs)
+    elif fmt == "CSV":
+        write_csv(features, out)
+    elif fmt == "KML":
+        write_kml(features, out, title, label_fields=label_fields, style=style)
+    elif fmt == "SHAPE":
+        write_shapefile(features, out, name, crs)
+    elif fmt == "PDF":
+        # Distritos ao fundo, como referência (menos na própria camada de distritos)
+        path = data_files(DATA_DIR_CANDIDATES).get(DISTRICT_FILE)
+        context = get_layer_store().get(path).get("features", []) if path and name != "distritos" else []
+        write_pdf(features, out, title, context, style, point_color, table_fields)
+    else:
+        raise ValueError(f"formato desconhecido: {fmt}")
+
+def export_obras(df: pd.DataFrame, fmt: str, filtro: tuple) -> str:
+    """Arquivo com as obras de `df` (o cadastro já filtrado por `filtro`) no formato `fmt`."""
+    columns = obras_export_columns(df)
+    key = ("obras", fmt, filtro, files_version(LAYER_BY_KEY["obras"].file, DISTRICT_FILE))
+
+    def write(out):
+        write_export(fmt, FrameFeatures(df, columns), out, "obras", "Obras Municipais",
+                     label_fields=columns[3:4], table_fields=columns[:7])
+
+    return get_export_cache().get_or_write(key, FORMATS[fmt][0], write)
+
+def export_layer(key: str, fmt: str, distrito: str = "") -> str:
+    """Arquivo da camada `key` do registro no formato `fmt`, recortada pelo distrito (se houver)."""
+    layer = LAYER_BY_KEY[key]
+    if layer.kind == "obras":
+        df, _ = load_obras(CSV_OBRAS)
+        if distrito:
+            df = df[(obras_districts(CSV_OBRAS) == distrito).to_numpy()]
+        return export_obras(df, fmt, ("distrito", distrito))
+    cache_key = ("camada", key, fmt, distrito, files_version(*layer.files, DISTRICT_FILE))
+
+    def write(out):
+        features, crs = [], None
+        for fname in layer.files:
+            gj = load_geojson_any([os.path.join(b, fname) for b in DATA_DIR_CANDIDATES]) or {}
+            crs = crs or ((gj.get("crs") or {}).get("properties") or {}).get("name")
+            features += district_features(fname, gj.get("features", []), distrito)
+        point_color = next(iter(layer.icons.values())).get("hex", "#1E3A8A")
+        write_export(fmt, features, out, key, layer.name, crs, layer.style, point_color, layer.tooltip)
+
+    return get_export_cache().get_or_write(cache_key, FORMATS[fmt][0], write)
+
+# Servidor opcional de tiles vetoriais (tiles.py). ATLAS_TILES_URL é o endereço que o
+# navegador de quem visita usa para buscar os tiles: de um servidor já em execução ou do
+# que ATLAS_TILES_PORT sobe junto com o app, escutando em ATLAS_TILES_HOST (padrão
+# 127.0.0.1). Sem ATLAS_TILES_URL, o mapa aponta para http://localhost:<porta>, que só
+# funciona com o navegador na mesma máquina do servidor; para outros visitantes, use
+# ATLAS_TILES_HOST=0.0.0.0 (ou um proxy) e o endereço público em ATLAS_TILES_URL.
+# Sem URL nem porta, as camadas vão embutidas no HTML do mapa.
+TILES_URL = os.environ.get("ATLAS_TILES_URL", "")
+TILES_PORT = os.environ.get("ATLAS_TILES_PORT", "")
+TILES_HOST = os.environ.get("ATLAS_TILES_HOST", "127.0.0.1")
+
+@st.cache_resource
+def _tiles_server():
+    """Sobe o servidor embutido uma vez por processo; devolve o erro, se não subir."""
+    try:
+        start_in_background(int(TILES_PORT), TILES_HOST, tileset=TileSet(store=get_layer_store()))
+    except OSError as e:
+        return str(e)
+    return None
+
+_tiles_avisos = set()  # o script roda de novo a cada rerun: um aviso por execução
+
+def tiles_warning(msg: str):
+    if msg not in _tiles_avisos:
+        _tiles_avisos.add(msg)
+        st.warning(msg)
+
+def tiles_base_url():
+    if TILES_PORT:
+        erro = _tiles_server()
+        if erro:
+            tiles_warning(f"Servidor de tiles não iniciado em {TILES_HOST}:{TILES_PORT}: {erro}. "
+                          "As camadas vão embutidas no mapa.")
+            return None
+        if not TILES_URL:
+            tiles_warning(f"Tiles servidos em http://localhost:{TILES_PORT}: só um navegador nesta máquina "
+                          "os alcança. Para outros visitantes, defina ATLAS_TILES_URL com o endereço público "
+                          "(e ATLAS_TILES_HOST para escutar fora do 127.0.0.1).")
+            return f"http://localhost:{TILES_PORT}"
+    return TILES_URL.rstrip("/") or None
+
+def add_shape_layer(parent, fname: str, level: str, style: dict, fields=(), aliases=(), distrito: str = ""):
+    """Polígonos/linhas como tiles vetoriais, se houver servidor de tiles, ou GeoJSON compacto."""
+    base_url = tiles_base_url()
+    if base_url:
+        layer = os.path.splitext(fname)[0]
+        vector_tile_layer(base_url, layer, style, fields, aliases, distrito).add_to(parent)
+    else:
+        CompactGeoJson(simplified_layer(fname, level, fields, distrito), style=style, aliases=aliases).add_to(parent)
+
+def geom_level(bounds=None, zoom=None) -> str:
+    """Nível escolhido na barra lateral ou, em "auto", o adequado ao zoom inicial do mapa."""
+    if sidebar_state["geom_detail"] != "auto":
+        return sidebar_state["geom_detail"]
+    if bounds:
+        zoom = fit_zoom(bounds)
+    return level_for_zoom(zoom if zoom is not None else 12)
+
+def add_layer(m: folium.Map, layer, level: str, distrito: str = "", points=None):
+    """Desenha uma camada do registro em `m`, no seu FeatureGroup (some se não houver dados).
+
+    `points` substitui os pontos lidos do arquivo (ex.: obras já filtradas na aba).
+    """
+    if points is None and layer.file not in data_files(DATA_DIR_CANDIDATES):
+        return
+    with perf.stage(f"build_map:{layer.name}"):
+        fg = FG(layer.name, True)
+        if layer.kind in SHAPE_KINDS:
+            fields, aliases = layer.fields, layer.aliases
+            if fields is None:
+                fields = tooltip_fields(get_layer_info(layer.file))
+                aliases = ["Propriedade:"] * len(fields)
+            add_shape_layer(fg, layer.file, level, layer.style, fields, aliases, distrito)
+        elif layer.kind == "densidade":
+            dens = point_density(layer.files, distrito)
+            if not dens:
+                return
+            DensityGrid(dens, label=layer.density_label).add_to(fg)
+        else:
+            if points is None:
+                cached = layer_points(layer.file)
+                if cached is not None:
+                    frame = layer.columnar_point_frame(cached, district_mask(layer.file, distrito))
+                else:
+                    gj = load_geojson_any([os.path.join(b, layer.file) for b in DATA_DIR_CANDIDATES])
+                    if not gj:
+                        return
+                    frame = layer.point_frame(district_features(layer.file, gj.get("features", []), distrito))
+                points = layer.point_layer(frame)
+            points.add_to(fg, sidebar_state["point_mode"])
+        fg.add_to(m)
+
 # =====================================================
 # Layout Principal
 # =====================================================
@@ -697,25 +1291,35 @@ create_header()
 sidebar_state = create_sidebar()
 
 # =====================================================
-# Abas principais (ordem dinâmica para abrir direto na desejada)
+# Abas principais: só a seção ativa é executada em cada rerun
 # =====================================================
+SECTIONS = {
+    "home": "🏠 Página Inicial",
+    "works": "🏗️ Painel de Obras",
+    "maps": "🗺️ Milhã em Mapas",
+}
+
+def _on_section_change():
+    # Mantém session_state e query params em sincronia (recarregar a página abre a mesma seção)
+    tab = st.session_state["nav_tab"]
+    st.session_state.default_tab = tab
+    try:
+        st.query_params["page"] = st.session_state.page
+        st.query_params["tab"] = tab
+    except Exception:
+        st.experimental_set_query_params(page=st.session_state.page, tab=tab)
+
 if st.session_state.page != 'home':
-    label_home  = "🏠 Página Inicial"
-    label_works = "🏗️ Painel de Obras"
-    label_maps  = "🗺️ Milhã em Mapas"
-
-    desired = st.session_state.default_tab
-    order = [label_home, label_works, label_maps]
-
-    if desired == 'works':
-        order = [label_works, label_maps, label_home]
-    elif desired == 'maps':
-        order = [label_maps, label_works, label_home]
-    elif desired == 'data':
-        order = [label_home, label_works, label_maps]
-
-    tabs = st.tabs(order)
-    tab_map = {order[i]: tabs[i] for i in range(len(order))}
+    # 'data' (e valores desconhecidos) abrem na Página Inicial
+    desired = st.session_state.default_tab if st.session_state.default_tab in SECTIONS else "home"
+    if st.session_state.get("nav_tab") != desired:
+        st.session_state["nav_tab"] = desired
+
+    with st.container(key="nav_tabs"):
+        active_tab = st.radio(
+            "Seção", options=list(SECTIONS), format_func=SECTIONS.get, horizontal=True,
+            label_visibility="collapsed", key="nav_tab", on_change=_on_section_change,
+        )
 else:
     # HOME — mostra conteúdo e encerra
     def render_home_content():
@@ -832,7 +1436,7 @@ else:
 # =====================================================
 # 2) Painel de Obras
 # =====================================================
-with tab_map["🏗️ Painel de Obras"]:
+if active_tab == "works":
         
     def render_card(title_html: str, body_html: str):
         st.markdown(
@@ -850,80 +1454,42 @@ with tab_map["🏗️ Painel de Obras"]:
         "<p>Visualize e acompanhe o andamento das obras públicas em Milhã</p>",
     )
 
-    CSV_OBRAS_CANDIDATES = ["dados/milha_obras.csv", "/mnt/data/milha_obras.csv"]
-    CSV_OBRAS = next((p for p in CSV_OBRAS_CANDIDATES if os.path.exists(p)), CSV_OBRAS_CANDIDATES[0])
-
-    df_obras_raw = sniff_read_csv(CSV_OBRAS)
+    df_obras, obras_cols = load_obras(CSV_OBRAS)
 
-    if not df_obras_raw.empty:
-        colmap = {c: norm_col(c) for c in df_obras_raw.columns}
-        df_obras = df_obras_raw.rename(columns=colmap).copy()
-
-        lat_col = next((c for c in df_obras.columns if c in {"latitude","lat"}), None)
-        lon_col = next((c for c in df_obras.columns if c in {"longitude","long","lon"}), None)
-        if not lat_col or not lon_col:
-            coords = autodetect_coords(df_obras_raw.copy())
-            if coords:
-                lat_col, lon_col = coords
-
-        if not lat_col or not lon_col:
+    if not df_obras.empty:
+        if not obras_cols.get("lat"):
             st.error("Não foi possível localizar colunas de latitude/longitude.")
             st.stop()
 
-        df_obras["__LAT__"] = to_float_series(df_obras[lat_col])
-        df_obras["__LON__"] = to_float_series(df_obras[lon_col])
-
-        lat_s = pd.to_numeric(df_obras["__LAT__"], errors="coerce")
-        lon_s = pd.to_numeric(df_obras["__LON__"], errors="coerce")
-
-        def _pct_inside(a, b):
-            try:
-                m = (a.between(-6.5, -4.5)) & (b.between(-40.5, -38.0))
-                return float(m.mean())
-            except Exception:
-                return 0.0
-
-        cands = [
-            ("orig", lat_s, lon_s, _pct_inside(lat_s, lon_s)),
-            ("swap", lon_s, lat_s, _pct_inside(lon_s, lat_s)),
-            ("neg_lon", lat_s, lon_s.mul(-1.0), _pct_inside(lat_s, lon_s.mul(-1.0))),
-            ("swap_neg", lon_s, lat_s.mul(-1.0), _pct_inside(lon_s, lat_s.mul(-1.0))),
-        ]
-        best = max(cands, key=lambda x: x[3])
-        if best[0] != "orig" and best[3] >= cands[0][3]:
-            df_obras["__LAT__"], df_obras["__LON__"] = best[1], best[2]
-
-        df_map = df_obras.dropna(subset=["__LAT__", "__LON__"]).copy()
-
-        cols = list(df_obras.columns)
-        def pick_norm(*options):
-            return next((c for c in cols if c in [norm_col(o) for o in options]), None)
-
-        c_obra    = pick_norm("Obra", "Nome", "Projeto", "Descrição")
-        c_status  = pick_norm("Status", "Situação", "Andamento")
-        c_empresa = pick_norm("Empresa", "Contratada")
-        c_valor   = pick_norm("Valor", "Valor Total", "Custo", "valor_total")
-        c_bairro  = pick_norm("Bairro", "Localidade")
-        c_dtini   = pick_norm("Início", "Data Início", "Inicio", "data_inicio")
-        c_dtfim   = pick_norm("Término", "Data Fim", "Termino")
+        c_obra    = obras_cols["obra"]
+        c_status  = obras_cols["status"]
+        c_empresa = obras_cols["empresa"]
+        c_valor   = obras_cols["valor"]
+        c_bairro  = obras_cols["bairro"]
+        c_dtini   = obras_cols["dtini"]
+        c_dtfim   = obras_cols["dtfim"]
 
         # =====================================================
         # PREPARAR DADOS PARA FILTROS
         # =====================================================
-        # Extrair ano da data_inicio
-        df_obras['ano_extraido'] = df_obras[c_dtini].astype(str).str.extract(r'(\d{4})')[0] if c_dtini else None
-        
+        # Opções, KPIs e gráficos saem do cubo de agregados (O(células), não O(obras))
+        cubo = obras_cube(CSV_OBRAS)
+
         # Preparar dados de status/andamento
         status_options = ["Todos"]
         if c_status:
-            status_disponiveis = df_obras[c_status].dropna().unique()
-            status_options.extend(sorted([str(s) for s in status_disponiveis if str(s).strip() != ""]))
+            status_options.extend(sorted([str(s) for s in cubo.values("status") if str(s).strip() != ""]))
 
         # Preparar dados de ano
         ano_options = ["Todos"]
-        if 'ano_extraido' in df_obras.columns and df_obras['ano_extraido'].notna().any():
-            anos_disponiveis = sorted(df_obras['ano_extraido'].dropna().unique())
-            ano_options.extend(anos_disponiveis)
+        ano_options.extend(sorted(cubo.values("ano")))
+
+        # Secretaria, tipo, faixas de valor e de início (índices de filtro do cadastro)
+        indice = obras_index(CSV_OBRAS)
+        secretaria_options = ["Todas", *sorted(str(v) for v in cubo.values("secretaria"))]
+        tipo_options = ["Todos", *sorted(str(v) for v in cubo.values("tipo"))]
+        faixa_valor_total = indice.bounds("valor")
+        faixa_inicio_total = indice.bounds("inicio")
 
         # =====================================================
         # FILTROS NO TOPO
@@ -946,44 +1512,113 @@ with tab_map["🏗️ Painel de Obras"]:
                 index=0,
                 key="filtro_status"
             )
-        
-        # Aplicar filtros ao DataFrame
-        df_filtrado = df_obras.copy()
-        
-        if ano_selecionado != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['ano_extraido'] == ano_selecionado]
-        
-        if status_selecionado != "Todos":
-            df_filtrado = df_filtrado[df_filtrado[c_status] == status_selecionado]
-        
-        df_map_filtrado = df_filtrado.dropna(subset=["__LAT__", "__LON__"]).copy()
+
+        col_filtro3, col_filtro4 = st.columns(2)
+
+        with col_filtro3:
+            secretaria_selecionada = st.selectbox(
+                "**🏛️ Filtrar por Secretaria:**",
+                options=secretaria_options,
+                index=0,
+                key="filtro_secretaria"
+            )
+
+        with col_filtro4:
+            tipo_selecionado = st.selectbox(
+                "**🧱 Filtrar por Tipo:**",
+                options=tipo_options,
+                index=0,
+                key="filtro_tipo"
+            )
+
+        col_filtro5, col_filtro6 = st.columns(2)
+
+        # Faixas só contam como filtro quando diferentes da faixa completa
+        faixa_valor = None
+        with col_filtro5:
+            if faixa_valor_total and faixa_valor_total[0] < faixa_valor_total[1]:
+                lo, hi = (float(v) for v in faixa_valor_total)
+                escolha = st.slider(
+                    "**💰 Faixa de Valor (R$):**",
+                    min_value=lo, max_value=hi, value=(lo, hi), format="R$ %.0f",
+                    key="filtro_valor"
+                )
+                if tuple(escolha) != (lo, hi):
+                    faixa_valor = tuple(escolha)
+
+        faixa_inicio = None
+        with col_filtro6:
+            if faixa_inicio_total:
+                d0, d1 = (pd.Timestamp(v).date() for v in faixa_inicio_total)
+                escolha = st.date_input(
+                    "**🗓️ Início entre:**",
+                    value=(d0, d1), min_value=d0, max_value=d1, format="DD/MM/YYYY",
+                    key="filtro_inicio"
+                )
+                if isinstance(escolha, tuple) and len(escolha) == 2 and escolha != (d0, d1):
+                    faixa_inicio = escolha
+
+        so_visiveis = st.checkbox(
+            "🗺️ Só obras na área visível do mapa (indicadores, gráficos, tabela e exportação)",
+            key="filtro_visivel"
+        )
+
+        # Aplicar filtros pelos índices (códigos, busca binária e grade), sem comparar texto
+        iguais = {
+            "ano": None if ano_selecionado == "Todos" else ano_selecionado,
+            "status": None if status_selecionado == "Todos" else status_selecionado,
+            "secretaria": None if secretaria_selecionada == "Todas" else secretaria_selecionada,
+            "tipo": None if tipo_selecionado == "Todos" else tipo_selecionado,
+            "distrito": sidebar_state["distrito"] or None,
+        }
+        faixas = {}
+        if faixa_valor:
+            faixas["valor"] = faixa_valor
+        if faixa_inicio:
+            fim = np.datetime64(faixa_inicio[1], "ns") + np.timedelta64(1, "D") - np.timedelta64(1, "ns")
+            faixas["inicio"] = (np.datetime64(faixa_inicio[0], "ns"), fim)
+        vista = None
+        if so_visiveis:
+            # Retângulo do último movimento no mapa; antes disso, o enquadramento inicial
+            vista = map_view_bbox(st.session_state.get("mapa_obras_vista"))
+            if vista is None and DISTRICT_FILE in data_files(DATA_DIR_CANDIDATES):
+                b = district_bounds(sidebar_state["distrito"])
+                if b:
+                    (min_lat, min_lon), (max_lat, max_lon) = b
+                    vista = (min_lon, min_lat, max_lon, max_lat)
+
+        mask_mapa = indice.mask(iguais, faixas)
+        mask = mask_mapa & indice.mask(bbox=vista) if vista else mask_mapa
+        df_filtrado = df_obras[mask]
+
+        # O mapa mostra as obras dos demais filtros (a área visível é ele mesmo)
+        com_coords = (df_obras["__LAT__"].notna() & df_obras["__LON__"].notna()).to_numpy()
+        df_map_filtrado = df_obras[mask_mapa & com_coords]
+
+        # Filtros que mudam o conjunto de obras (chave de mapa, gráficos e exportação)
+        filtro_chave = (ano_selecionado, status_selecionado, secretaria_selecionada, tipo_selecionado,
+                        faixa_valor, faixa_inicio)
+
+        # Células do cubo com os mesmos filtros; faixas e área visível não são dimensões do
+        # cubo, então nesse caso ele é montado só sobre as obras já filtradas
+        filtro_cubo = (*iguais.values(), faixa_valor, faixa_inicio, vista)
+        if faixas or vista:
+            celulas = ObrasCube(df_filtrado, obras_cols, obras_districts(CSV_OBRAS).to_numpy()[mask]).cells
+        else:
+            celulas = cubo.select(**iguais)
+        totais = ObrasCube.totals(celulas)
 
         # =====================================================
         # KPIs ESTILIZADOS NO TOPO - APENAS OS 3 SOLICITADOS
         # =====================================================
         
         # Calcular métricas para os KPIs com dados filtrados
-        total_obras_filtrado = len(df_filtrado)
-        obras_com_coords_filtrado = len(df_map_filtrado)
-        
-        # Calcular valor total das obras - usando valor_total
-        valor_total_filtrado = 0
-        if c_valor:
-            try:
-                valores = df_filtrado[c_valor].apply(lambda x: 
-                    float(re.sub(r'[^\d,]', '', str(x)).replace(',', '.') 
-                    if pd.notna(x) and str(x).strip() != '' else 0)
-                )
-                valor_total_filtrado = valores.sum()
-            except Exception as e:
-                st.warning(f"Aviso na conversão de valores: {e}")
-                valor_total_filtrado = 0
+        total_obras_filtrado = int(totais["n"])
+        obras_com_coords_filtrado = int(totais["com_coords"])
         
-        # Contar obras concluídas - considerando "CONCLUÍDA" na coluna Andamento
-        obras_concluidas_filtrado = 0
-        if c_status:
-            status_series = df_filtrado[c_status].astype(str).str.upper().str.strip()
-            obras_concluidas_filtrado = status_series.str.contains('CONCLUÍDA|CONCLUIDA|FINALIZADA|TERMINADA', na=False).sum()
+        # Valor total (valor_total já convertido na ingestão) e obras concluídas
+        valor_total_filtrado = float(totais["valor_soma"]) if c_valor else 0
+        obras_concluidas_filtrado = int(totais["concluidas"]) if c_status else 0
         
         # Formatar valor total no padrão brasileiro
         def formatar_valor_br(valor):
@@ -1048,6 +1683,16 @@ with tab_map["🏗️ Painel de Obras"]:
             filtro_info.append(f"Ano: {ano_selecionado}")
         if status_selecionado != "Todos":
             filtro_info.append(f"Andamento: {status_selecionado}")
+        if secretaria_selecionada != "Todas":
+            filtro_info.append(f"Secretaria: {secretaria_selecionada}")
+        if tipo_selecionado != "Todos":
+            filtro_info.append(f"Tipo: {tipo_selecionado}")
+        if faixa_valor:
+            filtro_info.append(f"Valor: {formatar_valor_br(faixa_valor[0])} a {formatar_valor_br(faixa_valor[1])}")
+        if faixa_inicio:
+            filtro_info.append(f"Início: {faixa_inicio[0]:%d/%m/%Y} a {faixa_inicio[1]:%d/%m/%Y}")
+        if vista:
+            filtro_info.append("Área visível do mapa")
         
         if filtro_info:
             st.markdown(f'<div class="filtro-info">🎯 Filtros Ativos: {" | ".join(filtro_info)}</div>', unsafe_allow_html=True)
@@ -1081,11 +1726,7 @@ with tab_map["🏗️ Painel de Obras"]:
         
         st.markdown("---")
 
-        st.success(f"✅ **{len(df_map_filtrado)} obra(s)** com coordenadas válidas encontradas")
-
-        base_dir_candidates = ["dados", "/mnt/data"]
-        gj_distritos = load_geojson_any([os.path.join(b, "milha_dist_polig.geojson") for b in base_dir_candidates])
-        gj_sede      = load_geojson_any([os.path.join(b, "Distritos_pontos.geojson") for b in base_dir_candidates])
+        st.success(f"✅ **{obras_com_coords_filtrado} obra(s)** com coordenadas válidas encontradas")
 
         # =====================================================
         # MAPA COM FILTROS APLICADOS
@@ -1093,114 +1734,68 @@ with tab_map["🏗️ Painel de Obras"]:
         col_map = st.columns([1])[0]
 
         with col_map:
-            bounds = None
-            if gj_distritos:
-                b = geojson_bounds(gj_distritos)
-                if b:
-                    bounds = b
-                    (min_lat, min_lon), (max_lat, max_lon) = b
-                    center_lat = (min_lat + max_lat) / 2.0
-                    center_lon = (min_lon + max_lon) / 2.0
-                    default_center = [center_lat, center_lon]
+            def build_m2():
+                bounds = None
+                if DISTRICT_FILE in data_files(DATA_DIR_CANDIDATES):
+                    b = district_bounds(sidebar_state["distrito"])
+                    if b:
+                        bounds = b
+                        (min_lat, min_lon), (max_lat, max_lon) = b
+                        center_lat = (min_lat + max_lat) / 2.0
+                        center_lon = (min_lon + max_lon) / 2.0
+                        default_center = [center_lat, center_lon]
+                    else:
+                        default_center = [-5.680, -39.200]
                 else:
                     default_center = [-5.680, -39.200]
+
+                m2 = folium.Map(location=default_center, zoom_start=12, tiles=None, control_scale=True)
+                add_all_base_tiles(m2)
+
+                if sidebar_state["enable_fullscreen"]:
+                    Fullscreen(position='topleft').add_to(m2)
+                if sidebar_state["enable_measure"]:
+                    MeasureControl(
+                        primary_length_unit="meters",
+                        secondary_length_unit="kilometers", 
+                        primary_area_unit="hectares",
+                        position='topleft'
+                    ).add_to(m2)
+                if sidebar_state["enable_draw"]:
+                    Draw(export=True, position='topright').add_to(m2)
+                if sidebar_state["show_coords"]:
+                    MousePosition(position='bottomleft').add_to(m2)
+
+                layers = [layer for layer in page_layers("works") if sidebar_state[layer.state_key]]
+                prefetch_layers(layers)
+                for layer in layers:
+                    if layer.kind == "obras":
+                        if not df_map_filtrado.empty:
+                            add_layer(m2, layer, "", sidebar_state["distrito"],
+                                      points=obras_point_layer(df_map_filtrado, obras_cols))
+                    else:
+                        add_layer(m2, layer, geom_level(bounds), sidebar_state["distrito"])
+
+                if bounds:
+                    (min_lat, min_lon), (max_lat, max_lon) = bounds
+                    m2.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
+                elif not df_map_filtrado.empty:
+                    m2.fit_bounds([[df_map_filtrado["__LAT__"].min(), df_map_filtrado["__LON__"].min()],
+                                   [df_map_filtrado["__LAT__"].max(), df_map_filtrado["__LON__"].max()]])
+
+                # Layer control com basemaps e overlays visíveis
+                folium.LayerControl(collapsed=True, position='topleft').add_to(m2)
+                return m2
+
+            if so_visiveis:
+                # Mapa que devolve o retângulo visível a cada movimento (sem cache de HTML)
+                with perf.stage("build_map"):
+                    m2 = build_m2()
+                with perf.stage("render_html:st_folium"):
+                    st_folium(m2, key="mapa_obras_vista", width=800, height=600, returned_objects=["bounds"])
             else:
-                default_center = [-5.680, -39.200]
-
-            m2 = folium.Map(location=default_center, zoom_start=12, tiles=None, control_scale=True)
-            add_all_base_tiles(m2)
-
-            if sidebar_state["enable_fullscreen"]:
-                Fullscreen(position='topleft').add_to(m2)
-            if sidebar_state["enable_measure"]:
-                MeasureControl(
-                    primary_length_unit="meters",
-                    secondary_length_unit="kilometers", 
-                    primary_area_unit="hectares",
-                    position='topleft'
-                ).add_to(m2)
-            if sidebar_state["enable_draw"]:
-                Draw(export=True, position='topright').add_to(m2)
-            if sidebar_state["show_coords"]:
-                MousePosition(position='bottomleft').add_to(m2)
-
-            if sidebar_state["show_distritos"] and gj_distritos:
-                fg_dist = FG("Distritos", True)
-                folium.GeoJson(
-                    gj_distritos,
-                    name="Distritos",
-                    style_function=lambda x: {"fillColor": "#9fe2fc", "fillOpacity": 0.1, "color": "#000000", "weight": 1},
-                ).add_to(fg_dist)
-                fg_dist.add_to(m2)
-
-            if sidebar_state["show_sede"] and gj_sede:
-                fg_sede = FG("Sede Distritos", True)
-                for f in gj_sede.get("features", []):
-                    x, y = f["geometry"]["coordinates"]
-                    nome = f.get("properties", {}).get("nome_do_distrito", "Sede")
-                    folium.Marker([y, x], tooltip=nome, icon=folium.Icon(color="darkgreen", icon="home")).add_to(fg_sede)
-                fg_sede.add_to(m2)
-
-            if sidebar_state["show_obras"] and not df_map_filtrado.empty:
-                def status_icon_color(status_val: str):
-                    s = (str(status_val) if status_val is not None else "").strip().lower()
-                    if any(k in s for k in ["conclu", "finaliz"]):     return "green"
-                    if any(k in s for k in ["execu", "andamento"]):    return "orange"
-                    if any(k in s for k in ["paralis", "suspens"]):    return "red"
-                    if any(k in s for k in ["planej", "licita", "proj"]): return "blue"
-                    return "gray"
-
-                fg_obras = FG("Obras Municipais", True)
-                ignore_cols = {"__LAT__", "__LON__"}
-                for _, r in df_map_filtrado.iterrows():
-                    nome   = str(r.get(c_obra, "Obra")) if c_obra else "Obra"
-                    status = str(r.get(c_status, "-")) if c_status else "-"
-                    empresa= str(r.get(c_empresa, "-")) if c_empresa else "-"
-                    valor  = br_money(r.get(c_valor)) if c_valor else "-"
-                    bairro = str(r.get(c_bairro, "-")) if c_bairro else "-"
-                    dtini  = str(r.get(c_dtini, "-")) if c_dtini else "-"
-                    dtfim  = str(r.get(c_dtfim, "-")) if c_dtfim else "-"
-
-                    extra_rows = []
-                    for c in df_filtrado.columns:
-                        if c in ignore_cols or c in {c_obra, c_status, c_empresa, c_valor, c_bairro, c_dtini, c_dtfim}:
-                            continue
-                        val = r.get(c, "")
-                        if pd.notna(val) and str(val).strip() != "":
-                            extra_rows.append(f"<tr><td><b>{c}</b></td><td>{val}</td></tr>")
-                    extra_html = "".join(extra_rows)
-
-                    popup_html = (
-                        "<div style='font-family:Arial; font-size:13px'>"
-                        f"<h4 style='margin:4px 0 8px 0'>🧱 {nome}</h4>"
-                        f"<p style='margin:0 0 6px'><b>Status:</b> {status}</p>"
-                        f"<p style='margin:0 0 6px'><b>Empresa:</b> {empresa}</p>"
-                        f"<p style='margin:0 0 6px'><b>Valor:</b> {valor}</p>"
-                        f"<p style='margin:0 0 6px'><b>Bairro/Localidade:</b> {bairro}</p>"
-                        f"<p style='margin:0 0 6px'><b>Início:</b> {dtini} &nbsp; <b>Término:</b> {dtfim}</p>"
-                        + (f"<table border='1' cellpadding='4' cellspacing='0' style='border-collapse:collapse; margin-top:6px'>{extra_html}</table>" if extra_html else "")
-                        + "</div>"
-                    )
-
-                    folium.Marker(
-                        location=[r["__LAT__"], r["__LON__"]],
-                        tooltip=nome,
-                        popup=folium.Popup(popup_html, max_width=420),
-                        icon=folium.Icon(color=status_icon_color(status), icon="info-sign")
-                    ).add_to(fg_obras)
-
-                fg_obras.add_to(m2)
-
-            if bounds:
-                (min_lat, min_lon), (max_lat, max_lon) = bounds
-                m2.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
-            elif not df_map_filtrado.empty:
-                m2.fit_bounds([[df_map_filtrado["__LAT__"].min(), df_map_filtrado["__LON__"].min()],
-                               [df_map_filtrado["__LAT__"].max(), df_map_filtrado["__LON__"].max()]])
-
-            # Layer control com basemaps e overlays visíveis
-            folium.LayerControl(collapsed=True, position='topleft').add_to(m2)
-            folium_static(m2, width=800, height=600)
+                render_map(("obras", *filtro_chave, *sorted(sidebar_state.items())), build_m2, width=800, height=600,
+                           files=map_files(l for l in page_layers("works") if sidebar_state[l.state_key]))
 
         # =====================================================
         # GRÁFICO MODERNO COM PLOTLY
@@ -1209,109 +1804,29 @@ with tab_map["🏗️ Painel de Obras"]:
         st.markdown("### 📊 Análise de Investimento em Obras")
         
         if c_dtini and c_valor and c_status:
-            try:
-                # Preparar dados para gráficos
-                df_grafico = df_filtrado.copy()
-                df_grafico['valor_numerico'] = df_grafico[c_valor].apply(
-                    lambda x: float(re.sub(r'[^\d,]', '', str(x)).replace(',', '.')) 
-                    if pd.notna(x) and str(x).strip() != '' else 0
-                )
-                
-                # Gráfico 1: Investimento por Ano (se houver anos)
-                if 'ano_extraido' in df_grafico.columns and df_grafico['ano_extraido'].notna().any():
-                    invest_por_ano = df_grafico.groupby('ano_extraido')['valor_numerico'].sum().reset_index()
-                    invest_por_ano = invest_por_ano.sort_values('ano_extraido')
-                    
-                    fig_ano = px.bar(
-                        invest_por_ano,
-                        x='ano_extraido',
-                        y='valor_numerico',
-                        title='<b>💰 Investimento por Ano</b>',
-                        labels={'ano_extraido': 'Ano', 'valor_numerico': 'Valor Investido (R$)'},
-                        color='valor_numerico',
-                        color_continuous_scale='viridis'
-                    )
-                    
-                    fig_ano.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(color='#2c3e50'),
-                        showlegend=False,
-                        height=480
-                    )
-                    
-                    fig_ano.update_traces(
-                        hovertemplate='<b>Ano %{x}</b><br>Valor: R$ %{y:,.2f}<extra></extra>',
-                        texttemplate='R$ %{y:,.0f}',
-                        textposition='outside'
-                    )
-                    
-                    st.plotly_chart(fig_ano, use_container_width=True)
-                
-                # Gráfico 2: Investimento por Status/Andamento
-                invest_por_status = df_grafico.groupby(c_status)['valor_numerico'].sum().reset_index()
-                invest_por_status = invest_por_status.sort_values('valor_numerico', ascending=False)
-                
-                fig_status = px.pie(
-                    invest_por_status,
-                    values='valor_numerico',
-                    names=c_status,
-                    title='<b>📊 Distribuição por Andamento</b>',
-                    hole=0.4,
-                    color_discrete_sequence=px.colors.sequential.Viridis
-                )
+            with perf.stage("charts"):
+                try:
+                    fig_ano, fig_status, fig_contagem = obras_figures(cubo, filtro_cubo, c_status, celulas)
+
+                    # Gráfico 1: Investimento por Ano (se houver anos)
+                    if fig_ano is not None:
+                        with perf.stage("charts:envio"):
+                            st.plotly_chart(fig_ano, use_container_width=True)
                 
-                fig_status.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color='#2c3e50'),
-                    height=460,
-                    showlegend=True
-                )
-                
-                fig_status.update_traces(
-                    hovertemplate='<b>%{label}</b><br>Valor: R$ %{value:,.2f}<br>Percentual: %{percent}<extra></extra>',
-                    textinfo='percent+label'
-                )
-                
-                col_grafico1, col_grafico2 = st.columns(2)
-                
-                with col_grafico1:
-                    st.plotly_chart(fig_status, use_container_width=True)
-                
-                # Gráfico 3: Quantidade de Obras por Status
-                contagem_status = df_grafico[c_status].value_counts().reset_index()
-                contagem_status.columns = [c_status, 'quantidade']
+                    # Gráfico 2: Investimento por Status/Andamento
+                    col_grafico1, col_grafico2 = st.columns(2)
                 
-                fig_contagem = px.bar(
-                    contagem_status,
-                    x=c_status,
-                    y='quantidade',
-                    title='<b>📈 Quantidade de Obras por Andamento</b>',
-                    labels={c_status: 'Status', 'quantidade': 'Quantidade de Obras'},
-                    color='quantidade',
-                    color_continuous_scale='plasma'
-                )
-                
-                fig_contagem.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color='#2c3e50'),
-                    showlegend=False,
-                    height=480
-                )
+                    with col_grafico1:
+                        with perf.stage("charts:envio"):
+                            st.plotly_chart(fig_status, use_container_width=True)
                 
-                fig_contagem.update_traces(
-                    hovertemplate='<b>%{x}</b><br>Quantidade: %{y} obras<extra></extra>',
-                    texttemplate='%{y}',
-                    textposition='outside'
-                )
-                
-                with col_grafico2:
-                    st.plotly_chart(fig_contagem, use_container_width=True)
+                    # Gráfico 3: Quantidade de Obras por Status
+                    with col_grafico2:
+                        with perf.stage("charts:envio"):
+                            st.plotly_chart(fig_contagem, use_container_width=True)
                     
-            except Exception as e:
-                st.error(f"Erro ao gerar gráficos: {e}")
+                except Exception as e:
+                    st.error(f"Erro ao gerar gráficos: {e}")
 
         # =====================================================
         # TABELA FILTRADA
@@ -1319,11 +1834,7 @@ with tab_map["🏗️ Painel de Obras"]:
         st.markdown("### 📋 Tabela de Obras")
         
         # Mostrar contagem de obras filtradas
-        filtro_info_tabela = []
-        if ano_selecionado != "Todos":
-            filtro_info_tabela.append(f"Ano: {ano_selecionado}")
-        if status_selecionado != "Todos":
-            filtro_info_tabela.append(f"Andamento: {status_selecionado}")
+        filtro_info_tabela = filtro_info
         
         if filtro_info_tabela:
             st.write(f"**🎯 Mostrando {len(df_filtrado)} obra(s) - {' | '.join(filtro_info_tabela)}**")
@@ -1337,16 +1848,27 @@ with tab_map["🏗️ Painel de Obras"]:
             priority = [c_obra, c_status, c_empresa, c_valor, c_bairro, c_dtini, c_dtfim]
             
         ordered = [c for c in priority if c and c in df_filtrado.columns]
-        rest = [c for c in df_filtrado.columns if c not in ordered and c not in ['ano_extraido', '__LAT__', '__LON__']]
+        rest = [c for c in df_filtrado.columns if c not in ordered and c not in ['ano_extraido', *OBRAS_INTERNAL_COLS]]
         
-        st.dataframe(df_filtrado[ordered + rest] if ordered else df_filtrado, use_container_width=True)
+        st.dataframe(df_filtrado[ordered + rest] if ordered else df_filtrado[rest], use_container_width=True)
+
+        # Exportação da tabela filtrada (gerada no clique, em cache por filtro e versão do CSV)
+        x1, x2 = st.columns([1, 2])
+        fmt_obras = x1.selectbox("Formato", list(FORMATS), index=2, key="export_obras_formato")
+        filtro_obras = (*filtro_chave, sidebar_state["distrito"], vista)
+        ext, mime = FORMATS[fmt_obras]
+        x2.download_button(
+            f"⬇️ Baixar {len(df_filtrado)} obra(s) em {fmt_obras}",
+            data=lambda: _read_file(export_obras(df_filtrado, fmt_obras, filtro_obras)),
+            file_name=f"obras{ext}", mime=mime, key="export_obras_baixar", use_container_width=True,
+        )
     else:
         st.error(f"❌ Não foi possível carregar o CSV de obras em: {CSV_OBRAS}")
 
 # =====================================================
 # 3) Milhã em Mapas
 # =====================================================
-with tab_map["🗺️ Milhã em Mapas"]:
+if active_tab == "maps":
     def render_card(title_html: str, body_html: str):
         st.markdown(
             f"""
@@ -1363,313 +1885,92 @@ with tab_map["🗺️ Milhã em Mapas"]:
         "<p>Explore as camadas territoriais, infraestrutura e recursos hídricos do município</p>",
     )
 
+    # Indicadores por distrito (pré-calculados; trocar de distrito só muda a linha exibida).
+    # Só entram os blocos das camadas já ligadas nesta sessão.
+    stats = district_stats(loaded_layers(sidebar_state))
+    if stats is not None:
+        with st.expander("📊 Indicadores por distrito", expanded=bool(sidebar_state["distrito"])):
+            if sidebar_state["distrito"] in stats.index:
+                row = stats.loc[sidebar_state["distrito"]]
+                st.markdown(f"#### 📍 {row['NM_DIST']}")
+                metrics = [(label, fmt(row[col])) for label, col, fmt in DISTRICT_STAT_METRICS if col in stats.columns]
+                for box, (label, value) in zip(st.columns(4), metrics):
+                    box.metric(label, value)
+            if len(stats.columns) < len(DISTRICT_STAT_LABELS):
+                st.caption("Os demais indicadores aparecem quando as camadas correspondentes são ligadas.")
+            st.dataframe(
+                stats.rename(columns=DISTRICT_STAT_LABELS),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "Investimento (R$)": st.column_config.NumberColumn(format="R$ %.2f"),
+                    "Profundidade média (m)": st.column_config.NumberColumn(format="%.1f"),
+                    "Vazão média (L/h)": st.column_config.NumberColumn(format="%.0f"),
+                    "Espelhos d'Água (ha)": st.column_config.NumberColumn(format="%.2f"),
+                },
+            )
+
     if "m3_view" not in st.session_state:
         st.session_state["m3_view"] = {"center": [-5.680, -39.200], "zoom": 11}
 
-    base_dir_candidates = ["dados", "/mnt/data"]
-    files = {
-        "Distritos": "milha_dist_polig.geojson",
-        "Sede Distritos": "Distritos_pontos.geojson",
-        "Localidades": "Localidades.geojson",
-        "Áreas Urbanas": "milha_urbanas.geojson",
-        "Escolas": "Escolas_publicas.geojson",
-        "Unidades de Saúde": "Unidades_saude.geojson",
-        "Tecnologias Sociais": "teclogias_sociais.geojson",
-        "Poços Cidade": "pocos_cidade_mil.geojson",
-        "Poços Zona Rural": "pocos_rural_mil.geojson",
-        "Estradas": "estradas_milha.geojson",
-        "Outorgas Vigentes": "outorgas_milha.geojson",
-        "Espelhos d'Água": "espelhos_dagua.geojson",
-    }
-    data_geo = {
-        name: load_geojson_any([os.path.join(b, fname) for b in base_dir_candidates])
-        for name, fname in files.items()
-    }
+    def build_m3():
+        center = st.session_state["m3_view"]["center"]
+        zoom = st.session_state["m3_view"]["zoom"]
 
-    center = st.session_state["m3_view"]["center"]
-    zoom = st.session_state["m3_view"]["zoom"]
+        m3 = folium.Map(
+            location=center,
+            zoom_start=zoom,
+            tiles=None,
+            control_scale=True
+        )
 
-    m3 = folium.Map(
-        location=center,
-        zoom_start=zoom,
-        tiles=None,
-        control_scale=True
+        add_all_base_tiles(m3)
+
+        if sidebar_state["enable_fullscreen"]:
+            Fullscreen(position='topleft').add_to(m3)
+        if sidebar_state["enable_measure"]:
+            MeasureControl(
+                primary_length_unit="meters",
+                secondary_length_unit="kilometers",
+                primary_area_unit="hectares",
+                position='topleft'
+            ).add_to(m3)
+        if sidebar_state["enable_draw"]:
+            Draw(export=True, position='topright').add_to(m3)
+        if sidebar_state["show_coords"]:
+            MousePosition(position='bottomleft').add_to(m3)
+
+        cd_dist = sidebar_state["distrito"]
+        m3_level = geom_level(zoom=zoom)
+        if DISTRICT_FILE in data_files(DATA_DIR_CANDIDATES):
+            b = district_bounds(cd_dist)
+            if b:
+                (min_lat, min_lon), (max_lat, max_lon) = b
+                m3.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
+                m3_level = geom_level(bounds=b)
+
+        # Overlays no controle (recortados pelo distrito escolhido, se houver); os arquivos
+        # das camadas ligadas são lidos juntos antes de desenhar
+        layers = [layer for layer in page_layers("maps") if sidebar_state[layer.state_key]]
+        prefetch_layers(layers)
+        for layer in layers:
+            add_layer(m3, layer, m3_level, cd_dist)
+
+        # Controle de camadas com basemaps e overlays
+        folium.LayerControl(collapsed=True, position='topleft').add_to(m3)
+        return m3
+
+    m3_view = st.session_state["m3_view"]
+    render_map(
+        ("mapas", tuple(m3_view["center"]), m3_view["zoom"], *sorted(sidebar_state.items())),
+        build_m3, width=1200, height=700,
+        files=map_files(l for l in page_layers("maps") if sidebar_state[l.state_key]),
     )
 
-    add_all_base_tiles(m3)
-
-    if sidebar_state["enable_fullscreen"]:
-        Fullscreen(position='topleft').add_to(m3)
-    if sidebar_state["enable_measure"]:
-        MeasureControl(
-            primary_length_unit="meters",
-            secondary_length_unit="kilometers",
-            primary_area_unit="hectares",
-            position='topleft'
-        ).add_to(m3)
-    if sidebar_state["enable_draw"]:
-        Draw(export=True, position='topright').add_to(m3)
-    if sidebar_state["show_coords"]:
-        MousePosition(position='bottomleft').add_to(m3)
-
-    if data_geo.get("Distritos"):
-        b = geojson_bounds(data_geo["Distritos"])
-        if b:
-            (min_lat, min_lon), (max_lat, max_lon) = b
-            m3.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
-
-# Overlays no controle
-    if sidebar_state["show_distritos"] and data_geo.get("Distritos"):
-        fg_d = FG("Distritos", True)
-        folium.GeoJson(
-            data_geo["Distritos"],
-            name="Distritos",
-            style_function=lambda x: {"fillColor": "#9fe2fc", "fillOpacity": 0.2, "color": "#000000", "weight": 1},
-            
-        ).add_to(fg_d)
-        fg_d.add_to(m3)
-
-    if sidebar_state["show_sede"] and data_geo.get("Sede Distritos"):
-        fg_sd = FG("Sede Distritos", True)
-        for ftr in data_geo["Sede Distritos"]["features"]:
-            x, y = ftr["geometry"]["coordinates"]
-            nome = ftr["properties"].get("nome_do_distrito", "Sede")
-            folium.Marker([y, x], tooltip=nome, icon=folium.Icon(color="green", icon="home")).add_to(fg_sd)
-        fg_sd.add_to(m3)
-
-    if sidebar_state["show_localidades"] and data_geo.get("Localidades"):
-        fg_loc = FG("Localidades", True)
-        for ftr in data_geo["Localidades"]["features"]:
-            coords = ftr["geometry"]["coordinates"]
-            props = ftr["properties"]
-            nome = props.get("Localidade", "Localidade")
-            distrito = props.get("Distrito", "Não informado")
-            
-            popup_info = f"""
-            <div style='font-family: Arial, sans-serif; border: 2px solid #4CAF50; border-radius: 8px; padding: 8px; background-color: #f0fff0;'>
-            <h4 style='margin-top: 0; margin-bottom: 8px; color: #2E7D32;'>🏘️ Localidade</h4>
-            <p style='margin: 4px 0;'><strong>📛 Nome:</strong> {nome}</p>
-            <p style='margin: 4px 0;'><strong>📍 Distrito:</strong> {distrito}</p>
-            </div>
-            """
-            
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                tooltip=nome,
-                popup=folium.Popup(popup_info, max_width=300),
-                icon=folium.CustomIcon("https://i.ibb.co/kgbmmjWc/location-icon-242304.png", icon_size=(18, 18))
-            ).add_to(fg_loc)
-        fg_loc.add_to(m3)
-
-    if sidebar_state["show_urbanas"] and data_geo.get("Áreas Urbanas"):
-        fg_urbanas = FG("Áreas Urbanas", True)
-        folium.GeoJson(
-            data_geo["Áreas Urbanas"],
-            name="Áreas Urbanas",
-            style_function=lambda x: {
-                "fillColor": "#FF69B4",
-                "fillOpacity": 0.3,
-                "color": "#8B008B",
-                "weight": 2,
-                "opacity": 0.8
-            },
-            tooltip=folium.GeoJsonTooltip(
-                fields=list(data_geo["Áreas Urbanas"]["features"][0]["properties"].keys())[:3],
-                aliases=["Propriedade:"] * 3,
-                style=("font-family: Arial; font-size: 12px;")
-            )
-        ).add_to(fg_urbanas)
-        fg_urbanas.add_to(m3)
-
-    if sidebar_state["show_estradas"] and data_geo.get("Estradas"):
-        fg_estr = FG("Estradas", True)
-        folium.GeoJson(
-            data_geo["Estradas"],
-            name="Estradas",
-            style_function=lambda x: {
-                "color": "#8B4513",
-                "weight": 2,
-                "opacity": 0.8
-            },
-            tooltip=folium.GeoJsonTooltip(
-                fields=list(data_geo["Estradas"]["features"][0]["properties"].keys())[:3],
-                aliases=["Propriedade:"] * 3
-            )
-        ).add_to(fg_estr)
-        fg_estr.add_to(m3)
-
-    if sidebar_state["show_escolas"] and data_geo.get("Escolas"):
-        fg_esc = FG("Escolas Públicas", True)
-        for ftr in data_geo["Escolas"]["features"]:
-            x, y = ftr["geometry"]["coordinates"]
-            props = ftr["properties"]
-            nome = props.get("no_entidad", props.get("Name", "Escola"))
-            
-            popup_info = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #2A4D9B; border-radius: 8px; padding: 8px; background-color: #f9f9f9;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #2A4D9B; border-bottom: 1px solid #ccc;'>🏫 Escola Municipal</h4>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📛 Nome:</span> " + props.get("nome_da_escola", "Não informado") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📍 Endereço:</span> " + props.get("endereco", "Não informado") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📞 Contato:</span> " + str(props.get("telefone", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>🧭 Modalidade:</span> " + props.get("modalidade", "Não informado") + "</p>"
-                "</div>"
-            )
-            
-            folium.Marker(
-                location=[y, x],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=nome,
-                icon=folium.CustomIcon(
-                    "https://i.ibb.co/pBsQcQws/education.png",
-                    icon_size=(35, 35)
-                )
-            ).add_to(fg_esc)
-        fg_esc.add_to(m3)
-
-    if sidebar_state["show_unidades_saude"] and data_geo.get("Unidades de Saúde"):
-        fg_saude = FG("Unidades de Saúde", True)
-        for ftr in data_geo["Unidades de Saúde"]["features"]:
-            x, y = ftr["geometry"]["coordinates"]
-            props = ftr["properties"]
-            nome = props.get("nome", props.get("Name", "Unidade"))
-            
-            popup = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #2A4D9B; border-radius: 8px; padding: 8px; background-color: #f9f9f9;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #2A4D9B; border-bottom: 1px solid #ccc;'>🏥 Unidades de Saúde</h4>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📛 Unidade:</span> " + props.get("unidade", "Não informado") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📍 Endereço:</span> " + props.get("endereeo", "Não informado") + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>📞 Bairro:</span> " + str(props.get("bairro", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><span style='color: #2A4D9B; font-weight: bold;'>🧭 Município:</span> " + props.get("municipio", "Não informado") + "</p>"
-                "</div>"
-            )
-            
-            folium.Marker(
-                location=[y, x],
-                popup=folium.Popup(popup, max_width=300),
-                tooltip=nome,
-                icon=folium.CustomIcon(
-                    "https://i.ibb.co/rGdw6d71/hospital.png",
-                    icon_size=(35, 35)
-                )
-            ).add_to(fg_saude)
-        fg_saude.add_to(m3)
-
-    if sidebar_state["show_tecnologias"] and data_geo.get("Tecnologias Sociais"):
-        fg_tec = FG("Tecnologias Sociais", True)
-        for ftr in data_geo["Tecnologias Sociais"]["features"]:
-            x, y = ftr["geometry"]["coordinates"]
-            props = ftr["properties"]
-            nome = props.get("Comunidade", props.get("Name", "Tecnologia Social"))
-            popup = "<div style='font-family:Arial;font-size:13px'><b>Local:</b> {}</div>".format(nome)
-            folium.Marker([y, x], tooltip=nome, popup=popup, icon=folium.Icon(color="orange", icon="tint")).add_to(fg_tec)
-        fg_tec.add_to(m3)
-
-    if sidebar_state["show_outorgas"] and data_geo.get("Outorgas Vigentes"):
-        fg_out = FG("Outorgas Vigentes", True)
-        for ftr in data_geo["Outorgas Vigentes"]["features"]:
-            props = ftr["properties"]
-            coords = ftr["geometry"]["coordinates"]
-            lng, lat = coords[0], coords[1]
-
-            popup_content = f"""
-            <div style='font-family:Arial;font-size:12px;max-width:300px'>
-                <b>Requerente:</b> {props.get('REQUERENTE', 'N/A')}<br>
-                <b>Tipo Manancial:</b> {props.get('TIPO MANANCIAL', 'N/A')}<br>
-                <b>Tipo de Uso:</b> {props.get('TIPO DE USO', 'N/A')}<br>
-                <b>Manancial:</b> {props.get('MANANCIAL', 'N/A')}<br>
-                <b>Fim da Vigência:</b> {props.get('FIM DA VIGÊNCIA', 'N/A')}<br>
-                <b>Volume Outorgado:</b> {props.get('VOLUME OUTORGADO (m³)', 'N/A')} m³
-            </div>
-            """
-
-            tipo_uso = props.get('TIPO DE USO', '').upper()
-            if 'IRRIGACAO' in tipo_uso:
-                icon_color = 'green'
-            elif 'ABASTECIMENTO_HUMANO' in tipo_uso:
-                icon_color = 'blue'
-            elif 'INDUSTRIA' in tipo_uso:
-                icon_color = 'red'
-            elif 'SERVICO_E_COMERCIO' in tipo_uso:
-                icon_color = 'purple'
-            else:
-                icon_color = 'gray'
-
-            folium.Marker(
-                [lat, lng],
-                tooltip=props.get('REQUERENTE', 'Outorga'),
-                popup=folium.Popup(popup_content, max_width=300),
-                icon=folium.Icon(color=icon_color, icon='file-text', prefix='fa')
-            ).add_to(fg_out)
-        fg_out.add_to(m3)
-
-    if sidebar_state["show_espelhos"] and data_geo.get("Espelhos d'Água"):
-        fg_esp = FG("Espelhos d'Água", True)
-        folium.GeoJson(
-            data_geo["Espelhos d'Água"],
-            name="Espelhos d'Água",
-            style_function=lambda x: {
-                "fillColor": "#1E90FF",
-                "fillOpacity": 0.7,
-                "color": "#000080",
-                "weight": 2,
-                "opacity": 0.8
-            },
-            tooltip=folium.GeoJsonTooltip(
-                fields=["CODIGOES0", "AREA1"],
-                aliases=["Código:", "Área (ha):"],
-                style=("font-family: Arial; font-size: 12px;")
-            )
-        ).add_to(fg_esp)
-        fg_esp.add_to(m3)
-
-    if sidebar_state["show_pocos_cidade"] and data_geo.get("Poços Cidade"):
-        fg_pc = FG("Poços Cidade", True)
-        for ftr in data_geo["Poços Cidade"]["features"]:
-            x, y = ftr["geometry"]["coordinates"]
-            props = ftr["properties"]
-            nome = props.get("Localidade", props.get("Name", "Poço"))
-            popup = (
-                "<div style='font-family:Arial;font-size:13px'>"
-                f"<b>Localidade:</b> {nome}<br>"
-                f"<b>Profundidade:</b> {props.get('Profundida','-')}<br>"
-                f"<b>Vazão (L/h):</b> {props.get('Vazão_LH_2','-')}"
-                "</div>"
-            )
-            folium.Marker([y, x], tooltip=nome, popup=popup, icon=folium.Icon(color="blue", icon="tint")).add_to(fg_pc)
-        fg_pc.add_to(m3)
-
-    if sidebar_state["show_pocos_rural"] and data_geo.get("Poços Zona Rural"):
-        fg_pr = FG("Poços Zona Rural", True)
-        for ftr in data_geo["Poços Zona Rural"]["features"]:
-            coords = ftr["geometry"]["coordinates"]
-            props = ftr["properties"]
-    
-            popup_info = (
-                "<div style='font-family: Arial, sans-serif; border: 2px solid #0059b3; border-radius: 8px; padding: 8px; background-color: #f0f8ff;'>"
-                "<h4 style='margin-top: 0; margin-bottom: 8px; color: #0059b3; border-bottom: 1px solid #ccc;'>💧 Poço Rural</h4>"
-                "<p style='margin: 4px 0;'><strong>📍 Localidade:</strong> " + str(props.get("Localidade", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>📏 Profundidade:</strong> " + str(props.get("Profundida_m", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>💦 Vazão (L/h):</strong> " + str(props.get("Vazão_LH", "Não informado")) + "</p>"
-                "<p style='margin: 4px 0;'><strong>⚡ Energia:</strong> " + str(props.get("Energia", "Não informado")) + "</p>"
-                "</div>"
-            )
-    
-            folium.Marker(
-                location=[coords[1], coords[0]],
-                popup=folium.Popup(popup_info, max_width=300),
-                tooltip=props.get("Localidade", "Poço Rural"),
-                icon=folium.CustomIcon("https://i.ibb.co/6JrpxXMT/water.png", icon_size=(23, 23))
-            ).add_to(fg_pr)
-        fg_pr.add_to(m3)
-
-    # Controle de camadas com basemaps e overlays
-    folium.LayerControl(collapsed=True, position='topleft').add_to(m3)
-    folium_static(m3, width=1200, height=700)
-
 # =====================================================
 # 1) Página Inicial — espaçamento ampliado entre containers
 # =====================================================
-with tab_map["🏠 Página Inicial"]:
+if active_tab == "home":
     PRIMARY = "#2A4D9B"
     PRIMARY_2 = "#1a326a"
     TEXT = "#1f2937"
@@ -1779,7 +2080,11 @@ with tab_map["🏠 Página Inicial"]:
     """, unsafe_allow_html=True)
 
     # ---------- KPIs ----------
-    k_camadas, k_mapas, k_update = 42, 12, "10/11/2025"
+    # Só nomes de arquivo: os KPIs não leem nenhuma camada
+    arquivos = data_files(DATA_DIR_CANDIDATES)
+    k_camadas = sum(1 for name in arquivos if name.lower().endswith(".geojson"))
+    k_mapas = sum(1 for layer in LAYERS if layer.file in arquivos)
+    k_update = obras_updated_label()
     st.markdown(f"""
     <div class="kpis">
       <div class="kpi"><div class="lbl">Camadas publicadas</div><div class="val">🧩 {k_camadas}</div></div>
@@ -1869,6 +2174,27 @@ with tab_map["🏠 Página Inicial"]:
           </div>
         """, unsafe_allow_html=True)
 
+        # Camada e distrito a exportar; o arquivo só é gerado no clique (e fica em cache em disco)
+        fmt = st.session_state.formato_selecionado
+        arquivos = data_files(DATA_DIR_CANDIDATES)
+        exportaveis = [layer.key for layer in LAYERS if all(f in arquivos for f in layer.files)]
+        join = get_district_index()
+        distritos = {} if join is None else dict(zip(join.districts["CD_DIST"], join.districts["NM_DIST"]))
+        e1, e2 = st.columns(2)
+        camada = e1.selectbox("Camada", exportaveis, format_func=lambda k: LAYER_BY_KEY[k].name, key="export_camada")
+        distrito_export = e2.selectbox(
+            "Distrito", ["", *distritos], format_func=lambda c: distritos.get(c, "Todos os distritos"),
+            key="export_distrito",
+        )
+        if camada:
+            ext, mime = FORMATS[fmt]
+            nome = f"{camada}_{distrito_export}" if distrito_export else camada
+            st.download_button(
+                f"⬇️ Baixar {LAYER_BY_KEY[camada].name} ({descricoes[fmt]['titulo'].split(' ', 1)[1]})",
+                data=lambda: _read_file(export_layer(camada, fmt, distrito_export)),
+                file_name=f"{nome}{ext}", mime=mime, key="export_baixar", use_container_width=True,
+            )
+
 
 # =====================================================
 # Rodapé
@@ -1887,3 +2213,36 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+
+# =====================================================
+# Desempenho do rerun (?debug=perf)
+# =====================================================
+if PERF_DEBUG or perf.LOG_PATH:
+    rec = st.session_state["perf"]
+    ctx = get_script_run_ctx()
+    perf.log(rec, session=ctx.session_id if ctx else "", page=st.session_state.page, tab=active_tab)
+
+if PERF_DEBUG:
+    with st.expander("⏱️ Desempenho deste rerun", expanded=True):
+        st.metric("Tempo total", f"{rec.total() * 1000:.0f} ms")
+        etapas = pd.DataFrame(
+            [(perf.group(k), k, v * 1000) for k, v in rec.stages.items()],
+            columns=["Grupo", "Etapa", "ms"],
+        ).sort_values("ms", ascending=False)
+        st.dataframe(etapas, hide_index=True, use_container_width=True,
+                     column_config={"ms": st.column_config.NumberColumn(format="%.1f")})
+        caches = pd.DataFrame(
+            [(nome, c["hit"], c["miss"]) for nome, c in sorted(rec.caches().items())],
+            columns=["Cache", "Acertos", "Faltas"],
+        )
+        st.dataframe(caches, hide_index=True, use_container_width=True)
+        ls, mc, ex = get_layer_store().stats(), get_map_cache().stats(), get_export_cache().stats()
+        pub, ob = get_static_atlas().stats(), get_obras_registry(CSV_OBRAS).stats()
+        st.caption(
+            f"Camadas em memória: {ls['entries']} ({ls['bytes'] / 2**20:.0f} MiB, {ls['evictions']} descartes) • "
+            f"Mapas em cache: {mc['entries']} ({mc['bytes'] / 2**20:.1f} MiB, {mc['evictions']} descartes) • "
+            f"Exportações em disco: {ex['entries']} ({ex['bytes'] / 2**20:.1f} MiB, {ex['evictions']} descartes) • "
+            f"Mapas publicados: {pub['entries']} ({pub['hits']} servidos{', via ' + pub['url'] if pub['url'] else ''}) • "
+            f"Cadastro de obras: {ob['rows']} linhas, {ob['full']} carga(s) completa(s), "
+            f"{ob['incremental']} incremental(is) ({ob['reused']} linhas reaproveitadas, {ob['ingested']} processadas)"
+        )
@@ -0,0 +1,267 @@
+# =====================================================
+# Benchmark: reruns completos das abas via AppTest, sem navegador
+# =====================================================
+# Uso:
+#   python benchmark.py                      # roda e compara com benchmarks/baseline.json
+#   python benchmark.py --save               # grava o resultado como nova baseline
+#   python benchmark.py --scales 1 10 100    # dados sintéticos escalados a partir de dados/
+#   python benchmark.py --only mapas         # só cenários cujo nome contém "mapas"
+#   python benchmark.py 2>/dev/null          # esconde os avisos do Streamlit (vão para stderr)
+#
+# Cada cenário roda numa cópia de `dados/` (escalada ou não) com os caches do Streamlit
+# zerados ("frio") e depois de novo sem mexer em nada ("quente"). São medidos o tempo
+# total, o tempo por etapa (perf.stage no app), o pico de memória Python (tracemalloc,
+# numa passada à parte) e os bytes enviados ao navegador (HTML dos mapas e página toda).
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import sintetico
+from registro import LAYERS
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "baseline.json")
+
+# Tolerâncias antes de acusar regressão (relativa, e piso absoluto para ruído)
+TOLERANCE = {"ms": (0.50, 100.0), "bytes": (0.05, 1024), "peak_mb": (0.25, 2.0)}
+
+LAYER_KEYS = [layer.widget_key for layer in LAYERS]
+
+# nome -> (aba, {chave do widget: valor}); checkboxes recebem bool, selectboxes o valor
+SCENARIOS = {
+    "mapas-padrao": ("maps", {}),
+    "mapas-tudo": ("maps", {k: True for k in LAYER_KEYS}),
+    "mapas-tudo-canvas": ("maps", {**{k: True for k in LAYER_KEYS}, "sidebar_point_mode": "canvas"}),
+    "mapas-tudo-distrito": ("maps", {**{k: True for k in LAYER_KEYS}, "sidebar_distrito": "230835108"}),
+    "obras-padrao": ("works", {}),
+    "obras-tudo": ("works", {k: True for k in LAYER_KEYS}),
+}
+
+
+# =====================================================
+# Dados sintéticos
+# =====================================================
+def scale_dataset(src_dir: str, dst_dir: str, factor: int, seed: int = 0):
+    """`src_dir` copiado como está (fator 1) ou gerado por sintetico.py com `factor` vezes os registros."""
+    if factor == 1:
+        shutil.copytree(src_dir, dst_dir, dirs_exist_ok=True)
+    else:
+        sintetico.generate(src_dir, dst_dir, factor, seed)
+
+
+# =====================================================
+# Execução dos cenários
+# =====================================================
+@contextmanager
+def _cwd(path: str):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+def _clear_caches():
+    import streamlit as st
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+def walk(node):
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        for child in children.values():
+            yield child
+            yield from walk(child)
+
+
+def _payload(at) -> dict:
+    html = page = 0
+    for node in walk(at._tree):
+        proto = getattr(node, "proto", None)
+        if proto is None or not hasattr(proto, "ByteSize"):
+            continue
+        page += proto.ByteSize()
+        if getattr(node, "type", None) == "iframe":
+            html += len(proto.srcdoc)
+    return {"map_html_bytes": html, "page_bytes": page}
+
+
+def apply_settings(at, settings: dict):
+    for key, value in settings.items():
+        if isinstance(value, bool):
+            box = at.checkbox(key=key)
+            box.check() if value else box.uncheck()
+        else:
+            at.selectbox(key=key).set_value(value)
+
+
+def _timed_run(at) -> dict:
+    t0 = time.perf_counter()
+    at.run()
+    ms = (time.perf_counter() - t0) * 1000
+    if at.exception:
+        raise RuntimeError(f"exceção no app: {at.exception[0].value}")
+    stages = at.session_state["perf"].grouped() if "perf" in at.session_state else {}
+    return {"ms": ms, "stages_ms": {k: v * 1000 for k, v in stages.items()}, **_payload(at)}
+
+
+def session(tab: str, settings: dict):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=600)
+    at.query_params["page"] = tab
+    at.query_params["tab"] = tab
+    at.run()
+    apply_settings(at, settings)
+    return at
+
+
+def run_scenario(tab: str, settings: dict, repeat: int = 3) -> dict:
+    """Tempos frio/quente, etapas, memória e payload de um cenário (no diretório corrente)."""
+    at = session(tab, settings)
+    _clear_caches()
+    cold = _timed_run(at)
+    warm = [_timed_run(at) for _ in range(repeat)]
+
+    at = session(tab, settings)
+    _clear_caches()
+    tracemalloc.start()
+    at.run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "cold_ms": cold["ms"],
+        "warm_ms": statistics.median(w["ms"] for w in warm),
+        "stages_ms": cold["stages_ms"],
+        "peak_mb": peak / 2 ** 20,
+        "map_html_bytes": cold["map_html_bytes"],
+        "page_bytes": cold["page_bytes"],
+    }
+
+
+def filter_scenarios(tab_settings=None) -> dict:
+    """Um cenário por combinação de ano x andamento oferecida na aba de obras."""
+    at = session("works", tab_settings or {})
+    anos = at.selectbox(key="filtro_ano").options
+    status = at.selectbox(key="filtro_status").options
+    return {
+        f"obras-filtro[{a}|{s}]": ("works", {"filtro_ano": a, "filtro_status": s})
+        for a in anos for s in status if (a, s) != ("Todos", "Todos")
+    }
+
+
+def run_all(data_dir: str, scales, only=None, repeat=3, filters=True) -> dict:
+    results = {}
+    for factor in scales:
+        with tempfile.TemporaryDirectory(prefix=f"atlas-bench-x{factor}-") as tmp:
+            scale_dataset(data_dir, os.path.join(tmp, "dados"), factor)
+            with _cwd(tmp):
+                scenarios = dict(SCENARIOS)
+                if filters and factor == scales[0]:
+                    scenarios.update(filter_scenarios())
+                session("maps", {})  # aquecimento: imports e cache colunar em disco
+                for name, (tab, settings) in scenarios.items():
+                    if only and not any(o in name for o in only):
+                        continue
+                    key = f"x{factor}/{name}"
+                    results[key] = run_scenario(tab, settings, repeat)
+                    r = results[key]
+                    print(f"{key:<48} frio {r['cold_ms']:8.0f} ms  quente {r['warm_ms']:7.0f} ms  "
+                          f"pico {r['peak_mb']:6.1f} MiB  mapa {r['map_html_bytes'] / 1024:7.0f} KiB", flush=True)
+    return results
+
+
+# =====================================================
+# Baseline
+# =====================================================
+def _metrics(r: dict) -> dict:
+    return {
+        "cold_ms": ("ms", r["cold_ms"]),
+        "warm_ms": ("ms", r["warm_ms"]),
+        "peak_mb": ("peak_mb", r["peak_mb"]),
+        "map_html_bytes": ("bytes", r["map_html_bytes"]),
+        "page_bytes": ("bytes", r["page_bytes"]),
+    }
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Lista de (cenário, métrica, baseline, atual) que pioraram além da tolerância."""
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric, (kind, value) in _metrics(r).items():
+            old = base.get(metric)
+            if old is None:
+                continue
+            rel, floor = TOLERANCE[kind]
+            if value > old * (1 + rel) and value - old > floor:
+                regressions.append((key, metric, old, value))
+    return regressions
+
+
+def print_stages(results: dict):
+    names = sorted({s for r in results.values() for s in r["stages_ms"]})
+    print(f"\n{'etapas no rerun frio (ms)':<48}" + "".join(f"{n:>12}" for n in names))
+    for key, r in results.items():
+        print(f"{key:<48}" + "".join(f"{r['stages_ms'].get(n, 0.0):12.0f}" for n in names))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark dos reruns do ATLAS (AppTest).")
+    p.add_argument("--data", default="dados", help="diretório de dados de origem")
+    p.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    p.add_argument("--only", nargs="*", help="roda só cenários cujo nome contém algum destes trechos")
+    p.add_argument("--repeat", type=int, default=3, help="reruns quentes por cenário (mediana)")
+    p.add_argument("--no-filters", action="store_true",
+                   help="pula as combinações de filtros de obras (rodadas só na primeira escala)")
+    p.add_argument("--baseline", default=BASELINE)
+    p.add_argument("--save", action="store_true", help="grava o resultado como baseline")
+    p.add_argument("--out", help="grava o resultado completo em JSON")
+    args = p.parse_args(argv)
+
+    results = run_all(os.path.abspath(args.data), args.scales, args.only, args.repeat, not args.no_filters)
+    print_stages(results)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1, ensure_ascii=False)
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        merged = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+        merged.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(merged, f, indent=1, ensure_ascii=False, sort_keys=True)
+        print(f"\nbaseline gravada em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\nsem baseline para comparar (use --save)")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        regressions = compare(results, json.load(f))
+    if not regressions:
+        print("\nsem regressões em relação à baseline")
+        return 0
+    print("\nREGRESSÕES:")
+    for key, metric, old, new in regressions:
+        print(f"  {key} {metric}: {old:,.1f} -> {new:,.1f} ({(new / old - 1) * 100:+.0f}%)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
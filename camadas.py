@@ -0,0 +1,366 @@
+# =====================================================
+# Camadas do ATLAS: armazenamento compartilhado dos GeoJSON de `dados/`
+# =====================================================
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import numpy as np
+
+import colunar
+import perf
+from geometria import PolygonIndex, feature_bboxes, representative_points, union_bbox
+
+# ATLAS_DATA_DIR troca os diretórios padrão por outro (ex.: um gerado por sintetico.py)
+DATA_DIR = os.environ.get("ATLAS_DATA_DIR", "")
+DATA_DIR_CANDIDATES = [DATA_DIR] if DATA_DIR else ["dados", "/mnt/data"]
+DATA_EXTENSIONS = (".geojson", ".csv")
+
+# Polígonos dos distritos (IBGE) usados na junção ponto -> distrito
+DISTRICT_FILE = "milha_dist_polig.geojson"
+DISTRICT_FIELDS = ["CD_DIST", "NM_DIST"]
+
+# Um GeoJSON decodificado em dicts/listas Python ocupa, em média, várias vezes
+# o tamanho do arquivo em disco; usamos esse fator para estimar o orçamento.
+PARSED_SIZE_FACTOR = 8
+DEFAULT_BUDGET_MB = int(os.environ.get("ATLAS_CACHE_MB", "256"))
+
+# Pré-carga em threads: a leitura do arquivo solta o GIL e se sobrepõe à decodificação
+# de outro, mas o json.loads em si não roda em paralelo. Só ajuda com disco lento (ex.:
+# /mnt/data montado pela rede); com disco local o tempo é o da carga sequencial. Com um
+# núcleo só, a carga é sequencial. Pontos grandes nem passam por aqui (cache colunar).
+LOAD_THREADS = int(os.environ.get("ATLAS_LOAD_THREADS", str(min(8, os.cpu_count() or 1))))
+
+
+class _Entry:
+    __slots__ = ("stamp", "nbytes", "data")
+
+    def __init__(self, stamp, nbytes, data):
+        self.stamp = stamp
+        self.nbytes = nbytes
+        self.data = data
+
+
+class LayerStore:
+    """Cache de GeoJSON por caminho + mtime, compartilhado por todas as sessões.
+
+    Os objetos devolvidos são compartilhados: quem os recebe não deve alterá-los.
+    """
+
+    def __init__(self, budget_mb: int = DEFAULT_BUDGET_MB):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._entries = OrderedDict()
+        self._path_locks = {}
+        self._points = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _stamp(path: str):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self, path: str):
+        key = os.path.abspath(path)
+        stamp = self._stamp(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                perf.hit("camadas")
+                return entry.data
+            path_lock = self._path_locks.setdefault(key, threading.Lock())
+
+        # Um único parse por arquivo, mesmo com várias sessões pedindo ao mesmo tempo
+        with path_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.stamp == stamp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    perf.hit("camadas")
+                    return entry.data
+
+            with perf.stage("load:geojson"):
+                data = colunar.read_geojson(key)
+            perf.miss("camadas")
+
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = _Entry(stamp, stamp[1] * PARSED_SIZE_FACTOR, data)
+                self._entries.move_to_end(key)
+                self._evict(keep=key)
+        return data
+
+    def points(self, path: str):
+        """Camada de pontos `path` no cache colunar (colunar.ColumnarLayer), ou None.
+
+        Para quem só precisa das coordenadas e de alguns atributos: nada é decodificado
+        em dicts. None se o arquivo for pequeno, não for só de pontos ou não puder ser
+        convertido; aí o chamador usa `get`.
+        """
+        key = os.path.abspath(path)
+        stamp = self._stamp(key)
+        with self._lock:
+            memo = self._points.get(key)
+        if memo is not None and memo[0] == stamp:
+            return memo[1]
+        with perf.stage("load:colunar"):
+            layer = colunar.load_points(key)
+        with self._lock:
+            self._points[key] = (stamp, layer)
+        return layer
+
+    def cached(self, path: str) -> bool:
+        key = os.path.abspath(path)
+        try:
+            stamp = self._stamp(key)
+        except OSError:
+            return False
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.stamp == stamp
+
+    def prefetch(self, paths) -> int:
+        """Carrega em threads os arquivos de `paths` que ainda não estão em memória.
+
+        Erros ficam para o `get` seguinte, que os levanta no chamador. Devolve quantos
+        arquivos foram carregados.
+        """
+        missing = [p for p in dict.fromkeys(paths) if os.path.exists(p) and not self.cached(p)]
+        if not missing:
+            return 0
+
+        def load(path):
+            try:
+                self.get(path)
+            except Exception:
+                pass
+
+        if LOAD_THREADS <= 1:
+            for path in missing:
+                load(path)
+        else:
+            with ThreadPoolExecutor(max(1, min(LOAD_THREADS, len(missing)))) as ex:
+                list(ex.map(load, missing))
+        return len(missing)
+
+    def _evict(self, keep: str):
+        total = sum(e.nbytes for e in self._entries.values())
+        while total > self.budget_bytes and len(self._entries) > 1:
+            key, entry = next(iter(self._entries.items()))
+            if key == keep:
+                break
+            del self._entries[key]
+            total -= entry.nbytes
+            self.evictions += 1
+
+    def invalidate(self, path: str = None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._points.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+                self._points.pop(os.path.abspath(path), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e.nbytes for e in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# =====================================================
+# Catálogo de camadas (bbox, contagem, esquema) por versão dos dados
+# =====================================================
+def data_files(dir_candidates=DATA_DIR_CANDIDATES) -> dict:
+    """Nome do arquivo -> caminho; o primeiro diretório que contém o arquivo vence."""
+    files = {}
+    for base in dir_candidates:
+        if not base or not os.path.isdir(base):
+            continue
+        for name in sorted(os.listdir(base)):
+            if name.lower().endswith(DATA_EXTENSIONS) and name not in files:
+                files[name] = os.path.join(base, name)
+    return files
+
+
+def data_version(files: dict) -> str:
+    """Hash curto de (nome, mtime, tamanho) de todos os arquivos de dados."""
+    h = hashlib.sha1()
+    for name, path in sorted(files.items()):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        h.update(f"{name}|{st.st_mtime_ns}|{st.st_size};".encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """sha1 do conteúdo de `path`, recalculado só quando (mtime, tamanho) muda."""
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = os.path.abspath(path)
+    with _digests_lock:
+        memo = _digests.get(key)
+    if memo is not None and memo[0] == stamp:
+        return memo[1]
+    h = hashlib.sha1()
+    with open(key, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    with _digests_lock:
+        _digests[key] = (stamp, h.hexdigest())
+    return h.hexdigest()
+
+
+def content_version(files: dict) -> str:
+    """Como `data_version`, mas pelo conteúdo: cópias, checkouts e rsync sem -t não mudam."""
+    h = hashlib.sha1()
+    for name, path in sorted(files.items()):
+        try:
+            h.update(f"{name}|{file_digest(path)};".encode("utf-8"))
+        except OSError:
+            continue
+    return h.hexdigest()[:12]
+
+
+def _type_label(types: set) -> str:
+    if not types:
+        return "null"
+    if len(types) == 1:
+        return next(iter(types))
+    if types <= {"int", "float"}:
+        return "float"
+    return "mixed"
+
+
+def _property_schema(records) -> dict:
+    seen = {}
+    for props in records:
+        for k, v in (props or {}).items():
+            types = seen.setdefault(k, set())
+            if v is not None:
+                types.add(type(v).__name__)
+    return {k: _type_label(v) for k, v in seen.items()}
+
+
+def geojson_layer_info(gj: dict) -> dict:
+    features = gj.get("features", []) if gj.get("type") == "FeatureCollection" else [gj]
+    bboxes = feature_bboxes(features)
+    crs = ((gj.get("crs") or {}).get("properties") or {}).get("name")
+    return {
+        "kind": "geojson",
+        "crs": crs,
+        "count": len(features),
+        "geometry_types": sorted({(f.get("geometry") or {}).get("type") for f in features} - {None}),
+        "properties": _property_schema(f.get("properties") for f in features),
+        "bbox": union_bbox(bboxes),
+        "feature_bboxes": bboxes,
+    }
+
+
+def csv_layer_info(path: str) -> dict:
+    with open(path, "r", encoding="utf-8-sig") as f:
+        sample = f.read(4096); f.seek(0)
+        sep = ";" if sample.count(";") > sample.count(",") else ","
+        df = pd.read_csv(f, sep=sep)
+    lower = {c.strip().lower(): c for c in df.columns}
+    bbox = None
+    lat, lon = lower.get("latitude"), lower.get("longitude")
+    if lat and lon:
+        y = pd.to_numeric(df[lat], errors="coerce")
+        x = pd.to_numeric(df[lon], errors="coerce")
+        if x.notna().any() and y.notna().any():
+            bbox = (float(x.min()), float(y.min()), float(x.max()), float(y.max()))
+    return {
+        "kind": "csv",
+        "crs": None,
+        "count": len(df),
+        "geometry_types": ["Point"] if bbox else [],
+        "properties": _property_schema(df.astype(object).where(df.notna(), None).to_dict("records")),
+        "bbox": bbox,
+        "feature_bboxes": None,
+    }
+
+
+def layer_info(name: str, path: str, load_geojson) -> dict:
+    """Metadados de um arquivo de dados; `load_geojson(path)` fornece o GeoJSON decodificado."""
+    try:
+        if name.lower().endswith(".csv"):
+            info = csv_layer_info(path)
+        else:
+            info = geojson_layer_info(load_geojson(path))
+    except Exception as e:
+        info = {"kind": "error", "error": str(e), "count": 0, "bbox": None, "properties": {}}
+    info["file"] = name
+    info["path"] = path
+    return info
+
+
+def tooltip_fields(info: dict, n: int = 3) -> list:
+    """Primeiros `n` atributos que têm algum valor preenchido na camada."""
+    if not info:
+        return []
+    return [k for k, t in info.get("properties", {}).items() if t != "null"][:n]
+
+
+def properties_frame(gj: dict, fields) -> pd.DataFrame:
+    """Atributos `fields` de cada feição (linha i = feição i), sem conversão de tipos."""
+    features = gj.get("features", []) if gj.get("type") == "FeatureCollection" else [gj]
+    return pd.DataFrame(
+        [[(f.get("properties") or {}).get(k) for k in fields] for f in features],
+        columns=list(fields),
+    )
+
+
+# =====================================================
+# Junção espacial: distrito de cada feição
+# =====================================================
+class DistrictJoin:
+    """Atribui `CD_DIST`/`NM_DIST` a pontos usando um índice sobre os polígonos dos distritos."""
+
+    def __init__(self, district_gj: dict):
+        self.index = PolygonIndex(district_gj.get("features", []))
+        self.districts = properties_frame(district_gj, DISTRICT_FIELDS)
+
+    def tag(self, xy: np.ndarray) -> pd.DataFrame:
+        """Uma linha por ponto (x, y) com o distrito que o contém (NaN fora de todos)."""
+        pos = self.index.locate(xy)
+        out = self.districts.reindex(pos).reset_index(drop=True)
+        out.insert(0, "x", np.asarray(xy, dtype=float).reshape(-1, 2)[:, 0])
+        out.insert(1, "y", np.asarray(xy, dtype=float).reshape(-1, 2)[:, 1])
+        return out
+
+    def tag_features(self, features) -> pd.DataFrame:
+        """Como `tag`, usando o ponto representativo de cada feição (linha i = feição i)."""
+        return self.tag(representative_points(features))
+
+    def tag_xy(self, xy: np.ndarray):
+        """`tag` de pontos de uma camada; None se as coordenadas forem projetadas (ex.: UTM)."""
+        if len(xy) and np.nanmax(np.abs(xy), initial=0.0) > 180:
+            return None  # os distritos estão em lon/lat
+        return self.tag(xy)
+
+    def tag_layer(self, gj: dict):
+        """`tag_xy` do ponto representativo de cada feição de `gj`."""
+        features = gj.get("features", []) if gj.get("type") == "FeatureCollection" else [gj]
+        return self.tag_xy(representative_points(features))
@@ -0,0 +1,367 @@
+# =====================================================
+# Cache colunar binário dos arquivos de `dados/`
+# =====================================================
+# Cada camada de pontos (GeoJSON) ou CSV vira um diretório com arrays NumPy (.npy,
+# abertos com mmap) e um `meta.json` com o carimbo (mtime, tamanho) do original:
+#
+#   xy.npy            (n, 2) float64 com (x, y) de cada feição (NaN = sem geometria)
+#   c<i>.npy          valores da coluna i (texto: UTF-8 concatenado com NUL)
+#   c<i>.state.npy    0 = chave ausente, 1 = null, 2 = valor (só se houver 0/1)
+#
+# Os consumidores leem só os arrays de que precisam (`point_xy`, `properties_frame`),
+# sem montar o FeatureCollection em dicts: densidade e junção com os distritos usam
+# só as coordenadas. Polígonos e linhas não são convertidos (quem os usa precisa das
+# feições inteiras, e refazê-las a partir dos arrays custa quase o mesmo que o
+# `json.load`), nem arquivos com algo que o formato não representa (membros extras
+# nas feições, ...). Abaixo de MIN_BYTES o parser de texto já é mais rápido que abrir
+# os vários .npy.
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 2
+CACHE_DIR = os.environ.get("ATLAS_COLUMNAR_DIR", os.path.join(".atlas_cache", "colunar"))
+ENABLED = os.environ.get("ATLAS_COLUMNAR", "1") != "0"
+MIN_BYTES = int(os.environ.get("ATLAS_COLUMNAR_MIN_KB", "128")) * 1024
+
+ABSENT, NULL, VALUE = 0, 1, 2
+_SEP = "\x00"
+
+_build_lock = threading.Lock()
+
+
+class Unsupported(ValueError):
+    """O arquivo tem algo que o formato colunar não representa."""
+
+
+def _stamp(path: str):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def cache_path(src: str, cache_dir: str = CACHE_DIR) -> str:
+    src = os.path.abspath(src)
+    digest = hashlib.sha1(src.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(cache_dir, f"{os.path.basename(src)}.{digest}")
+
+
+# =====================================================
+# Colunas de atributos
+# =====================================================
+def _column_kind(values) -> str:
+    kinds = set()
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            kinds.add("bool")
+        elif isinstance(v, int):
+            kinds.add("int" if -(2 ** 63) <= v < 2 ** 63 else "json")
+        elif isinstance(v, float):
+            kinds.add("float")
+        elif isinstance(v, str):
+            kinds.add("str" if _SEP not in v else "json")
+        else:
+            kinds.add("json")
+    if len(kinds) == 1:
+        return kinds.pop()
+    return "json" if kinds else "null"
+
+
+def _encode_text(texts) -> np.ndarray:
+    return np.frombuffer(_SEP.join(texts).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_text(blob: np.ndarray, count: int) -> list:
+    if count == 0:
+        return []
+    return blob.tobytes().decode("utf-8").split(_SEP)
+
+
+def _encode_column(values, state: np.ndarray):
+    """(tipo, array) com os valores presentes de uma coluna de atributos."""
+    kind = _column_kind(values)
+    present = [v for v, s in zip(values, state) if s == VALUE]
+    if kind == "int":
+        return kind, np.asarray(present, dtype=np.int64)
+    if kind == "float":
+        return kind, np.asarray(present, dtype=np.float64)
+    if kind == "bool":
+        return kind, np.asarray(present, dtype=bool)
+    if kind == "str":
+        return kind, _encode_text(present)
+    if kind == "json":
+        return kind, _encode_text(json.dumps(v, ensure_ascii=False) for v in present)
+    return kind, np.empty(0, dtype=np.uint8)
+
+
+def _decode_values(kind: str, arr: np.ndarray, count: int) -> list:
+    """Valores presentes da coluna como objetos Python."""
+    if kind in ("int", "float", "bool"):
+        return arr.tolist()
+    if kind == "str":
+        return _decode_text(arr, count)
+    if kind == "json":
+        return [json.loads(t) for t in _decode_text(arr, count)]
+    return []
+
+
+# =====================================================
+# Escrita
+# =====================================================
+def _point_xy(geom) -> tuple:
+    if geom is None:
+        return (np.nan, np.nan)
+    if geom.get("type") != "Point" or set(geom) - {"type", "coordinates"}:
+        raise Unsupported(f"geometria não suportada: {geom.get('type')}")
+    c = geom.get("coordinates")
+    if len(c) not in (2, 3):
+        raise Unsupported("posição com dimensão inválida")
+    return c[0], c[1]
+
+
+def _write_arrays(out_dir: str, arrays: dict, meta: dict):
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), arr, allow_pickle=False)
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+
+def _geojson_arrays(gj: dict):
+    if gj.get("type") != "FeatureCollection":
+        raise Unsupported("apenas FeatureCollection")
+    features = gj.get("features") or []
+    xy = np.empty((len(features), 2), dtype=np.float64)
+    keys = {}
+    for i, f in enumerate(features):
+        if set(f) - {"type", "geometry", "properties"}:
+            raise Unsupported("feição com membros extras")
+        xy[i] = _point_xy(f.get("geometry"))
+        for k in f.get("properties") or {}:
+            keys.setdefault(k, None)
+
+    arrays = {"xy": xy}
+    columns = []
+    for i, k in enumerate(keys):
+        values, state = [], np.empty(len(features), dtype=np.uint8)
+        for j, f in enumerate(features):
+            props = f.get("properties") or {}
+            v = props.get(k)
+            state[j] = VALUE if v is not None else (NULL if k in props else ABSENT)
+            values.append(v)
+        kind, arr = _encode_column(values, state)
+        arrays[f"c{i}"] = arr
+        dense = bool((state == VALUE).all())
+        if not dense:
+            arrays[f"c{i}.state"] = state
+        columns.append({"name": k, "kind": kind, "dense": dense, "count": int((state == VALUE).sum())})
+    return arrays, {"kind": "geojson", "count": len(features), "columns": columns}
+
+
+def _frame_arrays(df: pd.DataFrame):
+    arrays, columns = {}, []
+    for i, name in enumerate(df.columns):
+        s = df[name]
+        valid = s.notna().to_numpy()
+        if pd.api.types.is_bool_dtype(s.dtype) or pd.api.types.is_integer_dtype(s.dtype):
+            kind, arr = ("bool" if pd.api.types.is_bool_dtype(s.dtype) else "int"), s.to_numpy()
+        elif pd.api.types.is_float_dtype(s.dtype):
+            kind, arr = "float", s.to_numpy(dtype=np.float64)
+        else:
+            present = s[valid].tolist()
+            if any(not isinstance(v, str) or _SEP in v for v in present):
+                raise Unsupported(f"coluna {name!r} com valores não textuais")
+            kind, arr = "str", _encode_text(present)
+        arrays[f"c{i}"] = arr
+        dense = bool(valid.all()) or kind == "float"
+        if not dense:
+            arrays[f"c{i}.state"] = np.where(valid, VALUE, NULL).astype(np.uint8)
+        columns.append({"name": str(name), "kind": kind, "dtype": str(s.dtype),
+                        "dense": dense, "count": int(valid.sum())})
+    return arrays, {"kind": "frame", "count": len(df), "columns": columns}
+
+
+def build(src: str, data, cache_dir: str = CACHE_DIR) -> str:
+    """Grava `data` (GeoJSON de pontos decodificado ou DataFrame lido de `src`) no cache colunar."""
+    stamp = _stamp(src)
+    arrays, meta = _frame_arrays(data) if isinstance(data, pd.DataFrame) else _geojson_arrays(data)
+    meta.update({"format": FORMAT_VERSION, "source": os.path.abspath(src), "stamp": stamp})
+    target = cache_path(src, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+    try:
+        _write_arrays(tmp, arrays, meta)
+        # Troca atômica; outra sessão pode ter gravado o mesmo diretório antes
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(target):
+            raise
+    return target
+
+
+# =====================================================
+# Leitura
+# =====================================================
+class ColumnarLayer:
+    """Um arquivo de `dados/` aberto do cache colunar; arrays são mmaps somente-leitura."""
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self.count = meta["count"]
+        self.columns = meta["columns"]
+        self._arrays = {}
+
+    def array(self, name: str) -> np.ndarray:
+        arr = self._arrays.get(name)
+        if arr is None:
+            arr = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+            self._arrays[name] = arr
+        return arr
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self) -> int:
+        return sum(e.stat().st_size for e in os.scandir(self.path))
+
+    def _state(self, i: int):
+        return None if self.columns[i]["dense"] else self.array(f"c{i}.state")
+
+    def _column_list(self, i: int) -> list:
+        col = self.columns[i]
+        values = _decode_values(col["kind"], self.array(f"c{i}"), col["count"])
+        state = self._state(i)
+        if state is None:
+            return values
+        out = [None] * self.count
+        for j, v in zip(np.flatnonzero(state == VALUE).tolist(), values):
+            out[j] = v
+        return out
+
+    # ---------- GeoJSON ----------
+    def point_xy(self) -> np.ndarray:
+        """(n, 2) com (x, y) de cada feição, direto do mmap (NaN onde não há geometria)."""
+        return self.array("xy")
+
+    def properties_frame(self, fields) -> pd.DataFrame:
+        """Atributos `fields` de cada feição, como em `camadas.properties_frame` (dtype object)."""
+        names = [c["name"] for c in self.columns]
+        data = {k: (self._column_list(names.index(k)) if k in names else [None] * self.count) for k in fields}
+        return pd.DataFrame(data, columns=list(fields), dtype=object)
+
+    # ---------- tabelas ----------
+    def to_frame(self) -> pd.DataFrame:
+        """Reconstrói o DataFrame gravado por `build` (mesmas colunas e dtypes)."""
+        data = {}
+        for i, col in enumerate(self.columns):
+            if col["kind"] in ("int", "bool", "float"):
+                data[col["name"]] = pd.Series(np.array(self.array(f"c{i}")), dtype=col["dtype"])
+            else:
+                data[col["name"]] = pd.Series(self._column_list(i), dtype=col["dtype"])
+        return pd.DataFrame(data)
+
+
+def open_cached(src: str, cache_dir: str = CACHE_DIR):
+    """ColumnarLayer de `src` se o cache existir e estiver em dia; senão None."""
+    target = cache_path(src, cache_dir)
+    try:
+        with open(os.path.join(target, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        fresh = meta.get("format") == FORMAT_VERSION and meta.get("stamp") == _stamp(src)
+    except OSError:
+        return None
+    return ColumnarLayer(target, meta) if fresh else None
+
+
+def load(src: str, read_raw, cache_dir: str = CACHE_DIR):
+    """ColumnarLayer de `src`, (re)construindo o cache a partir de `read_raw(src)` se preciso.
+
+    Devolve (layer, raw): `raw` é o objeto lido do original quando houve rebuild (para
+    o chamador não ler duas vezes), ou None. Se o arquivo não puder ser convertido ou o
+    diretório do cache não for gravável, devolve (None, raw).
+    """
+    layer = open_cached(src, cache_dir)
+    if layer is not None:
+        return layer, None
+    raw = read_raw(src)
+    with _build_lock:
+        layer = open_cached(src, cache_dir)
+        if layer is None:
+            try:
+                build(src, raw, cache_dir)
+            except (Unsupported, OSError):
+                return None, raw
+            layer = open_cached(src, cache_dir)
+    return layer, raw
+
+
+def read_geojson(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _use_cache(path: str) -> bool:
+    try:
+        return ENABLED and os.path.getsize(path) >= MIN_BYTES
+    except OSError:
+        return False
+
+
+def load_points(path: str, cache_dir: str = CACHE_DIR):
+    """ColumnarLayer da camada de pontos `path`, ou None (arquivo pequeno, sem cache, não é de pontos).
+
+    Arquivo que não abre como JSON também dá None: o chamador cai na leitura normal, que avisa.
+    """
+    if not _use_cache(path):
+        return None
+    try:
+        layer, _ = load(path, read_geojson, cache_dir)
+    except ValueError:
+        return None
+    return layer
+
+
+def load_frame(path: str, read_raw, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """DataFrame de `path` (`read_raw(path)` na primeira vez), pelo cache colunar quando possível."""
+    if not _use_cache(path):
+        return read_raw(path)
+    layer, raw = load(path, read_raw, cache_dir)
+    if raw is not None:
+        return raw
+    return layer.to_frame()
+
+
+# =====================================================
+# CLI: python colunar.py [diretório ...]
+# =====================================================
+def main(argv=None):
+    from camadas import DATA_DIR_CANDIDATES, data_files
+    from obras import sniff_read_csv
+
+    dirs = (argv if argv is not None else sys.argv[1:]) or DATA_DIR_CANDIDATES
+    for name, path in data_files(dirs).items():
+        read_raw = sniff_read_csv if name.lower().endswith(".csv") else read_geojson
+        try:
+            target = build(path, read_raw(path))
+        except Unsupported as e:
+            print(f"{name}: mantido no formato original ({e})")
+            continue
+        size = sum(e.stat().st_size for e in os.scandir(target))
+        print(f"{name}: {os.path.getsize(path) / 1024:.0f} KiB -> {size / 1024:.0f} KiB em {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,673 @@
+# =====================================================
+# Exportação das camadas e do cadastro de obras (GeoJSON, CSV, KML, Shapefile, PDF)
+# =====================================================
+# Cada formato é um escritor `write_<formato>(features, out, ...)` que grava em `out`
+# (arquivo binário) feição a feição, em blocos, sem montar o arquivo inteiro em memória.
+# `features` pode ser a lista de feições de um GeoJSON ou um FrameFeatures (linhas de um
+# DataFrame convertidas em pontos sob demanda). ExportCache guarda o resultado em disco
+# pela chave (camada, formato, filtro, versão dos dados): o mesmo download pedido de novo
+# só reabre o arquivo.
+import csv
+import datetime as dt
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import struct
+import tempfile
+import threading
+import unicodedata
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+import perf
+from geometria import geometry_positions, positions_array
+
+EXPORT_DIR = os.environ.get("ATLAS_EXPORT_DIR", os.path.join(".atlas_cache", "exportar"))
+EXPORT_CACHE_MB = int(os.environ.get("ATLAS_EXPORT_CACHE_MB", "512"))
+CHUNK = 2000
+
+# id -> (extensão do arquivo baixado, tipo MIME)
+FORMATS = {
+    "SHAPE": (".zip", "application/zip"),
+    "KML": (".kml", "application/vnd.google-earth.kml+xml"),
+    "CSV": (".csv", "text/csv"),
+    "PDF": (".pdf", "application/pdf"),
+    "GEOJSON": (".geojson", "application/geo+json"),
+}
+
+# .prj dos sistemas usados em `dados/` (o GeoJSON traz o nome no membro "crs")
+WGS84_WKT = (
+    'GEOGCS["GCS_WGS_1984",DATUM["D_WGS_1984",SPHEROID["WGS_1984",6378137.0,298.257223563]],'
+    'PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]]'
+)
+SIRGAS2000_WKT = (
+    'GEOGCS["GCS_SIRGAS_2000",DATUM["D_SIRGAS_2000",SPHEROID["GRS_1980",6378137.0,298.257222101]],'
+    'PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]]'
+)
+PRJ_BY_CRS = {
+    None: WGS84_WKT,
+    "urn:ogc:def:crs:OGC:1.3:CRS84": WGS84_WKT,
+    "urn:ogc:def:crs:EPSG::4326": WGS84_WKT,
+    "urn:ogc:def:crs:EPSG::4674": SIRGAS2000_WKT,
+}
+
+
+# =====================================================
+# Feições a partir de um DataFrame
+# =====================================================
+class FrameFeatures:
+    """Feições de ponto geradas sob demanda a partir das linhas de `df` (pode ser percorrido várias vezes).
+
+    `columns` vão para as propriedades; linhas sem coordenada válida saem sem geometria.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns, lon: str = "__LON__", lat: str = "__LAT__", chunk: int = CHUNK):
+        self.df = df
+        self.columns = list(columns)
+        self.lon, self.lat = lon, lat
+        self.chunk = chunk
+
+    def __len__(self):
+        return len(self.df)
+
+    def __iter__(self):
+        has_xy = self.lon in self.df.columns and self.lat in self.df.columns
+        for start in range(0, len(self.df), self.chunk):
+            block = self.df.iloc[start:start + self.chunk]
+            values = block[self.columns].astype(object)
+            records = values.where(values.notna(), None).to_dict("records")
+            if has_xy:
+                xs = pd.to_numeric(block[self.lon], errors="coerce").to_numpy(dtype=float)
+                ys = pd.to_numeric(block[self.lat], errors="coerce").to_numpy(dtype=float)
+            else:
+                xs = ys = np.full(len(block), np.nan)
+            for props, x, y in zip(records, xs, ys):
+                geom = {"type": "Point", "coordinates": [float(x), float(y)]} if np.isfinite(x) and np.isfinite(y) else None
+                yield {"type": "Feature", "geometry": geom, "properties": props}
+
+
+def property_fields(features) -> list:
+    """Chaves das propriedades, na ordem em que aparecem."""
+    if isinstance(features, FrameFeatures):
+        return list(features.columns)
+    seen = {}
+    for f in features:
+        seen.update(dict.fromkeys(f.get("properties") or {}))
+    return list(seen)
+
+
+def _plain(v):
+    """Valor pronto para texto/JSON: NumPy vira Python, datas viram ISO, NaN vira None."""
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and not math.isfinite(v):
+        return None
+    if isinstance(v, (dt.date, dt.datetime, pd.Timestamp)):
+        return v.isoformat()
+    return v
+
+
+def _text(v) -> str:
+    v = _plain(v)
+    return "" if v is None else str(v)
+
+
+# =====================================================
+# Geometria
+# =====================================================
+def _signed_area(ring) -> float:
+    xy = np.asarray(ring, dtype=float)[:, :2]
+    if len(xy) < 3:
+        return 0.0
+    x, y = xy[:, 0], xy[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _oriented(ring, clockwise: bool) -> list:
+    return ring[::-1] if (_signed_area(ring) > 0) == clockwise else ring
+
+
+def geometry_parts(geom):
+    """(tipo, partes) de uma geometria: "ponto"/"multiponto"/"linha"/"poligono" e listas de posições.
+
+    Polígonos saem com anéis externos no sentido horário e buracos no anti-horário (Shapefile).
+    Devolve (None, []) para geometria vazia ou não suportada.
+    """
+    t = (geom or {}).get("type")
+    c = (geom or {}).get("coordinates")
+    if not c:
+        return None, []
+    if t == "Point":
+        return "ponto", [[c]]
+    if t == "MultiPoint":
+        return "multiponto", [c]
+    if t == "LineString":
+        return "linha", [c]
+    if t == "MultiLineString":
+        return "linha", [line for line in c if line]
+    if t in ("Polygon", "MultiPolygon"):
+        polys = [c] if t == "Polygon" else c
+        return "poligono", [_oriented(ring, i == 0) for poly in polys for i, ring in enumerate(poly) if ring]
+    return None, []
+
+
+def _wkt_positions(positions) -> str:
+    return ", ".join(f"{p[0]!r} {p[1]!r}" for p in positions)
+
+
+def geometry_wkt(geom) -> str:
+    """WKT de uma geometria GeoJSON (vazio se não houver)."""
+    t = (geom or {}).get("type")
+    c = (geom or {}).get("coordinates")
+    if not c:
+        return ""
+    if t == "Point":
+        return f"POINT ({c[0]!r} {c[1]!r})"
+    if t == "MultiPoint":
+        return "MULTIPOINT (" + ", ".join(f"({p[0]!r} {p[1]!r})" for p in c) + ")"
+    if t == "LineString":
+        return f"LINESTRING ({_wkt_positions(c)})"
+    if t == "MultiLineString":
+        return "MULTILINESTRING (" + ", ".join(f"({_wkt_positions(l)})" for l in c) + ")"
+    if t == "Polygon":
+        return "POLYGON (" + ", ".join(f"({_wkt_positions(r)})" for r in c) + ")"
+    if t == "MultiPolygon":
+        return "MULTIPOLYGON (" + ", ".join(
+            "(" + ", ".join(f"({_wkt_positions(r)})" for r in poly) + ")" for poly in c
+        ) + ")"
+    return ""
+
+
+def _center(geom):
+    """(x, y) do ponto ou média dos vértices; (None, None) se vazia."""
+    pos = geometry_positions(geom)
+    if not pos:
+        return None, None
+    xy = positions_array(pos)
+    return float(xy[:, 0].mean()), float(xy[:, 1].mean())
+
+
+# =====================================================
+# GeoJSON e CSV
+# =====================================================
+def write_geojson(features, out, name: str = "", crs: str = None):
+    head = {"type": "FeatureCollection", "name": name}
+    if crs:
+        head["crs"] = {"type": "name", "properties": {"name": crs}}
+    out.write(json.dumps(head, ensure_ascii=False)[:-1].encode("utf-8") + b', "features": [\n')
+    buf, first = [], True
+    for f in features:
+        buf.append(json.dumps(
+            {"type": "Feature", "properties": f.get("properties") or {}, "geometry": f.get("geometry")},
+            ensure_ascii=False, default=_plain,
+        ))
+        if len(buf) >= CHUNK:
+            out.write((("" if first else ",\n") + ",\n".join(buf)).encode("utf-8"))
+            buf, first = [], False
+    if buf:
+        out.write((("" if first else ",\n") + ",\n".join(buf)).encode("utf-8"))
+    out.write(b"\n]}\n")
+
+
+def write_csv(features, out, fields=None):
+    """Uma linha por feição: atributos, longitude/latitude (ponto ou centro) e, fora pontos, WKT."""
+    fields = property_fields(features) if fields is None else list(fields)
+    with_wkt = not isinstance(features, FrameFeatures) and any(
+        (f.get("geometry") or {}).get("type") not in (None, "Point") for f in features
+    )
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="", write_through=True)
+    try:
+        writer = csv.writer(text)
+        writer.writerow([*fields, "longitude", "latitude", *(["wkt"] if with_wkt else [])])
+        rows = []
+        for f in features:
+            props, geom = f.get("properties") or {}, f.get("geometry")
+            x, y = _center(geom)
+            row = [_text(props.get(k)) for k in fields] + [_text(x), _text(y)]
+            if with_wkt:
+                row.append(geometry_wkt(geom))
+            rows.append(row)
+            if len(rows) >= CHUNK:
+                writer.writerows(rows)
+                rows = []
+        writer.writerows(rows)
+    finally:
+        text.detach()
+
+
+# =====================================================
+# KML
+# =====================================================
+def _kml_color(hex_color: str, opacity: float = 1.0) -> str:
+    """#RRGGBB -> aabbggrr (ordem do KML)."""
+    h = (hex_color or "#3388ff").lstrip("#")
+    if len(h) != 6:
+        h = "3388ff"
+    return f"{round(max(0.0, min(1.0, opacity)) * 255):02x}{h[4:6]}{h[2:4]}{h[0:2]}"
+
+
+def _kml_coords(positions) -> str:
+    return " ".join(f"{p[0]!r},{p[1]!r}" for p in positions)
+
+
+def _kml_geometry(geom) -> str:
+    t = (geom or {}).get("type")
+    c = (geom or {}).get("coordinates")
+    if not c:
+        return ""
+    if t == "Point":
+        return f"<Point><coordinates>{c[0]!r},{c[1]!r}</coordinates></Point>"
+    if t == "LineString":
+        return f"<LineString><coordinates>{_kml_coords(c)}</coordinates></LineString>"
+    if t == "Polygon":
+        rings = [f"<outerBoundaryIs><LinearRing><coordinates>{_kml_coords(c[0])}</coordinates></LinearRing></outerBoundaryIs>"]
+        rings += [
+            f"<innerBoundaryIs><LinearRing><coordinates>{_kml_coords(r)}</coordinates></LinearRing></innerBoundaryIs>"
+            for r in c[1:]
+        ]
+        return "<Polygon>" + "".join(rings) + "</Polygon>"
+    single = {"MultiPoint": "Point", "MultiLineString": "LineString", "MultiPolygon": "Polygon"}.get(t)
+    if single:
+        return "<MultiGeometry>" + "".join(_kml_geometry({"type": single, "coordinates": p}) for p in c) + "</MultiGeometry>"
+    return ""
+
+
+def write_kml(features, out, name: str = "", fields=None, label_fields=(), style=None):
+    """KML com um Placemark por feição; `label_fields` (em ordem) dão o nome exibido."""
+    fields = property_fields(features) if fields is None else list(fields)
+    style = style or {}
+    line = _kml_color(style.get("color", "#3388ff"), style.get("opacity", 1.0))
+    fill = _kml_color(style.get("fillColor", style.get("color", "#3388ff")), style.get("fillOpacity", 0.4))
+    out.write((
+        '<?xml version="1.0" encoding="UTF-8"?>\n<kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+        f"<name>{escape(name)}</name>"
+        f'<Style id="camada"><LineStyle><color>{line}</color><width>{style.get("weight", 2)}</width></LineStyle>'
+        f"<PolyStyle><color>{fill}</color></PolyStyle></Style>\n"
+    ).encode("utf-8"))
+    buf = []
+    for f in features:
+        props = f.get("properties") or {}
+        label = next((_text(props.get(k)) for k in label_fields if _text(props.get(k))), name)
+        data = "".join(
+            f'<Data name="{escape(str(k), {chr(34): "&quot;"})}"><value>{escape(_text(props.get(k)))}</value></Data>'
+            for k in fields
+        )
+        buf.append(
+            f"<Placemark><name>{escape(label)}</name><styleUrl>#camada</styleUrl>"
+            f"<ExtendedData>{data}</ExtendedData>{_kml_geometry(f.get('geometry'))}</Placemark>\n"
+        )
+        if len(buf) >= CHUNK:
+            out.write("".join(buf).encode("utf-8"))
+            buf = []
+    out.write(("".join(buf) + "</Document></kml>\n").encode("utf-8"))
+
+
+# =====================================================
+# Shapefile (.shp/.shx/.dbf/.prj/.cpg num .zip)
+# =====================================================
+SHAPE_TYPES = {"ponto": 1, "linha": 3, "poligono": 5, "multiponto": 8}
+SHAPE_SUFFIX = {"ponto": "pontos", "linha": "linhas", "poligono": "poligonos", "multiponto": "multipontos"}
+
+
+def _dbf_name(name: str, used: set) -> str:
+    """Nome de campo DBF: ASCII, até 10 caracteres, sem repetir."""
+    base = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    base = re.sub(r"[^A-Za-z0-9_]", "_", base).strip("_")[:10] or "campo"
+    out, i = base, 1
+    while out.upper() in used:
+        suffix = str(i)
+        out, i = base[:10 - len(suffix)] + suffix, i + 1
+    used.add(out.upper())
+    return out
+
+
+def _dbf_fields(features, fields) -> list:
+    """(nome, chave, tipo, largura, decimais) por campo: "N" se todos os valores forem números, senão "C"."""
+    info = {k: {"num": True, "width": 1, "dec": 0, "any": False} for k in fields}
+    for f in features:
+        props = f.get("properties") or {}
+        for k in fields:
+            v = _plain(props.get(k))
+            if v is None or v == "":
+                continue
+            d = info[k]
+            d["any"] = True
+            if d["num"] and isinstance(v, (int, float)) and not isinstance(v, bool):
+                s = repr(v) if isinstance(v, float) else str(v)
+                if "e" in s or "E" in s:
+                    s = f"{v:.15f}".rstrip("0")
+                whole, _, frac = s.partition(".")
+                d["dec"] = min(15, max(d["dec"], len(frac.rstrip("0"))))
+                d["width"] = max(d["width"], len(whole))
+            else:
+                d["num"] = False
+                d["width"] = max(d["width"], len(_text(v).encode("utf-8")))
+    used, out = set(), []
+    for k in fields:
+        d = info[k]
+        if d["num"] and d["any"]:
+            width = min(32, d["width"] + (d["dec"] + 1 if d["dec"] else 0) + 1)
+            out.append((_dbf_name(k, used), k, "N", width, d["dec"]))
+        else:
+            out.append((_dbf_name(k, used), k, "C", min(254, d["width"]), 0))
+    return out
+
+
+def _dbf_value(v, kind, width, dec) -> bytes:
+    v = _plain(v)
+    if kind == "N":
+        if v is None or v == "":
+            return b" " * width
+        s = f"{v:.{dec}f}" if dec else str(int(round(v)))
+        return s.rjust(width)[:width].encode("ascii")
+    raw = _text(v).encode("utf-8")[:width]
+    raw = raw.decode("utf-8", "ignore").encode("utf-8")  # não corta um caractere ao meio
+    return raw.ljust(width, b" ")
+
+
+def _write_dbf(features, out, dbf_fields, n: int):
+    today = dt.date.today()
+    record_len = 1 + sum(w for _, _, _, w, _ in dbf_fields)
+    out.write(struct.pack("<BBBBIHH20x", 0x03, today.year - 1900, today.month, today.day, n,
+                          32 + 32 * len(dbf_fields) + 1, record_len))
+    for name, _, kind, width, dec in dbf_fields:
+        out.write(struct.pack("<11sc4xBB14x", name.encode("ascii"), kind.encode("ascii"), width, dec))
+    out.write(b"\r")
+    buf = []
+    for f in features:
+        props = f.get("properties") or {}
+        buf.append(b" " + b"".join(_dbf_value(props.get(key), kind, w, d) for _, key, kind, w, d in dbf_fields))
+        if len(buf) >= CHUNK:
+            out.write(b"".join(buf))
+            buf = []
+    out.write(b"".join(buf) + b"\x1a")
+
+
+def _shape_record(kind, parts) -> tuple:
+    """(conteúdo do registro .shp, bbox) de uma feição."""
+    if kind is None:
+        return struct.pack("<i", 0), None
+    arrays = [np.asarray(p, dtype=float).reshape(-1, len(p[0]) if len(p) else 2)[:, :2] for p in parts]
+    xy = np.concatenate(arrays) if arrays else np.empty((0, 2))
+    if not len(xy):
+        return struct.pack("<i", 0), None
+    bbox = (float(xy[:, 0].min()), float(xy[:, 1].min()), float(xy[:, 0].max()), float(xy[:, 1].max()))
+    code = SHAPE_TYPES[kind]
+    if code == 1:
+        return struct.pack("<i2d", code, xy[0, 0], xy[0, 1]), bbox
+    if code == 8:
+        return struct.pack("<i4di", code, *bbox, len(xy)) + xy.astype("<f8").tobytes(), bbox
+    starts = np.cumsum([0] + [len(a) for a in arrays[:-1]]).astype("<i4")
+    return (struct.pack("<i4dii", code, *bbox, len(arrays), len(xy)) + starts.tobytes()
+            + xy.astype("<f8").tobytes()), bbox
+
+
+def _shp_header(code: int, length_words: int, bbox) -> bytes:
+    bbox = bbox or (0.0, 0.0, 0.0, 0.0)
+    return struct.pack(">7i", 9994, 0, 0, 0, 0, 0, length_words) + struct.pack("<2i8d", 1000, code, *bbox, 0, 0, 0, 0)
+
+
+def write_shapefile(features, out, name: str = "camada", crs: str = None):
+    """Zip com .shp/.shx/.dbf/.cpg (e .prj, se o sistema for conhecido).
+
+    O Shapefile tem um tipo de geometria por arquivo: camadas com tipos misturados saem
+    num conjunto de arquivos por tipo (sufixo _pontos, _linhas, ...). Feições sem geometria
+    vão como registro nulo no primeiro conjunto.
+    """
+    fields = property_fields(features)
+    # 1ª passada: tipo de cada feição e bbox/tamanho de cada conjunto
+    kinds = [geometry_parts(f.get("geometry"))[0] for f in features]
+    groups = list(dict.fromkeys(k for k in kinds if k)) or ["ponto"]
+    prj = PRJ_BY_CRS.get(crs)
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for kind in groups:
+            stem = name if len(groups) == 1 else f"{name}_{SHAPE_SUFFIX[kind]}"
+            members = [i for i, k in enumerate(kinds) if k == kind or (k is None and kind == groups[0])]
+            subset = _Subset(features, members)
+            length, bbox = 50, None
+            for f in subset:
+                content, b = _shape_record(*geometry_parts(f.get("geometry")))
+                length += 4 + len(content) // 2
+                if b:
+                    bbox = b if bbox is None else (min(bbox[0], b[0]), min(bbox[1], b[1]),
+                                                   max(bbox[2], b[2]), max(bbox[3], b[3]))
+            code = SHAPE_TYPES[kind]
+            index = []
+            with zf.open(f"{stem}.shp", "w", force_zip64=True) as shp:
+                shp.write(_shp_header(code, length, bbox))
+                offset, buf = 50, []
+                for n, f in enumerate(subset, start=1):
+                    content, _ = _shape_record(*geometry_parts(f.get("geometry")))
+                    buf.append(struct.pack(">ii", n, len(content) // 2) + content)
+                    index.append((offset, len(content) // 2))
+                    offset += 4 + len(content) // 2
+                    if len(buf) >= CHUNK:
+                        shp.write(b"".join(buf))
+                        buf = []
+                shp.write(b"".join(buf))
+            with zf.open(f"{stem}.shx", "w", force_zip64=True) as shx:
+                shx.write(_shp_header(code, 50 + 4 * len(index), bbox))
+                shx.write(np.asarray(index, dtype=">i4").reshape(-1, 2).tobytes())
+            with zf.open(f"{stem}.dbf", "w", force_zip64=True) as dbf:
+                _write_dbf(subset, dbf, _dbf_fields(subset, fields), len(members))
+            zf.writestr(f"{stem}.cpg", "UTF-8")
+            if prj:
+                zf.writestr(f"{stem}.prj", prj)
+
+
+class _Subset:
+    """Feições de `features` nas posições `members` (re-iterável, sem copiar a lista)."""
+
+    def __init__(self, features, members):
+        self.features, self.members = features, set(members)
+
+    def __iter__(self):
+        return (f for i, f in enumerate(self.features) if i in self.members)
+
+
+# =====================================================
+# PDF (mapa e, opcionalmente, tabela) com matplotlib
+# =====================================================
+PDF_TABLE_ROWS = 30
+PDF_MAX_ROWS = 3000
+
+
+def _mpl_path(kind, parts):
+    from matplotlib.path import Path
+
+    verts, codes = [], []
+    for p in parts:
+        xy = np.asarray(p, dtype=float).reshape(-1, len(p[0]) if len(p) else 2)[:, :2]
+        if not len(xy):
+            continue
+        verts.append(xy)
+        codes += [Path.MOVETO] + [Path.LINETO] * (len(xy) - 1)
+        if kind == "poligono":
+            codes[-1] = Path.CLOSEPOLY
+    return Path(np.concatenate(verts), codes) if verts else None
+
+
+def _draw(ax, features, style, point_color):
+    from matplotlib.collections import PathCollection
+
+    shapes, xs, ys = {"poligono": [], "linha": []}, [], []
+    for f in features:
+        kind, parts = geometry_parts(f.get("geometry"))
+        if kind in ("ponto", "multiponto"):
+            for x, y, *_ in parts[0]:
+                xs.append(x)
+                ys.append(y)
+        elif kind:
+            path = _mpl_path(kind, parts)
+            if path is not None:
+                shapes[kind].append(path)
+    if shapes["poligono"]:
+        ax.add_collection(PathCollection(
+            shapes["poligono"], facecolor=style.get("fillColor", "#9fe2fc"),
+            alpha=max(0.15, style.get("fillOpacity", 0.3)), edgecolor=style.get("color", "#000000"), linewidth=0.5,
+        ))
+    if shapes["linha"]:
+        ax.add_collection(PathCollection(
+            shapes["linha"], facecolor="none", edgecolor=style.get("color", "#8B4513"), linewidth=0.6,
+        ))
+    if xs:
+        ax.scatter(xs, ys, s=6, color=point_color, linewidths=0, zorder=3)
+
+
+def write_pdf(features, out, title: str = "", context=(), style=None, point_color: str = "#1E3A8A",
+              table_fields=None, subtitle: str = ""):
+    """Mapa da camada sobre `context` (ex.: polígonos dos distritos) e, com `table_fields`, a tabela.
+
+    A tabela vai em páginas de PDF_TABLE_ROWS linhas, até PDF_MAX_ROWS linhas.
+    """
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+
+    n = len(features) if hasattr(features, "__len__") else sum(1 for _ in features)
+    with PdfPages(out) as pdf:
+        fig = Figure(figsize=(11.69, 8.27))
+        ax = fig.add_subplot(1, 1, 1)
+        if context:
+            _draw(ax, context, {"fillColor": "#f3f4f6", "fillOpacity": 0.6, "color": "#6b7280"}, "#6b7280")
+        _draw(ax, features, style or {}, point_color)
+        ax.autoscale_view()
+        ax.set_aspect("equal", adjustable="datalim")
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+        ax.grid(True, linewidth=0.3, alpha=0.5)
+        fig.suptitle(title, fontsize=14, fontweight="bold")
+        ax.set_title(subtitle or f"{n} feição(ões) • gerado em {dt.date.today():%d/%m/%Y}", fontsize=9)
+        pdf.savefig(fig)
+
+        if table_fields:
+            rows = []
+            for i, f in enumerate(features):
+                if i >= PDF_MAX_ROWS:
+                    break
+                props = f.get("properties") or {}
+                rows.append([_text(props.get(k))[:40] for k in table_fields])
+                if len(rows) == PDF_TABLE_ROWS:
+                    _table_page(pdf, title, table_fields, rows)
+                    rows = []
+            if rows:
+                _table_page(pdf, title, table_fields, rows)
+            if n > PDF_MAX_ROWS:
+                fig = Figure(figsize=(11.69, 8.27))
+                fig.text(0.5, 0.5, f"Tabela limitada às primeiras {PDF_MAX_ROWS} de {n} linhas; "
+                         "use CSV para a lista completa.", ha="center", va="center")
+                pdf.savefig(fig)
+
+
+def _table_page(pdf, title, fields, rows):
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(11.69, 8.27))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.axis("off")
+    table = ax.table(cellText=rows, colLabels=[str(k)[:24] for k in fields], loc="upper center", cellLoc="left")
+    table.auto_set_font_size(False)
+    table.set_fontsize(6)
+    table.scale(1, 1.2)
+    fig.suptitle(title, fontsize=11)
+    pdf.savefig(fig)
+
+
+# =====================================================
+# Cache em disco dos arquivos exportados
+# =====================================================
+class ExportCache:
+    """Arquivos exportados em disco, por chave; compartilhado entre sessões e processos.
+
+    Cada chave é gerada uma vez (um lock por chave) e gravada via arquivo temporário +
+    rename, então outro processo nunca lê um arquivo pela metade. Acima de `budget_mb`,
+    os arquivos menos usados recentemente são apagados.
+    """
+
+    def __init__(self, cache_dir: str = EXPORT_DIR, budget_mb: int = EXPORT_CACHE_MB):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, key, suffix: str) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.cache_dir, digest + suffix)
+
+    def get_or_write(self, key, suffix: str, write) -> str:
+        """Caminho do arquivo de `key`, gerado por `write(arquivo_binário)` se ainda não existir."""
+        target = self.path(key, suffix)
+        with self._lock:
+            key_lock = self._locks.setdefault(target, threading.Lock())
+        with key_lock:
+            if os.path.exists(target):
+                os.utime(target)
+                with self._lock:
+                    self.hits += 1
+                perf.hit("exportar")
+                return target
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                os.replace(tmp, target)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+            with self._lock:
+                self.misses += 1
+            perf.miss("exportar")
+        self._evict(keep=target)
+        return target
+
+    def _files(self):
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if not n.endswith(".tmp")]
+        except OSError:
+            return []
+        out = []
+        for n in names:
+            p = os.path.join(self.cache_dir, n)
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return sorted(out)
+
+    def _evict(self, keep: str):
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        for _, size, p in files:
+            if total <= self.budget_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                os.unlink(p)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        files = self._files()
+        with self._lock:
+            return {
+                "entries": len(files),
+                "bytes": sum(size for _, size, _ in files),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
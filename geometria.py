@@ -0,0 +1,531 @@
+# =====================================================
+# Geometria: utilitários vetorizados sobre coordenadas GeoJSON
+# =====================================================
+import numpy as np
+
+
+def geometry_positions(geom) -> list:
+    """Lista plana de posições (x, y) de uma geometria GeoJSON."""
+    if not geom:
+        return []
+    t = geom.get("type")
+    c = geom.get("coordinates")
+    if t == "Point":
+        return [c] if c else []
+    if t in ("LineString", "MultiPoint"):
+        return c or []
+    if t in ("Polygon", "MultiLineString"):
+        return [p for part in (c or []) for p in part]
+    if t == "MultiPolygon":
+        return [p for poly in (c or []) for ring in poly for p in ring]
+    if t == "GeometryCollection":
+        return [p for g in geom.get("geometries", []) for p in geometry_positions(g)]
+    return []
+
+
+def positions_array(positions) -> np.ndarray:
+    """Converte posições (possivelmente com Z) em um array (n, 2) de float."""
+    if not positions:
+        return np.empty((0, 2), dtype=float)
+    try:
+        arr = np.asarray(positions, dtype=float)
+        if arr.ndim == 2 and arr.shape[1] >= 2:
+            return arr[:, :2]
+    except ValueError:
+        pass
+    return np.asarray([(p[0], p[1]) for p in positions], dtype=float)
+
+
+def feature_bboxes(features) -> np.ndarray:
+    """Bbox (minx, miny, maxx, maxy) de cada feição; NaN para geometria vazia."""
+    n = len(features)
+    out = np.full((n, 4), np.nan)
+    if n == 0:
+        return out
+    chunks, owners = [], []
+    for i, f in enumerate(features):
+        pos = geometry_positions(f.get("geometry"))
+        if pos:
+            chunks.append(positions_array(pos))
+            owners.append(i)
+    if not chunks:
+        return out
+    lengths = np.fromiter((len(c) for c in chunks), dtype=np.int64, count=len(chunks))
+    xy = np.concatenate(chunks)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    idx = np.asarray(owners)
+    out[idx, 0] = np.minimum.reduceat(xy[:, 0], starts)
+    out[idx, 1] = np.minimum.reduceat(xy[:, 1], starts)
+    out[idx, 2] = np.maximum.reduceat(xy[:, 0], starts)
+    out[idx, 3] = np.maximum.reduceat(xy[:, 1], starts)
+    return out
+
+
+def union_bbox(bboxes: np.ndarray):
+    """Bbox que envolve todas as linhas válidas de `bboxes`, ou None."""
+    if bboxes.size == 0 or np.isnan(bboxes[:, 0]).all():
+        return None
+    return (
+        float(np.nanmin(bboxes[:, 0])),
+        float(np.nanmin(bboxes[:, 1])),
+        float(np.nanmax(bboxes[:, 2])),
+        float(np.nanmax(bboxes[:, 3])),
+    )
+
+
+def point_coords(features) -> np.ndarray:
+    """Array (n, 2) com as coordenadas (x, y) de feições do tipo Point."""
+    pts = [
+        f["geometry"]["coordinates"][:2]
+        for f in features
+        if f.get("geometry") and f["geometry"].get("type") == "Point"
+    ]
+    return positions_array(pts)
+
+
+def grid_density(xy: np.ndarray, cell_m: float, lat0: float = None) -> dict:
+    """Conta pontos lon/lat numa grade de células de ~`cell_m` metros.
+
+    Devolve {"dx", "dy", "cells"} com `cells` = array (k, 3) de (x0, y0, contagem),
+    onde (x0, y0) é o canto sudoeste de cada célula não vazia.
+    """
+    if lat0 is None:
+        lat0 = float(np.mean(xy[:, 1])) if len(xy) else 0.0
+    dy = cell_m / 111320.0
+    dx = cell_m / (111320.0 * np.cos(np.radians(lat0)))
+    if len(xy) == 0:
+        return {"dx": dx, "dy": dy, "cells": np.empty((0, 3))}
+    ij = np.stack([np.floor(xy[:, 0] / dx), np.floor(xy[:, 1] / dy)], axis=1).astype(np.int64)
+    uniq, counts = np.unique(ij, axis=0, return_counts=True)
+    cells = np.column_stack([uniq[:, 0] * dx, uniq[:, 1] * dy, counts])
+    return {"dx": dx, "dy": dy, "cells": cells}
+
+
+# =====================================================
+# Simplificação com preservação de topologia + quantização
+# =====================================================
+# nível -> (tolerância Douglas-Peucker em graus, casas decimais)
+SIMPLIFY_LEVELS = {
+    "alta": (0.00002, 6),   # ~2 m
+    "media": (0.0001, 5),   # ~11 m
+    "baixa": (0.0005, 4),   # ~55 m
+}
+
+
+def _douglas_peucker(xy: np.ndarray, tol: float) -> np.ndarray:
+    """Máscara dos vértices mantidos (as extremidades são sempre mantidas)."""
+    n = len(xy)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        a = xy[i]
+        seg = xy[j] - a
+        rel = xy[i + 1:j] - a
+        norm = np.hypot(seg[0], seg[1])
+        if norm == 0:
+            d = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            d = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / norm
+        k = int(np.argmax(d))
+        if d[k] > tol:
+            m = i + 1 + k
+            keep[m] = True
+            stack.append((i, m))
+            stack.append((m, j))
+    return keep
+
+
+def _geometry_paths(geom):
+    """Percorre as partes lineares de uma geometria: (endereço, coords, é_anel)."""
+    t = geom.get("type") if geom else None
+    c = geom.get("coordinates") if geom else None
+    if t == "LineString":
+        yield (), c, False
+    elif t == "MultiLineString":
+        for i, line in enumerate(c):
+            yield (i,), line, False
+    elif t == "Polygon":
+        for i, ring in enumerate(c):
+            yield (i,), ring, True
+    elif t == "MultiPolygon":
+        for i, poly in enumerate(c):
+            for j, ring in enumerate(poly):
+                yield (i, j), ring, True
+
+
+def _set_path(coords, address, value):
+    if not address:
+        return value
+    target = coords
+    for a in address[:-1]:
+        target = target[a]
+    target[address[-1]] = value
+    return coords
+
+
+def _empty_like(geom):
+    t = geom["type"]
+    c = geom["coordinates"]
+    if t == "LineString":
+        return None
+    if t in ("MultiLineString", "Polygon"):
+        return [None] * len(c)
+    return [[None] * len(poly) for poly in c]
+
+
+def simplify_geojson(gj: dict, tolerance: float, precision: int, keep_properties=None) -> dict:
+    """FeatureCollection simplificada por arcos, preservando fronteiras compartilhadas.
+
+    As coordenadas são quantizadas em `precision` casas; vértices usados por mais de
+    um caminho com vizinhos diferentes (junções) e extremidades de linhas ficam fixos,
+    e cada arco entre vértices fixos é simplificado uma única vez (Douglas-Peucker),
+    então polígonos vizinhos continuam encaixados sem frestas. Feições menores que a
+    tolerância são descartadas; `keep_properties` limita os atributos copiados.
+    """
+    scale = 10 ** precision
+    features = gj.get("features", [])
+
+    # 1) caminhos quantizados, sem vértices repetidos consecutivos
+    paths = []
+    for fi, f in enumerate(features):
+        for address, coords, is_ring in _geometry_paths(f.get("geometry")):
+            q = np.round(positions_array(coords) * scale).astype(np.int64)
+            if len(q):
+                q = q[np.r_[True, np.any(np.diff(q, axis=0) != 0, axis=1)]]
+            if is_ring and len(q) > 1 and (q[0] == q[-1]).all():
+                q = q[:-1]
+            paths.append((fi, address, q, is_ring))
+
+    # 2) junções: vértices com mais de dois vizinhos distintos no conjunto todo
+    def keys(q):
+        return q[:, 0] * (1 << 32) + (q[:, 1] & 0xFFFFFFFF)
+
+    pair_chunks = []
+    for _, _, q, is_ring in paths:
+        if len(q) < 2:
+            continue
+        k = keys(q)
+        if is_ring:
+            prev, nxt = np.roll(k, 1), np.roll(k, -1)
+            pair_chunks += [np.stack([k, prev], 1), np.stack([k, nxt], 1)]
+        else:
+            pair_chunks += [np.stack([k[1:], k[:-1]], 1), np.stack([k[:-1], k[1:]], 1)]
+    junctions = np.empty(0, dtype=np.int64)
+    if pair_chunks:
+        pairs = np.unique(np.concatenate(pair_chunks), axis=0)
+        vk, counts = np.unique(pairs[:, 0], return_counts=True)
+        junctions = vk[counts > 2]
+
+    # 3) simplificação por arco, com cache na orientação canônica
+    arc_cache = {}
+
+    def simplify_arc(q):
+        k = keys(q)
+        flip = (k[0], k[-1] if len(k) > 1 else k[0]) > (k[-1], k[0]) or (k[0] == k[-1] and len(k) > 2 and k[1] > k[-2])
+        cq = q[::-1] if flip else q
+        ck = cq.tobytes()
+        if ck not in arc_cache:
+            mask = _douglas_peucker(cq / scale, tolerance) if len(cq) > 2 else np.ones(len(cq), bool)
+            arc_cache[ck] = cq[mask]
+        out = arc_cache[ck]
+        return out[::-1] if flip else out
+
+    def simplify_path(q, is_ring):
+        if len(q) < 3:
+            return q
+        fixed = np.isin(keys(q), junctions)
+        if not is_ring:
+            fixed[0] = fixed[-1] = True
+            idx = np.flatnonzero(fixed)
+            parts = [simplify_arc(q[a:b + 1]) for a, b in zip(idx[:-1], idx[1:])]
+            return np.concatenate([parts[0]] + [p[1:] for p in parts[1:]])
+        idx = np.flatnonzero(fixed)
+        if len(idx) == 0:
+            far = int(np.argmax(np.hypot(*(q - q[0]).T)))
+            idx = np.array([0, far]) if far > 0 else np.array([0])
+        ring = np.concatenate([q[idx[0]:], q[:idx[0]]])
+        idx = np.append(idx - idx[0], len(q))
+        ring = np.concatenate([ring, ring[:1]])
+        parts = [simplify_arc(ring[a:b + 1]) for a, b in zip(idx[:-1], idx[1:])]
+        out = np.concatenate([parts[0]] + [p[1:] for p in parts[1:]])
+        if len(out) < 4:
+            out = np.concatenate([q, q[:1]])
+        return out
+
+    new_coords = {}
+    for fi, address, q, is_ring in paths:
+        geom = features[fi]["geometry"]
+        if fi not in new_coords:
+            new_coords[fi] = _empty_like(geom)
+        s = simplify_path(q, is_ring)
+        if is_ring and len(s) and not (s[0] == s[-1]).all():
+            s = np.concatenate([s, s[:1]])
+        value = (np.round(s / scale, precision)).tolist()
+        new_coords[fi] = _set_path(new_coords[fi], address, value)
+
+    bboxes = feature_bboxes(features)
+    tiny = np.maximum(bboxes[:, 2] - bboxes[:, 0], bboxes[:, 3] - bboxes[:, 1]) < tolerance
+    out_features = []
+    for fi, f in enumerate(features):
+        if tiny[fi]:
+            continue
+        geom = f.get("geometry")
+        if fi in new_coords:
+            geom = {"type": geom["type"], "coordinates": new_coords[fi]}
+        props = f.get("properties") or {}
+        if keep_properties is not None:
+            props = {k: props.get(k) for k in keep_properties}
+        nf = {"type": "Feature", "properties": props, "geometry": geom}
+        if "id" in f:
+            nf["id"] = f["id"]
+        out_features.append(nf)
+    return {"type": "FeatureCollection", "features": out_features}
+
+
+# Códigos de tipo da codificação compacta (ver encode_compact)
+COMPACT_TYPES = {"Point": 0, "LineString": 1, "MultiLineString": 2, "Polygon": 3, "MultiPolygon": 4}
+
+
+def _delta_path(coords, scale) -> list:
+    q = np.round(positions_array(coords) * scale).astype(np.int64)
+    if len(q) == 0:
+        return []
+    d = np.diff(q, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    return d.ravel().tolist()
+
+
+def encode_compact(gj: dict, precision: int, fields=None) -> dict:
+    """Codifica uma FeatureCollection com coordenadas inteiras em delta (estilo TopoJSON).
+
+    Cada feição vira [tipo, coords, valores]: as coordenadas de cada caminho são
+    [x0, y0, dx1, dy1, ...] em unidades de 10^-precision grau, e os atributos de
+    `fields` vão como lista posicional. Decodificada no navegador por mapas.CompactGeoJson.
+    """
+    scale = 10 ** precision
+    features = gj.get("features", [])
+    if fields is None:
+        fields = list((features[0].get("properties") or {}).keys()) if features else []
+    out = []
+    for f in features:
+        geom = f.get("geometry")
+        if not geom or geom.get("type") not in COMPACT_TYPES:
+            continue
+        t, c = geom["type"], geom["coordinates"]
+        if t == "Point":
+            enc = _delta_path([c], scale)
+        elif t == "LineString":
+            enc = _delta_path(c, scale)
+        elif t in ("MultiLineString", "Polygon"):
+            enc = [_delta_path(p, scale) for p in c]
+        else:
+            enc = [[_delta_path(r, scale) for r in poly] for poly in c]
+        props = f.get("properties") or {}
+        out.append([COMPACT_TYPES[t], enc, [props.get(k) for k in fields]])
+    return {"scale": scale, "fields": list(fields), "features": out}
+
+
+# =====================================================
+# Índice espacial (grade sobre bboxes) e ponto-em-polígono vetorizado
+# =====================================================
+def representative_points(features) -> np.ndarray:
+    """Um ponto (x, y) por feição: o próprio ponto ou a média dos vértices; NaN se vazia."""
+    n = len(features)
+    out = np.full((n, 2), np.nan)
+    chunks, owners = [], []
+    for i, f in enumerate(features):
+        pos = geometry_positions(f.get("geometry"))
+        if pos:
+            chunks.append(positions_array(pos))
+            owners.append(i)
+    if not chunks:
+        return out
+    lengths = np.fromiter((len(c) for c in chunks), dtype=np.int64, count=len(chunks))
+    xy = np.concatenate(chunks)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    out[np.asarray(owners)] = np.add.reduceat(xy, starts, axis=0) / lengths[:, None]
+    return out
+
+
+def polygon_edges(geom) -> np.ndarray:
+    """Arestas (x1, y1, x2, y2) de todos os anéis de um (Multi)Polygon; vazio se não for polígono."""
+    t = geom.get("type") if geom else None
+    if t == "Polygon":
+        rings = geom["coordinates"]
+    elif t == "MultiPolygon":
+        rings = [r for poly in geom["coordinates"] for r in poly]
+    else:
+        return np.empty((0, 4))
+    parts = []
+    for ring in rings:
+        r = positions_array(ring)
+        if len(r) >= 3:
+            parts.append(np.hstack([r, np.roll(r, -1, axis=0)]))
+    return np.concatenate(parts) if parts else np.empty((0, 4))
+
+
+def points_in_polygon(xy: np.ndarray, edges: np.ndarray, chunk_cells: int = 4_000_000) -> np.ndarray:
+    """Máscara dos pontos dentro do polígono (regra par-ímpar, então buracos ficam de fora)."""
+    inside = np.zeros(len(xy), dtype=bool)
+    if len(xy) == 0 or len(edges) == 0:
+        return inside
+    x1, y1, x2, y2 = (edges[:, k] for k in range(4))
+    dy = np.where(y2 == y1, np.inf, y2 - y1)
+    step = max(1, chunk_cells // len(edges))
+    for a in range(0, len(xy), step):
+        px = xy[a:a + step, 0:1]
+        py = xy[a:a + step, 1:2]
+        crosses = ((y1 > py) != (y2 > py)) & (px < (x2 - x1) * (py - y1) / dy + x1)
+        inside[a:a + step] = (np.count_nonzero(crosses, axis=1) % 2) == 1
+    return inside
+
+
+class GridIndex:
+    """Grade uniforme sobre os bboxes das feições, guardada em formato CSR.
+
+    Cada célula lista as feições cujo bbox a toca; consultas devolvem só os pares
+    (ponto, feição) cujo bbox contém o ponto, sem varrer todas as feições.
+    """
+
+    def __init__(self, bboxes: np.ndarray, cells_per_axis: int = None):
+        self.bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        valid = np.flatnonzero(~np.isnan(self.bboxes[:, 0]))
+        extent = union_bbox(self.bboxes)
+        if extent is None:
+            extent = (0.0, 0.0, 1.0, 1.0)
+        if cells_per_axis is None:
+            cells_per_axis = int(np.clip(np.ceil(np.sqrt(max(len(valid), 1))) * 2, 1, 256))
+        self.n = cells_per_axis
+        self.x0, self.y0 = extent[0], extent[1]
+        self.cw = max(extent[2] - extent[0], 1e-12) / self.n
+        self.ch = max(extent[3] - extent[1], 1e-12) / self.n
+
+        b = self.bboxes[valid]
+        ix0, iy0 = self._cell(b[:, 0], b[:, 1])
+        ix1, iy1 = self._cell(b[:, 2], b[:, 3])
+        # Feições numa célula só (todos os pontos) vão direto; as maiores, uma a uma
+        single = (ix0 == ix1) & (iy0 == iy1)
+        cells, owners = [iy0[single] * self.n + ix0[single]], [valid[single]]
+        for f, a0, a1, c0, c1 in zip(valid[~single], ix0[~single], ix1[~single], iy0[~single], iy1[~single]):
+            gx, gy = np.meshgrid(np.arange(a0, a1 + 1), np.arange(c0, c1 + 1))
+            cells.append((gy * self.n + gx).ravel())
+            owners.append(np.full(gx.size, f))
+        cells = np.concatenate(cells).astype(np.int64)
+        owners = np.concatenate(owners).astype(np.int64)
+        order = np.lexsort((owners, cells))
+        self.ids = owners[order]
+        self.starts = np.searchsorted(cells[order], np.arange(self.n * self.n + 1))
+
+    def _cell(self, x, y):
+        ix = np.clip(np.floor((np.asarray(x) - self.x0) / self.cw), 0, self.n - 1).astype(np.int64)
+        iy = np.clip(np.floor((np.asarray(y) - self.y0) / self.ch), 0, self.n - 1).astype(np.int64)
+        return ix, iy
+
+    def candidates(self, xy: np.ndarray):
+        """Arrays (índice do ponto, índice da feição) com o ponto dentro do bbox da feição."""
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        ok = np.flatnonzero(~np.isnan(xy).any(axis=1))
+        ix, iy = self._cell(xy[ok, 0], xy[ok, 1])
+        cell = iy * self.n + ix
+        counts = self.starts[cell + 1] - self.starts[cell]
+        pts = np.repeat(ok, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        feats = self.ids[np.repeat(self.starts[cell], counts) + offsets]
+        b = self.bboxes[feats]
+        p = xy[pts]
+        hit = (p[:, 0] >= b[:, 0]) & (p[:, 0] <= b[:, 2]) & (p[:, 1] >= b[:, 1]) & (p[:, 1] <= b[:, 3])
+        return pts[hit], feats[hit]
+
+    def query_bbox(self, bbox) -> np.ndarray:
+        """Índices das feições cujo bbox intersecta `bbox` (minx, miny, maxx, maxy)."""
+        minx, miny, maxx, maxy = bbox
+        ix0, iy0 = self._cell(minx, miny)
+        ix1, iy1 = self._cell(maxx, maxy)
+        rows = [self.ids[self.starts[r * self.n + ix0]:self.starts[r * self.n + ix1 + 1]] for r in range(iy0, iy1 + 1)]
+        feats = np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+        b = self.bboxes[feats]
+        hit = (b[:, 0] <= maxx) & (b[:, 2] >= minx) & (b[:, 1] <= maxy) & (b[:, 3] >= miny)
+        return feats[hit]
+
+
+class PolygonIndex:
+    """Localiza pontos em polígonos: filtro pela grade de bboxes e teste exato por polígono."""
+
+    def __init__(self, features):
+        self.grid = GridIndex(feature_bboxes(features))
+        self.edges = [polygon_edges(f.get("geometry")) for f in features]
+
+    def locate(self, xy: np.ndarray) -> np.ndarray:
+        """Índice do (primeiro) polígono que contém cada ponto, ou -1."""
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        out = np.full(len(xy), -1, dtype=np.int64)
+        pts, feats = self.grid.candidates(xy)
+        for f in np.unique(feats):
+            p = pts[feats == f]
+            p = p[out[p] < 0]
+            if len(p):
+                out[p[points_in_polygon(xy[p], self.edges[f])]] = f
+        return out
+
+
+# =====================================================
+# Recorte por retângulo (tiles)
+# =====================================================
+def _clip_half_plane(pts: np.ndarray, axis: int, bound: float, keep_greater: bool) -> np.ndarray:
+    if len(pts) == 0:
+        return pts
+    nxt = np.roll(pts, -1, axis=0)
+    if keep_greater:
+        cur_in, nxt_in = pts[:, axis] >= bound, nxt[:, axis] >= bound
+    else:
+        cur_in, nxt_in = pts[:, axis] <= bound, nxt[:, axis] <= bound
+    delta = nxt[:, axis] - pts[:, axis]
+    t = np.divide(bound - pts[:, axis], delta, out=np.zeros(len(pts)), where=delta != 0)
+    inter = pts + t[:, None] * (nxt - pts)
+    # Sutherland-Hodgman: por aresta, a interseção (se cruzar) e depois o vértice final (se dentro)
+    out = np.empty((2 * len(pts), 2))
+    keep = np.empty(2 * len(pts), dtype=bool)
+    out[0::2], keep[0::2] = inter, cur_in != nxt_in
+    out[1::2], keep[1::2] = nxt, nxt_in
+    return out[keep]
+
+
+def clip_ring(xy: np.ndarray, xmin: float, ymin: float, xmax: float, ymax: float) -> np.ndarray:
+    """Recorta um anel (sem o ponto de fechamento) ao retângulo; pode devolver vazio."""
+    pts = np.asarray(xy, dtype=float)
+    for axis, bound, greater in ((0, xmin, True), (0, xmax, False), (1, ymin, True), (1, ymax, False)):
+        pts = _clip_half_plane(pts, axis, bound, greater)
+    return pts
+
+
+def clip_line(xy: np.ndarray, xmin: float, ymin: float, xmax: float, ymax: float) -> list:
+    """Recorta uma linha ao retângulo (Liang-Barsky por segmento); devolve as partes contínuas."""
+    xy = np.asarray(xy, dtype=float)
+    if len(xy) < 2:
+        return []
+    p, q = xy[:-1], xy[1:]
+    d = q - p
+    t0, t1 = np.zeros(len(p)), np.ones(len(p))
+    for pk, qk in ((-d[:, 0], p[:, 0] - xmin), (d[:, 0], xmax - p[:, 0]),
+                   (-d[:, 1], p[:, 1] - ymin), (d[:, 1], ymax - p[:, 1])):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = qk / pk
+        parallel_out = (pk == 0) & (qk < 0)
+        t0 = np.where(pk < 0, np.maximum(t0, r), t0)
+        t1 = np.where(pk > 0, np.minimum(t1, r), t1)
+        t1 = np.where(parallel_out, -1.0, t1)
+    ok = t0 <= t1
+    if not ok.any():
+        return []
+    a = p + t0[:, None] * d
+    b = p + t1[:, None] * d
+    idx = np.flatnonzero(ok)
+    # segmentos consecutivos que não foram cortados no meio continuam a mesma parte
+    breaks = np.flatnonzero((np.diff(idx) != 1) | (t1[idx[:-1]] < 1) | (t0[idx[1:]] > 0)) + 1
+    parts = []
+    for run in np.split(idx, breaks):
+        parts.append(np.vstack([a[run[:1]], b[run]]))
+    return parts
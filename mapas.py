@@ -0,0 +1,548 @@
+# =====================================================
+# Mapas: construção das camadas Folium a partir de dados já carregados
+# =====================================================
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import folium
+import numpy as np
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster, VectorGridProtobuf
+from folium.template import Template
+from folium.utilities import get_obj_in_upper_tree
+
+import perf
+from geometria import SIMPLIFY_LEVELS, grid_density
+from obras import INTERNAL_COLS as OBRAS_INTERNAL_COLS, STATUS_COLORS
+from popups import PopupAssets, PopupSchema
+
+MAP_CACHE_MB = int(os.environ.get("ATLAS_MAP_CACHE_MB", "64"))
+
+# Modos de renderização das camadas de pontos
+POINT_MODES = {
+    "cluster": "Agrupar (cluster)",
+    "canvas": "Canvas (círculos)",
+    "markers": "Marcadores individuais",
+}
+
+# Cores dos ícones do Folium (AwesomeMarkers) para o modo canvas
+ICON_COLOR_HEX = {
+    "red": "#D63E2A", "darkred": "#A23336", "lightred": "#FF8E7F",
+    "orange": "#F69730", "beige": "#FFCB92", "green": "#72B026",
+    "darkgreen": "#728224", "lightgreen": "#BBF970", "blue": "#38AADD",
+    "darkblue": "#0067A3", "lightblue": "#8ADAFF", "purple": "#D252B9",
+    "darkpurple": "#5B396B", "pink": "#FF91EA", "cadetblue": "#436978",
+    "white": "#FBFBFB", "gray": "#575757", "lightgray": "#A3A3A3", "black": "#303030",
+}
+
+
+def marker_icon(color="blue", icon="info-sign", prefix="glyphicon"):
+    return {"color": color, "icon": icon, "prefix": prefix, "hex": ICON_COLOR_HEX.get(color, "#38AADD")}
+
+
+def custom_icon(url, size, hex_color="#2A4D9B"):
+    return {"url": url, "size": list(size), "hex": hex_color}
+
+
+def _folium_icon(spec):
+    if spec.get("url"):
+        return folium.CustomIcon(spec["url"], icon_size=tuple(spec["size"]))
+    return folium.Icon(color=spec["color"], icon=spec["icon"], prefix=spec["prefix"])
+
+
+_ICONS_JS = """
+    var specs = %s;
+    var icons = specs.map(function (s) {
+        return s.url
+            ? L.icon({iconUrl: s.url, iconSize: s.size})
+            : L.AwesomeMarkers.icon({markerColor: s.color, icon: s.icon, prefix: s.prefix, iconColor: "white"});
+    });
+"""
+
+_CLUSTER_CALLBACK = """(function () {%s
+    var schema = %s;
+    return function (row) {
+        var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icons[row[4]]});
+        if (row[2]) { marker.bindTooltip(row[2]); }
+        if (row[3]) {
+            marker.bindPopup(schema ? function () { return atlasPopup(schema, row[3]); } : row[3], {maxWidth: %d});
+        }
+        return marker;
+    };
+})()"""
+
+
+class CanvasPoints(MacroElement):
+    """Todos os pontos de uma camada como círculos em um único renderer canvas."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function () {
+                var specs = {{ this.icons|tojson }};
+                var rows = {{ this.rows|tojson }};
+                var schema = {{ this.schema|tojson }};
+                var renderer = L.canvas({padding: 0.5});
+                var group = L.featureGroup();
+                for (var i = 0; i < rows.length; i++) {
+                    var row = rows[i];
+                    var m = L.circleMarker([row[0], row[1]], {
+                        renderer: renderer, radius: {{ this.radius }}, weight: 1,
+                        color: "#ffffff", fillColor: specs[row[4]].hex, fillOpacity: 0.9
+                    });
+                    if (row[2]) { m.bindTooltip(row[2]); }
+                    if (row[3]) {
+                        m.bindPopup(schema ? (function (v) {
+                            return function () { return atlasPopup(schema, v); };
+                        })(row[3]) : row[3], {maxWidth: {{ this.max_width }}});
+                    }
+                    m.addTo(group);
+                }
+                group.addTo({{ this._parent.get_name() }});
+                return group;
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, rows, icons, max_width=300, radius=6, schema=None):
+        super().__init__()
+        self._name = "CanvasPoints"
+        self.rows = rows
+        self.icons = icons
+        self.schema = schema
+        self.max_width = max_width
+        self.radius = radius
+
+
+class PointLayer:
+    """Acumula os pontos de uma camada e os emite no modo de renderização escolhido.
+
+    Cada ponto vira uma linha [lat, lon, tooltip, popup, ícone]; os ícones distintos
+    ficam numa tabela à parte, então o HTML carrega dados e não um objeto JS por marcador.
+    Com um `PopupSchema`, `popup` é a lista de valores do esquema e o HTML só é montado
+    quando o popup abre.
+    """
+
+    def __init__(self, max_width=300, popup=None):
+        self.rows = []
+        self.icons = []
+        self._icon_index = {}
+        self.max_width = max_width
+        self.popup = popup
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _icon_id(self, spec):
+        key = json.dumps(spec, sort_keys=True)
+        if key not in self._icon_index:
+            self._icon_index[key] = len(self.icons)
+            self.icons.append(spec)
+        return self._icon_index[key]
+
+    def add(self, lat, lon, tooltip=None, popup=None, icon=None):
+        spec = icon or marker_icon()
+        self.rows.append([
+            float(lat), float(lon),
+            None if tooltip is None else str(tooltip),
+            None if popup is None else popup if self.popup else str(popup),
+            self._icon_id(spec),
+        ])
+
+    def extend(self, lat, lon, tooltips=None, popups=None, icon_keys=None, icon_specs=None):
+        """Vários pontos de uma vez; `icon_keys[i]` indexa `icon_specs` (ícone padrão se None)."""
+        n = len(lat)
+        if icon_keys is None:
+            ids = [self._icon_id(marker_icon())] * n
+        else:
+            table = {k: self._icon_id(spec) for k, spec in icon_specs.items()}
+            ids = [table[k] for k in icon_keys]
+        self.rows.extend(
+            [float(a), float(b), t, p, i]
+            for a, b, t, p, i in zip(
+                lat, lon,
+                tooltips if tooltips is not None else [None] * n,
+                popups if popups is not None else [None] * n,
+                ids,
+            )
+        )
+
+    @classmethod
+    def from_frame(cls, df, lat="__LAT__", lon="__LON__", tooltip=None, popup=None,
+                   icon_col=None, icon_specs=None, max_width=300):
+        """Camada com uma linha por registro de `df`, montada coluna a coluna.
+
+        `tooltip` é uma coluna de texto; `popup` um `PopupSchema` cujas chaves são colunas
+        de `df`; `icon_col` guarda a chave do ícone de cada linha em `icon_specs`.
+        """
+        layer = cls(max_width=max_width, popup=popup)
+        df = df[df[lat].notna() & df[lon].notna()]
+        tooltips = df[tooltip].astype("string").fillna("").tolist() if tooltip else None
+        popups = popup.frame_values(df) if popup else None
+        keys = df[icon_col].tolist() if icon_col else None
+        layer.extend(df[lat].tolist(), df[lon].tolist(), tooltips, popups, keys, icon_specs)
+        return layer
+
+    def add_to(self, parent, mode="cluster"):
+        if not self.rows:
+            return parent
+        schema = self.popup.to_js() if self.popup else None
+        if schema:
+            PopupAssets().add_to(parent)
+        if mode == "markers":
+            for lat, lon, tooltip, popup, icon in self.rows:
+                if popup is not None and self.popup:
+                    popup = self.popup.render(popup)
+                folium.Marker(
+                    location=[lat, lon],
+                    tooltip=tooltip,
+                    popup=folium.Popup(popup, max_width=self.max_width) if popup else None,
+                    icon=_folium_icon(self.icons[icon]),
+                ).add_to(parent)
+        elif mode == "canvas":
+            CanvasPoints(self.rows, self.icons, max_width=self.max_width, schema=schema).add_to(parent)
+        else:
+            callback = _CLUSTER_CALLBACK % (_ICONS_JS % json.dumps(self.icons), json.dumps(schema), self.max_width)
+            FastMarkerCluster(self.rows, callback=callback, control=False).add_to(parent)
+        return parent
+
+
+def obras_point_layer(df, cols: dict) -> PointLayer:
+    """Camada de obras montada em lote: cor pelo status, valor formatado e popup por coluna."""
+    named = [cols.get(k) for k in ("obra", "status", "empresa", "valor", "bairro", "dtini", "dtfim")]
+    extra_cols = [c for c in df.columns if c not in set(OBRAS_INTERNAL_COLS) and c not in named]
+    schema = PopupSchema(
+        [("Status", cols.get("status")), ("Empresa", cols.get("empresa")), ("Valor", "__VALOR_FMT__"),
+         ("Bairro/Localidade", cols.get("bairro")), ("Início", cols.get("dtini")), ("Término", cols.get("dtfim"))],
+        title="🧱 Obra", title_key=cols.get("obra"), prefix="🧱 ", default="-", extra=extra_cols,
+    )
+    # Valor formatado e cor vêm da ingestão (reaproveitados entre recargas do cadastro)
+    df = df.assign(
+        __TOOLTIP__=df[cols["obra"]].astype(str) if cols.get("obra") else "Obra",
+        __ICON__=df["__COR__"],
+    )
+    colors = {c for _, c in STATUS_COLORS} | {"gray"}
+    return PointLayer.from_frame(
+        df, tooltip="__TOOLTIP__", popup=schema, icon_col="__ICON__",
+        icon_specs={c: marker_icon(c, "info-sign") for c in colors}, max_width=420,
+    )
+
+
+# =====================================================
+# Densidade: grade agregada com um nível de detalhe por faixa de zoom
+# =====================================================
+# (zoom mínimo, zoom máximo, tamanho da célula em metros)
+DENSITY_LEVELS = [(0, 10, 2000), (11, 11, 1000), (12, 12, 500), (13, 22, 250)]
+DENSITY_COLORS = ["#ffffb2", "#fed976", "#feb24c", "#fd8d3c", "#f03b20", "#bd0026"]
+
+
+def density_levels(xy: np.ndarray, levels=DENSITY_LEVELS, n_classes=len(DENSITY_COLORS)) -> list:
+    """Agrega os pontos em cada nível e calcula as quebras de cor (quantis) de cada um."""
+    lat0 = float(np.mean(xy[:, 1])) if len(xy) else 0.0
+    out = []
+    for zmin, zmax, cell_m in levels:
+        g = grid_density(xy, cell_m, lat0)
+        counts = g["cells"][:, 2]
+        qs = np.linspace(0, 1, n_classes + 1)[1:]
+        breaks = [round(b, 1) for b in np.unique(np.quantile(counts, qs)).tolist()] if len(counts) else []
+        out.append({
+            "min_zoom": zmin,
+            "max_zoom": zmax,
+            "dx": round(g["dx"], 8),
+            "dy": round(g["dy"], 8),
+            "breaks": breaks,
+            "cells": [[round(x, 6), round(y, 6), int(c)] for x, y, c in g["cells"].tolist()],
+        })
+    return out
+
+
+class DensityGrid(MacroElement):
+    """Células de densidade desenhadas em canvas; o nível exibido acompanha o zoom do mapa."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function () {
+                var levels = {{ this.levels|tojson }};
+                var colors = {{ this.colors|tojson }};
+                var parent = {{ this._parent.get_name() }};
+                var map = {{ this._map_name }};
+                var renderer = L.canvas({padding: 0.5});
+                var groups = {};
+                function color(breaks, v) {
+                    for (var i = 0; i < breaks.length; i++) { if (v <= breaks[i]) { return colors[i]; } }
+                    return colors[colors.length - 1];
+                }
+                function build(i) {
+                    var lv = levels[i], g = L.layerGroup();
+                    for (var k = 0; k < lv.cells.length; k++) {
+                        var c = lv.cells[k];
+                        L.rectangle([[c[1], c[0]], [c[1] + lv.dy, c[0] + lv.dx]], {
+                            renderer: renderer, stroke: false, fillOpacity: {{ this.opacity }},
+                            fillColor: color(lv.breaks, c[2])
+                        }).bindTooltip(c[2] + " {{ this.label }}").addTo(g);
+                    }
+                    return g;
+                }
+                var current = null;
+                function update() {
+                    var z = map.getZoom(), idx = levels.length - 1;
+                    for (var i = 0; i < levels.length; i++) {
+                        if (z >= levels[i].min_zoom && z <= levels[i].max_zoom) { idx = i; break; }
+                    }
+                    if (idx === current) { return; }
+                    if (current !== null) { parent.removeLayer(groups[current]); }
+                    if (!groups[idx]) { groups[idx] = build(idx); }
+                    parent.addLayer(groups[idx]);
+                    current = idx;
+                }
+                map.on("zoomend", update);
+                update();
+                return groups;
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, levels, label="pontos", colors=DENSITY_COLORS, opacity=0.6):
+        super().__init__()
+        self._name = "DensityGrid"
+        self.levels = levels
+        self.label = label
+        self.colors = list(colors)
+        self.opacity = opacity
+
+    def render(self, **kwargs):
+        self._map_name = get_obj_in_upper_tree(self, folium.Map).get_name()
+        super().render(**kwargs)
+
+
+# =====================================================
+# Polígonos e linhas simplificados em codificação compacta
+# =====================================================
+def level_for_zoom(zoom: float, levels=SIMPLIFY_LEVELS, tile_size=256) -> str:
+    """Nível de simplificação mais grosso cuja tolerância ainda fica abaixo de um pixel."""
+    pixel_deg = 360.0 / (tile_size * 2 ** zoom)
+    fitting = [name for name, (tol, _) in levels.items() if tol <= pixel_deg]
+    if not fitting:
+        return min(levels, key=lambda n: levels[n][0])
+    return max(fitting, key=lambda n: levels[n][0])
+
+
+def fit_zoom(bounds, width=900, height=600, tile_size=256, max_zoom=18) -> int:
+    """Zoom que o Leaflet usaria num `fit_bounds` de [[lat_min, lon_min], [lat_max, lon_max]]."""
+    (lat0, lon0), (lat1, lon1) = bounds
+    def merc(lat):
+        s = math.sin(math.radians(lat))
+        return math.log((1 + s) / (1 - s)) / 2
+    span_x = abs(lon1 - lon0) / 360.0
+    span_y = abs(merc(lat1) - merc(lat0)) / (2 * math.pi)
+    zoom = max_zoom
+    for span, px in ((span_x, width), (span_y, height)):
+        if span > 0:
+            zoom = min(zoom, int(math.floor(math.log2(px / (tile_size * span)))))
+    return max(zoom, 0)
+
+
+class CompactGeoJson(MacroElement):
+    """Camada GeoJSON enviada como coordenadas inteiras em delta (geometria.encode_compact).
+
+    O navegador reconstrói as feições e as entrega a um `L.geoJson` comum, com um
+    estilo fixo e tooltip em tabela no mesmo formato do `folium.GeoJsonTooltip`.
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function () {
+                var data = {{ this.data|tojson }};
+                var aliases = {{ this.aliases|tojson }};
+                var style = {{ this.style|tojson }};
+                var scale = data.scale;
+                function path(a) {
+                    var out = [], x = 0, y = 0;
+                    for (var i = 0; i < a.length; i += 2) {
+                        x += a[i]; y += a[i + 1];
+                        out.push([x / scale, y / scale]);
+                    }
+                    return out;
+                }
+                function paths(a) { return a.map(path); }
+                var decode = [
+                    function (c) { return path(c)[0]; },
+                    path,
+                    paths,
+                    paths,
+                    function (c) { return c.map(paths); }
+                ];
+                var types = ["Point", "LineString", "MultiLineString", "Polygon", "MultiPolygon"];
+                var features = data.features.map(function (f) {
+                    var props = {};
+                    data.fields.forEach(function (k, i) { props[k] = f[2][i]; });
+                    return {
+                        type: "Feature", properties: props,
+                        geometry: {type: types[f[0]], coordinates: decode[f[0]](f[1])}
+                    };
+                });
+                var layer = L.geoJson({type: "FeatureCollection", features: features}, {
+                    style: function () { return style; },
+                    onEachFeature: function (feature, l) {
+                        if (!aliases.length) { return; }
+                        var rows = aliases.map(function (alias, i) {
+                            var v = feature.properties[data.fields[i]];
+                            return "<tr><th>" + alias + "</th><td>" + (v === null || v === undefined ? "" : v) + "</td></tr>";
+                        });
+                        l.bindTooltip("<table>" + rows.join("") + "</table>", {sticky: true});
+                    }
+                });
+                layer.addTo({{ this._parent.get_name() }});
+                return layer;
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, data, style, aliases=None):
+        super().__init__()
+        self._name = "CompactGeoJson"
+        self.data = data
+        self.style = style
+        self.aliases = list(aliases or [])
+
+
+# =====================================================
+# Cache do HTML dos mapas já renderizados
+# =====================================================
+class MapHtmlCache:
+    """LRU do HTML final dos mapas, por chave de seleção; compartilhado entre sessões."""
+
+    def __init__(self, budget_mb: int = MAP_CACHE_MB, max_entries: int = 64):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                perf.miss("mapa_html")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            perf.hit("mapa_html")
+            return html
+
+    def put(self, key, html: str):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            total = sum(len(h) for h in self._entries.values())
+            while len(self._entries) > 1 and (total > self.budget_bytes or len(self._entries) > self.max_entries):
+                _, old = self._entries.popitem(last=False)
+                total -= len(old)
+                self.evictions += 1
+
+    def get_or_render(self, key, build, load=None) -> str:
+        """HTML em cache para `key` ou, na falta, o de `load()` (HTML pronto, ou None) ou o de
+        `build()` (um folium.Map) renderizado."""
+        html = self.get(key)
+        if html is None and load is not None:
+            html = load()
+            if html is not None:
+                self.put(key, html)
+        if html is None:
+            with perf.stage("build_map"):
+                m = build()
+            with perf.stage("render_html"):
+                html = folium.Figure().add_child(m).render()
+            self.put(key, html)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(len(h) for h in self._entries.values()),
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# =====================================================
+# Camadas servidas como tiles vetoriais (tiles.py)
+# =====================================================
+class VectorTileTooltip(MacroElement):
+    """Tooltip em tabela (como o do folium.GeoJsonTooltip) para uma camada VectorGrid interativa."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            (function () {
+                var layer = {{ this._parent.get_name() }};
+                var map = {{ this._map_name }};
+                var fields = {{ this.fields|tojson }};
+                var aliases = {{ this.aliases|tojson }};
+                var tip = L.tooltip({sticky: true});
+                layer.on("mouseover", function (e) {
+                    var props = (e.layer && e.layer.properties) || {};
+                    var rows = aliases.map(function (alias, i) {
+                        var v = props[fields[i]];
+                        return "<tr><th>" + alias + "</th><td>" + (v === null || v === undefined ? "" : v) + "</td></tr>";
+                    });
+                    tip.setLatLng(e.latlng).setContent("<table>" + rows.join("") + "</table>");
+                    map.openTooltip(tip);
+                });
+                layer.on("mousemove", function (e) { tip.setLatLng(e.latlng); });
+                layer.on("mouseout", function () { map.closeTooltip(tip); });
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, fields, aliases):
+        super().__init__()
+        self._name = "VectorTileTooltip"
+        self.fields = list(fields)
+        self.aliases = list(aliases)
+
+    def render(self, **kwargs):
+        self._map_name = get_obj_in_upper_tree(self, folium.Map).get_name()
+        super().render(**kwargs)
+
+
+def vector_tile_layer(base_url: str, layer: str, style: dict, fields=(), aliases=(), distrito: str = "",
+                      max_native_zoom: int = 16):
+    """VectorGrid apontando para `<base_url>/<layer>/{z}/{x}/{y}.pbf` do servidor de tiles."""
+    query = {}
+    if fields:
+        query["fields"] = ",".join(fields)
+    if distrito:
+        query["distrito"] = distrito
+    url = f"{base_url.rstrip('/')}/{layer}/{{z}}/{{x}}/{{y}}.pbf"
+    if query:
+        url += "?" + urlencode(query, safe=",")
+    options = {
+        "vectorTileLayerStyles": {layer: {"fill": "fillColor" in style, **style}},
+        "interactive": bool(aliases),
+        "maxNativeZoom": max_native_zoom,
+    }
+    vg = VectorGridProtobuf(url, options=options, control=False)
+    if aliases:
+        VectorTileTooltip(fields, aliases).add_to(vg)
+    return vg
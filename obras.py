@@ -0,0 +1,549 @@
+# =====================================================
+# Obras: ingestão vetorizada do cadastro `milha_obras.csv`
+# =====================================================
+import hashlib
+import io
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+import colunar
+import perf
+from geometria import GridIndex
+
+# Janela aproximada do município, usada para detectar lat/lon trocadas
+MILHA_LAT_RANGE = (-6.5, -4.5)
+MILHA_LON_RANGE = (-40.5, -38.0)
+
+# Cor do marcador por status (primeira regra que casar vence)
+STATUS_COLORS = [
+    (("conclu", "finaliz"), "green"),
+    (("execu", "andamento"), "orange"),
+    (("paralis", "suspens"), "red"),
+    (("planej", "licita", "proj"), "blue"),
+]
+
+# Abaixo disto, reprocessar o cadastro inteiro sai mais barato que ingerir linhas avulsas
+# (cada passada de `ingest_obras` tem um custo fixo de ~20 ms em operações do pandas)
+INCREMENTAL_MIN_ROWS = 2000
+
+# Colunas auxiliares criadas na ingestão (não aparecem na tabela)
+INTERNAL_COLS = ["__LAT__", "__LON__", "__VALOR__", "__MEDICAO__", "__DTINI__", "__CONCLUIDA__",
+                 "__VALOR_FMT__", "__COR__"]
+
+
+def norm_col(c: str) -> str:
+    s = unicodedata.normalize("NFKD", str(c))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = s.strip().lower()
+    s = re.sub(r"[^a-z0-9]+", "_", s)
+    return s.strip("_")
+
+
+def read_csv_bytes(data: bytes, dtype=None) -> pd.DataFrame:
+    f = io.StringIO(data.decode("utf-8-sig"))
+    sample = f.read(4096); f.seek(0)
+    sep = ";" if sample.count(";") > sample.count(",") else ","
+    return pd.read_csv(f, sep=sep, dtype=dtype)
+
+
+def sniff_read_csv(path: str) -> pd.DataFrame:
+    with open(path, "rb") as f:
+        return read_csv_bytes(f.read())
+
+
+def autodetect_coords(df: pd.DataFrame):
+    candidates_lat = [c for c in df.columns if re.search(r"(?:^|\b)(lat|latitude|y)(?:\b|$)", c, re.I)]
+    candidates_lon = [c for c in df.columns if re.search(r"(?:^|\b)(lon|long|longitude|x)(?:\b|$)", c, re.I)]
+    if candidates_lat and candidates_lon:
+        return candidates_lat[0], candidates_lon[0]
+    for c in df.columns:
+        if re.search(r"coord|coordenad", c, re.I):
+            try:
+                tmp = df[c].astype(str).str.extract(r"(-?\d+[\.,]?\d*)\s*[,;]\s*(-?\d+[\.,]?\d*)")
+                tmp.columns = ["LATITUDE", "LONGITUDE"]
+                tmp["LATITUDE"] = tmp["LATITUDE"].str.replace(",", ".", regex=False).astype(float)
+                tmp["LONGITUDE"] = tmp["LONGITUDE"].str.replace(",", ".", regex=False).astype(float)
+                df["__LAT__"], df["__LON__"] = tmp["LATITUDE"], tmp["LONGITUDE"]
+                return "__LAT__", "__LON__"
+            except Exception:
+                return None
+    return None
+
+
+def on_uniques(s: pd.Series, fn) -> pd.Series:
+    """Aplica `fn` (vetorizada) só aos valores distintos de `s` e espalha o resultado."""
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    if len(uniques) == len(s):
+        return fn(s)
+    res = fn(pd.Series(uniques, dtype=s.dtype))
+    return pd.Series(res.to_numpy().take(codes), index=s.index, dtype=res.dtype)
+
+
+def classify_text(s: pd.Series, rules, default):
+    """Rótulo da primeira regra (substrings, rótulo) cujo trecho aparece em cada valor (sem caixa)."""
+    def fn(v: pd.Series) -> pd.Series:
+        txt = v.astype("string").fillna("").str.strip().str.lower()
+        out = pd.Series(default, index=v.index, dtype=object)
+        for keys, label in reversed(rules):
+            hit = txt.str.contains("|".join(re.escape(k) for k in keys), regex=True)
+            out = out.mask(hit.to_numpy(dtype=bool), label)
+        return out
+    return on_uniques(s, fn)
+
+
+def format_brl(s: pd.Series) -> pd.Series:
+    """'R$ 3.549.250,74' para cada valor numérico; o que não é número fica como texto."""
+    def fn(v: pd.Series) -> pd.Series:
+        num = parse_br_number(v)
+        txt = [
+            f"R$ {x:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".") if x == x else None
+            for x in num.tolist()
+        ]
+        return pd.Series(txt, index=v.index, dtype=object).fillna(v.astype(str))
+    return on_uniques(s, fn)
+
+
+def parse_decimal(s: pd.Series) -> pd.Series:
+    """Primeiro número de cada célula ('-5,67' ou '-5.67') como float."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float)
+    num = s.astype("string").str.extract(r"(-?\d+[.,]?\d*)", expand=False)
+    return pd.to_numeric(num.str.replace(",", ".", regex=False), errors="coerce").astype(float)
+
+
+def parse_br_number(s: pd.Series) -> pd.Series:
+    """Valores no padrão brasileiro ('R$ 3.549.250,74', '1.816.525', '2198371') como float."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float)
+    txt = s.astype("string").str.strip()
+    has_comma = txt.str.contains(",", regex=False, na=False)
+    thousands_only = txt.str.fullmatch(r"[^\d]*\d{1,3}(?:\.\d{3})+", na=False)
+    digits = txt.str.replace(r"[^\d,.]", "", regex=True)
+    digits = digits.where(~(has_comma | thousands_only), digits.str.replace(".", "", regex=False))
+    return pd.to_numeric(digits.str.replace(",", ".", regex=False), errors="coerce").astype(float)
+
+
+def parse_br_date(s: pd.Series) -> pd.Series:
+    out = pd.to_datetime(s, format="%d/%m/%Y", errors="coerce")
+    rest = out.isna() & s.notna()
+    if rest.any():
+        out[rest] = pd.to_datetime(s[rest], format="mixed", dayfirst=True, errors="coerce")
+    return out
+
+
+def _pct_inside(lat: pd.Series, lon: pd.Series) -> float:
+    m = lat.between(*MILHA_LAT_RANGE) & lon.between(*MILHA_LON_RANGE)
+    return float(m.mean()) if len(m) else 0.0
+
+
+# Leituras possíveis de (lat, lon): original, trocada e com sinal invertido
+COORD_VARIANTS = {
+    "orig": lambda lat, lon: (lat, lon),
+    "swap": lambda lat, lon: (lon, lat),
+    "neg_lon": lambda lat, lon: (lat, -lon),
+    "swap_neg": lambda lat, lon: (lon, -lat),
+}
+
+
+def coords_variant(lat: pd.Series, lon: pd.Series) -> str:
+    """Nome da variante de COORD_VARIANTS que põe mais pontos no município."""
+    names = list(COORD_VARIANTS)
+    scores = [_pct_inside(*COORD_VARIANTS[n](lat, lon)) for n in names]
+    best = int(np.argmax(scores))
+    return names[best] if best != 0 and scores[best] >= scores[0] else "orig"
+
+
+def fix_swapped_coords(lat: pd.Series, lon: pd.Series):
+    """Escolhe entre original, trocada e com sinal invertido a variante que cai no município."""
+    return COORD_VARIANTS[coords_variant(lat, lon)](lat, lon)
+
+
+def ingest_obras(df_raw: pd.DataFrame, coords: str = None):
+    """Normaliza o cadastro de obras em um DataFrame tipado.
+
+    Devolve (df, cols): `cols` mapeia os papéis (obra, status, valor, ...) para as
+    colunas normalizadas encontradas; `cols["lat"]` é None se não houver coordenadas.
+    `cols["coords"]` é a variante de COORD_VARIANTS escolhida; passada em `coords`, é
+    aplicada sem nova escolha (linhas avulsas de um cadastro já ingerido).
+    """
+    df = df_raw.rename(columns={c: norm_col(c) for c in df_raw.columns})
+    cols = {}
+
+    lat_col = next((c for c in df.columns if c in {"latitude", "lat"}), None)
+    lon_col = next((c for c in df.columns if c in {"longitude", "long", "lon"}), None)
+    src = df
+    if not lat_col or not lon_col:
+        src = df_raw.copy()
+        detected = autodetect_coords(src)
+        if detected:
+            lat_col, lon_col = detected
+    if not lat_col or not lon_col:
+        cols["lat"] = cols["lon"] = None
+        return df, cols
+    cols["lat"], cols["lon"] = lat_col, lon_col
+
+    with perf.stage("parse:coords"):
+        lat, lon = parse_decimal(src[lat_col]), parse_decimal(src[lon_col])
+        cols["coords"] = coords or coords_variant(lat, lon)
+        lat, lon = COORD_VARIANTS[cols["coords"]](lat, lon)
+    df["__LAT__"] = lat.to_numpy()
+    df["__LON__"] = lon.to_numpy()
+
+    names = list(df.columns)
+    def pick_norm(*options):
+        wanted = [norm_col(o) for o in options]
+        return next((c for c in names if c in wanted), None)
+
+    cols["obra"]    = pick_norm("Obra", "Nome", "Projeto", "Descrição")
+    cols["status"]  = pick_norm("Status", "Situação", "Andamento")
+    cols["empresa"] = pick_norm("Empresa", "Contratada")
+    cols["valor"]   = pick_norm("Valor", "Valor Total", "Custo", "valor_total")
+    cols["medicao"] = pick_norm("Valor Medição", "valor_medicao")
+    cols["secretaria"] = pick_norm("Secretaria", "Secretária", "Órgão")
+    cols["tipo"]    = pick_norm("Tipo", "Tipo de Obra")
+    cols["bairro"]  = pick_norm("Bairro", "Localidade")
+    cols["dtini"]   = pick_norm("Início", "Data Início", "Inicio", "data_inicio")
+    cols["dtfim"]   = pick_norm("Término", "Data Fim", "Termino")
+
+    df["__VALOR__"] = on_uniques(df[cols["valor"]], parse_br_number).fillna(0.0) if cols["valor"] else 0.0
+    df["__MEDICAO__"] = on_uniques(df[cols["medicao"]], parse_br_number).fillna(0.0) if cols["medicao"] else 0.0
+    if cols["dtini"]:
+        df["__DTINI__"] = on_uniques(df[cols["dtini"]], parse_br_date)
+        df["ano_extraido"] = on_uniques(
+            df[cols["dtini"]], lambda v: v.astype(str).str.extract(r"(\d{4})", expand=False)
+        )
+    else:
+        df["__DTINI__"] = pd.NaT
+        df["ano_extraido"] = None
+    if cols["status"]:
+        df["__CONCLUIDA__"] = on_uniques(df[cols["status"]], lambda v: v.astype(str).str.upper().str.strip().str.contains(
+            "CONCLUÍDA|CONCLUIDA|FINALIZADA|TERMINADA", na=False
+        )).astype(bool)
+    else:
+        df["__CONCLUIDA__"] = False
+    # Valor formatado e cor do marcador, usados pela camada do mapa
+    df["__VALOR_FMT__"] = format_brl(df[cols["valor"]]) if cols["valor"] else "-"
+    df["__COR__"] = classify_text(df[cols["status"]], STATUS_COLORS, "gray") if cols["status"] else "gray"
+    return df, cols
+
+
+# =====================================================
+# Cubo de agregados: KPIs e gráficos sem varrer as obras
+# =====================================================
+# Dimensões do cubo, na ordem das colunas de `ObrasCube.cells`
+CUBE_DIMS = ("ano", "status", "secretaria", "tipo", "distrito")
+
+# Medida -> (coluna por obra, agregação)
+CUBE_MEASURES = {
+    "n": ("n", "sum"),
+    "concluidas": ("concluidas", "sum"),
+    "com_coords": ("com_coords", "sum"),
+    "valor_soma": ("valor", "sum"),
+    "valor_max": ("valor", "max"),
+    "medicao_soma": ("medicao", "sum"),
+    "medicao_max": ("medicao", "max"),
+}
+
+
+class ObrasCube:
+    """Contagem, soma e máximo de valor/medição por célula ano x andamento x secretaria x tipo x distrito.
+
+    Montado uma vez por versão do cadastro; filtros por igualdade nas dimensões e os
+    agrupamentos dos gráficos custam O(células), não O(obras). `distritos` é o CD_DIST
+    de cada obra (alinhado a `df`); sem ele, a dimensão fica vazia. `version` identifica
+    os dados de origem (chave para caches do que é derivado do cubo).
+    """
+
+    def __init__(self, df: pd.DataFrame, cols: dict, distritos=None, version=None):
+        self.version = version
+        def dim(col):
+            return df[col].to_numpy(dtype=object) if col and col in df.columns else None
+
+        rows = pd.DataFrame({
+            "ano": dim("ano_extraido"),
+            "status": dim(cols.get("status")),
+            "secretaria": dim(cols.get("secretaria")),
+            "tipo": dim(cols.get("tipo")),
+            "distrito": None if distritos is None else np.asarray(distritos, dtype=object),
+            "n": 1,
+            "concluidas": df["__CONCLUIDA__"].to_numpy(dtype=np.int64),
+            "com_coords": (df["__LAT__"].notna() & df["__LON__"].notna()).to_numpy(dtype=np.int64),
+            "valor": df["__VALOR__"].to_numpy(dtype=float),
+            "medicao": df["__MEDICAO__"].to_numpy(dtype=float),
+        }, index=pd.RangeIndex(len(df)))
+        self.cells = rows.groupby(list(CUBE_DIMS), dropna=False, sort=False).agg(**CUBE_MEASURES).reset_index()
+
+    def select(self, **filters) -> pd.DataFrame:
+        """Células com dimensão == valor para cada filtro (valor None: sem filtro)."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for name, value in filters.items():
+            if value is not None:
+                mask &= (self.cells[name] == value).to_numpy()
+        return self.cells[mask]
+
+    def values(self, name: str) -> list:
+        """Valores distintos (não nulos) de uma dimensão."""
+        return self.cells[name].dropna().unique().tolist()
+
+    @staticmethod
+    def totals(cells: pd.DataFrame) -> dict:
+        out = {m: cells[m].sum() for m in CUBE_MEASURES if not m.endswith("_max")}
+        out.update({m: cells[m].max() if len(cells) else 0.0 for m in CUBE_MEASURES if m.endswith("_max")})
+        return out
+
+    @staticmethod
+    def by(cells: pd.DataFrame, name: str) -> pd.DataFrame:
+        """Medidas das células agrupadas por uma dimensão (sem a linha dos nulos)."""
+        how = {m: "max" if m.endswith("_max") else "sum" for m in CUBE_MEASURES}
+        return cells.groupby(name).agg(how).reset_index()
+
+
+# =====================================================
+# Índice de filtros: categorias, faixas e retângulo do mapa
+# =====================================================
+class ObrasIndex:
+    """Índices do cadastro para filtrar obras sem comparar texto linha a linha.
+
+    As dimensões de CUBE_DIMS viram códigos inteiros (pd.factorize) e um filtro por
+    igualdade compara só inteiros; valor e data de início ficam em arrays ordenados,
+    consultados por busca binária; as coordenadas vão para uma grade (GridIndex)
+    consultada pelo retângulo visível do mapa. Montado uma vez por versão do cadastro.
+    """
+
+    def __init__(self, df: pd.DataFrame, cols: dict, distritos=None):
+        self.n = len(df)
+        dims = {
+            "ano": df["ano_extraido"] if "ano_extraido" in df.columns else None,
+            "status": df[cols["status"]] if cols.get("status") else None,
+            "secretaria": df[cols["secretaria"]] if cols.get("secretaria") else None,
+            "tipo": df[cols["tipo"]] if cols.get("tipo") else None,
+            "distrito": distritos,
+        }
+        self.codes, self.categories = {}, {}
+        for name, values in dims.items():
+            if values is None:
+                values = np.full(self.n, None, dtype=object)
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            self.codes[name] = codes.astype(np.int32)
+            self.categories[name] = {v: i for i, v in enumerate(uniques)}
+
+        self.sorted = {}
+        for name, values in (("valor", df["__VALOR__"].to_numpy(dtype=float)),
+                             ("inicio", df["__DTINI__"].to_numpy(dtype="datetime64[ns]"))):
+            ok = np.flatnonzero(~np.isnan(values))
+            order = ok[np.argsort(values[ok], kind="stable")]
+            self.sorted[name] = (values[order], order)
+
+        xy = np.c_[df["__LON__"].to_numpy(dtype=float), df["__LAT__"].to_numpy(dtype=float)]
+        xy[np.isnan(xy).any(axis=1)] = np.nan
+        self.grid = GridIndex(np.c_[xy, xy])
+
+    def values(self, name: str) -> list:
+        """Valores distintos (não nulos) de uma dimensão."""
+        return [v for v in self.categories[name] if not pd.isna(v)]
+
+    def bounds(self, name: str):
+        """(mínimo, máximo) de "valor" ou "inicio"; None sem valores."""
+        values = self.sorted[name][0]
+        return (values[0], values[-1]) if len(values) else None
+
+    def in_range(self, name: str, lo, hi) -> np.ndarray:
+        """Linhas com lo <= valor <= hi (ordem crescente do valor)."""
+        values, order = self.sorted[name]
+        return order[np.searchsorted(values, lo, "left"):np.searchsorted(values, hi, "right")]
+
+    def in_bbox(self, bbox) -> np.ndarray:
+        """Linhas com coordenadas dentro de `bbox` (minx, miny, maxx, maxy)."""
+        return self.grid.query_bbox(bbox)
+
+    def mask(self, equals: dict = None, ranges: dict = None, bbox=None) -> np.ndarray:
+        """Máscara das obras que passam em todos os filtros.
+
+        `equals`: dimensão -> valor (None: sem filtro); `ranges`: "valor"/"inicio" ->
+        (lo, hi) inclusivo; `bbox`: retângulo (minx, miny, maxx, maxy).
+        """
+        out = np.ones(self.n, dtype=bool)
+        for name, value in (equals or {}).items():
+            if value is None:
+                continue
+            code = self.categories[name].get(value)
+            if code is None:
+                return np.zeros(self.n, dtype=bool)
+            out &= self.codes[name] == code
+        hits = [self.in_range(name, lo, hi) for name, (lo, hi) in (ranges or {}).items()]
+        if bbox is not None:
+            hits.append(self.in_bbox(bbox))
+        for rows in hits:
+            keep = np.zeros(self.n, dtype=bool)
+            keep[rows] = True
+            out &= keep
+        return out
+
+
+# =====================================================
+# Cadastro vigiado: recarga incremental quando o CSV muda
+# =====================================================
+class ObrasRegistry:
+    """Cadastro de `path` em memória, atualizado linha a linha quando o arquivo muda.
+
+    Cada consulta compara mtime/tamanho; se mudaram, o arquivo é lido e comparado pelo
+    hash do conteúdo, então um `touch` sem mudança real não reprocessa nada. Numa mudança,
+    cada linha do CSV é identificada pelo hash dos seus bytes: as que já existiam são
+    copiadas do DataFrame tipado anterior e só as novas ou alteradas são lidas (com os
+    dtypes da leitura anterior) e passam por `ingest_obras`, com a mesma orientação das
+    coordenadas. Cabeçalho diferente, aspas abrindo campo com quebra de linha, valor que
+    não cabe no dtype anterior ou mais da metade das linhas trocadas reprocessam tudo.
+    Abaixo de INCREMENTAL_MIN_ROWS linhas o cadastro também é reprocessado inteiro, mas
+    os valores de `derive` continuam reaproveitados linha a linha. O DataFrame devolvido
+    é somente leitura.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.df = None
+        self.cols = {}
+        self.digest = None
+        self.updated = None  # mtime (epoch) da última mudança de conteúdo
+        self.generation = 0
+        self._stamp = None
+        self._pending = None
+        self._header = None
+        self._dtypes = None
+        self._hashes = None
+        self._source = None  # linha da geração anterior de cada linha atual (-1: nova)
+        self._derived = {}
+        self._lock = threading.Lock()
+        self.full_loads = 0
+        self.incremental_loads = 0
+        self.rows_reused = 0
+        self.rows_ingested = 0
+
+    def _poll(self):
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        with perf.stage("load:csv"):
+            with open(self.path, "rb") as f:
+                data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        self._stamp = stamp
+        if digest != self.digest:
+            self.digest, self.updated, self._pending = digest, st.st_mtime, data
+
+    def updated_at(self):
+        """Momento (epoch) da última mudança de conteúdo do CSV, sem reprocessar o cadastro."""
+        with self._lock:
+            self._poll()
+            return self.updated
+
+    def frame(self):
+        """(df, cols) do cadastro em dia com o arquivo."""
+        with self._lock:
+            self._poll()
+            if self._pending is not None:
+                perf.miss("obras")
+                self._apply(self._pending)
+                self._pending = None
+            return self.df, self.cols
+
+    @staticmethod
+    def _split(data: bytes):
+        """(cabeçalho, linhas não vazias, hash de cada linha), ou None se alguma linha tiver
+        aspas abertas (campo com quebra de linha: linha do arquivo != linha da tabela)."""
+        lines = data.split(b"\n")
+        header, body = lines[0], [l for l in lines[1:] if l.strip(b"\r")]
+        if any(l.count(b'"') % 2 for l in body):
+            return None
+        return header, body, np.fromiter(map(hash, body), dtype=np.int64, count=len(body))
+
+    def _apply(self, data: bytes):
+        split = self._split(data)
+        source = fresh = None
+        if split is not None and self.df is not None and split[0] == self._header and self.cols.get("lat"):
+            source = self._match(split[2])
+            fresh = np.flatnonzero(source < 0)
+        incremental = (fresh is not None and len(source) >= INCREMENTAL_MIN_ROWS
+                       and len(fresh) * 2 <= len(source))
+        df = None
+        if incremental:
+            try:
+                with perf.stage("load:csv"):
+                    new_raw = read_csv_bytes(b"\n".join([split[0], *(split[1][i] for i in fresh)]), self._dtypes)
+                if len(new_raw) == len(fresh):
+                    with perf.stage("parse:obras"):
+                        df = self._merge(new_raw, source, fresh)
+            except (ValueError, TypeError):
+                pass
+        if df is not None:
+            cols = self.cols
+            self.incremental_loads += 1
+            self.rows_reused += len(source) - len(fresh)
+            self.rows_ingested += len(fresh)
+        else:
+            with perf.stage("load:csv"):
+                raw = colunar.load_frame(self.path, sniff_read_csv) if self.df is None else read_csv_bytes(data)
+            with perf.stage("parse:obras"):
+                df, cols = ingest_obras(raw)
+            self._dtypes = raw.dtypes.to_dict()
+            if split is None or len(split[1]) != len(df) or cols.get("coords") != self.cols.get("coords"):
+                source = None
+            self.full_loads += 1
+            self.rows_ingested += len(df)
+        self.df, self.cols = df, cols
+        self._header, self._hashes = (split[0], split[2]) if split is not None else (None, None)
+        self._source = source
+        self.generation += 1
+
+    def _match(self, hashes: np.ndarray) -> np.ndarray:
+        """Linha anterior idêntica a cada linha nova (-1 se nenhuma)."""
+        if self._hashes is None:
+            return np.full(len(hashes), -1)
+        first = ~pd.Index(self._hashes).duplicated()
+        pos = pd.Index(self._hashes[first]).get_indexer(hashes)
+        return np.where(pos >= 0, np.flatnonzero(first)[pos], -1)
+
+    def _merge(self, new_raw: pd.DataFrame, source: np.ndarray, fresh: np.ndarray) -> pd.DataFrame:
+        order = source.copy()
+        if not len(fresh):
+            return self.df.take(order).reset_index(drop=True)
+        new, _ = ingest_obras(new_raw, self.cols.get("coords"))
+        order[fresh] = len(self.df) + np.arange(len(fresh))
+        return pd.concat([self.df, new], ignore_index=True).take(order).reset_index(drop=True)
+
+    def derive(self, df: pd.DataFrame, name: str, version, fn) -> np.ndarray:
+        """`fn(df)` por linha (ex.: distrito de cada obra), calculado só para as linhas novas.
+
+        Os valores das linhas reaproveitadas vêm da geração anterior; `version` diferente
+        (ex.: outro arquivo de distritos) recalcula tudo.
+        """
+        with self._lock:
+            if df is not self.df:
+                return np.asarray(fn(df))
+            hit = self._derived.get(name)
+            if hit and hit[:2] == (self.generation, version):
+                return hit[2]
+            if hit and hit[:2] == (self.generation - 1, version) and self._source is not None:
+                keep = self._source >= 0
+                values = np.empty(len(df), dtype=hit[2].dtype)
+                values[keep] = hit[2][self._source[keep]]
+                fresh = np.flatnonzero(~keep)
+                if len(fresh):
+                    values[fresh] = np.asarray(fn(df.iloc[fresh]))
+            else:
+                values = np.asarray(fn(df))
+            self._derived[name] = (self.generation, version, values)
+            return values
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": 0 if self.df is None else len(self.df), "generation": self.generation,
+                "full": self.full_loads, "incremental": self.incremental_loads,
+                "reused": self.rows_reused, "ingested": self.rows_ingested, "updated": self.updated,
+            }
@@ -0,0 +1,206 @@
+# =====================================================
+# Perf: tempo por etapa de uma execução do script
+# =====================================================
+# O app chama `start()` no topo de cada rerun; `stage(nome)` em qualquer módulo soma
+# o tempo daquele trecho no registro da execução corrente (da thread do script).
+# Os tempos são exclusivos: uma etapa aninhada não conta de novo na etapa de fora.
+# Nomes "grupo:detalhe" (ex.: "build_map:Escolas") detalham uma das etapas de STAGES;
+# `grouped()` soma os detalhes no grupo para comparar execuções.
+#
+# Com ?debug=perf (ou ATLAS_PERF_LOG definido) cada rerun vira uma linha JSON no logger
+# "atlas.perf"; `python perf.py arquivo.log` agrega as linhas de todas as sessões.
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STAGES = ("load", "parse", "build_map", "render_html", "charts")
+
+# Arquivo das linhas JSON ("" = stderr, só quando ?debug=perf)
+LOG_PATH = os.environ.get("ATLAS_PERF_LOG", "")
+
+logger = logging.getLogger("atlas.perf")
+
+_local = threading.local()
+
+
+class Recorder:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            nested = self._stack.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def grouped(self) -> dict:
+        out = {}
+        for name, secs in self.stages.items():
+            out[group(name)] = out.get(group(name), 0.0) + secs
+        return out
+
+    def caches(self) -> dict:
+        """{cache: {"hit": n, "miss": n}} a partir dos contadores "cache:<nome>:<hit|miss>"."""
+        out = {}
+        for name, n in self.counters.items():
+            kind, _, rest = name.partition(":")
+            if kind == "cache":
+                cache, _, outcome = rest.rpartition(":")
+                out.setdefault(cache, {"hit": 0, "miss": 0})[outcome] = n
+        return out
+
+    def as_dict(self) -> dict:
+        return {"total": self.total(), "stages": dict(self.stages), "counters": dict(self.counters)}
+
+
+def group(name: str) -> str:
+    return name.partition(":")[0]
+
+
+def start() -> Recorder:
+    """Novo registro para a execução corrente desta thread."""
+    _local.recorder = Recorder()
+    return _local.recorder
+
+
+def current():
+    return getattr(_local, "recorder", None)
+
+
+@contextmanager
+def stage(name: str):
+    rec = current()
+    if rec is None:
+        yield
+        return
+    with rec.stage(name):
+        yield
+
+
+def count(name: str, n: int = 1):
+    rec = current()
+    if rec is not None:
+        rec.count(name, n)
+
+
+def hit(cache: str):
+    count(f"cache:{cache}:hit")
+
+
+def miss(cache: str):
+    count(f"cache:{cache}:miss")
+
+
+@contextmanager
+def lookup(cache: str):
+    """Consulta a um cache cujo corpo chama `miss(cache)`; sem essa chamada, conta um acerto."""
+    rec = current()
+    before = rec.counters.get(f"cache:{cache}:miss", 0) if rec else 0
+    yield
+    if rec is not None and rec.counters.get(f"cache:{cache}:miss", 0) == before:
+        rec.count(f"cache:{cache}:hit")
+
+
+# =====================================================
+# Log estruturado
+# =====================================================
+def _ensure_handler():
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(LOG_PATH, encoding="utf-8") if LOG_PATH else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log(rec: Recorder, **context):
+    """Uma linha JSON com os tempos (ms) e contadores do rerun, mais `context` (sessão, página...)."""
+    _ensure_handler()
+    logger.info(json.dumps({
+        "ts": round(time.time(), 3),
+        **context,
+        "total_ms": round(rec.total() * 1000, 2),
+        "stages_ms": {k: round(v * 1000, 2) for k, v in rec.stages.items()},
+        "counters": rec.counters,
+    }, ensure_ascii=False))
+
+
+def read_log(paths) -> list:
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("{"):
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+    return records
+
+
+def summarize(records: list, by: str = "page") -> dict:
+    """{(valor de `by`, etapa): {"n", "p50", "p95", "max"}} em ms, mais "cache:<nome>" com a taxa de acerto."""
+    samples, caches = {}, {}
+    for r in records:
+        key = r.get(by, "")
+        samples.setdefault((key, "total"), []).append(r.get("total_ms", 0.0))
+        for name, ms in r.get("stages_ms", {}).items():
+            samples.setdefault((key, name), []).append(ms)
+        for name, n in r.get("counters", {}).items():
+            kind, _, rest = name.partition(":")
+            if kind == "cache":
+                cache, _, outcome = rest.rpartition(":")
+                caches.setdefault((key, cache), {"hit": 0, "miss": 0})[outcome] += n
+
+    def pct(values, q):
+        values = sorted(values)
+        return values[max(0, math.ceil(q * len(values)) - 1)]
+
+    out = {k: {"n": len(v), "p50": pct(v, 0.5), "p95": pct(v, 0.95), "max": max(v)} for k, v in samples.items()}
+    for (key, cache), c in caches.items():
+        total = c["hit"] + c["miss"]
+        out[(key, f"cache:{cache}")] = {**c, "taxa": c["hit"] / total if total else 0.0}
+    return out
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Agrega os logs de desempenho (ATLAS_PERF_LOG) por página.")
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--by", default="page", help="campo de agrupamento (page, session...)")
+    args = p.parse_args(argv)
+
+    stats = summarize(read_log(args.logs), args.by)
+    print(f"{args.by:<12}{'etapa':<36}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'máx ms':>10}")
+    for (key, name), s in sorted(stats.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+        if "taxa" in s:
+            print(f"{str(key):<12}{name:<36}{s['hit'] + s['miss']:>6}  acertos {s['taxa']:.0%}")
+        else:
+            print(f"{str(key):<12}{name:<36}{s['n']:>6}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['max']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
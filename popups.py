@@ -0,0 +1,136 @@
+# =====================================================
+# Popups: esquema declarativo por camada, HTML gerado em lote ou no clique
+# =====================================================
+# Cada camada descreve o popup uma vez (título, campos, tema). O servidor só extrai
+# os valores de cada feição; o HTML sai de um template Jinja2 compilado (modo
+# "marcadores") ou é montado no navegador quando o popup abre (cluster/canvas).
+# Estilos ficam em classes CSS compartilhadas, injetadas uma vez no <head> do mapa.
+import pandas as pd
+from branca.element import Element, MacroElement
+from jinja2 import Environment
+
+POPUP_CSS = """
+.atlas-popup{font-family:Arial,sans-serif;font-size:13px}
+.atlas-popup h4{margin:0 0 8px}
+.atlas-popup p{margin:4px 0}
+.atlas-popup table{border-collapse:collapse;margin-top:6px}
+.atlas-popup td{border:1px solid #999;padding:4px}
+.atlas-popup--card{border:2px solid var(--c);border-radius:8px;padding:8px;background:var(--bg)}
+.atlas-popup--card h4{color:var(--t,var(--c));border-bottom:1px solid #ccc}
+.atlas-popup--escola{--c:#2A4D9B;--bg:#f9f9f9}
+.atlas-popup--escola b{color:#2A4D9B}
+.atlas-popup--localidade{--c:#4CAF50;--bg:#f0fff0;--t:#2E7D32}
+.atlas-popup--poco{--c:#0059b3;--bg:#f0f8ff}
+"""
+
+# Mesma marcação do template Jinja abaixo, montada no navegador a partir dos valores
+POPUP_JS = """
+window.atlasPopup = function (s, v) {
+    function esc(x) {
+        return String(x).replace(/[&<>"']/g, function (c) {
+            return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c];
+        });
+    }
+    var i = 0, html = '<div class="' + s.css + '">';
+    if (s.title_key) { html += "<h4>" + esc(s.prefix + v[i++]) + "</h4>"; }
+    else if (s.title) { html += "<h4>" + esc(s.title) + "</h4>"; }
+    for (var k = 0; k < s.labels.length; k++, i++) {
+        html += "<p><b>" + esc(s.labels[k]) + ":</b> " + esc(v[i] + s.suffixes[k]) + "</p>";
+    }
+    var rows = "";
+    for (var j = 0; j < s.extra.length; j++, i++) {
+        if (v[i] !== "") { rows += "<tr><td><b>" + esc(s.extra[j]) + "</b></td><td>" + esc(v[i]) + "</td></tr>"; }
+    }
+    if (rows) { html += "<table>" + rows + "</table>"; }
+    return html + "</div>";
+};
+"""
+
+_env = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+_POPUP_TEMPLATE = _env.from_string(
+    '<div class="{{ s.css }}">'
+    "{% if s.title_key %}<h4>{{ s.prefix ~ title }}</h4>{% elif s.title %}<h4>{{ s.title }}</h4>{% endif %}"
+    "{% for label, value, suffix in fields %}<p><b>{{ label }}:</b> {{ value ~ suffix }}</p>{% endfor %}"
+    "{% if extra %}<table>{% for k, v in extra %}<tr><td><b>{{ k }}</b></td><td>{{ v }}</td></tr>{% endfor %}</table>{% endif %}"
+    "</div>"
+)
+
+
+class PopupSchema:
+    """Popup de uma camada: título fixo ou vindo de `title_key`, campos (rótulo, chave[, sufixo])
+    e uma tabela chave/valor com os atributos `extra` que estiverem preenchidos."""
+
+    def __init__(self, fields, title=None, title_key=None, prefix="", theme=None,
+                 default="Não informado", extra=()):
+        self.fields = [(f[0], f[1], f[2] if len(f) > 2 else "") for f in fields]
+        self.title = title
+        self.title_key = title_key
+        self.prefix = prefix
+        self.css = "atlas-popup" + (f" atlas-popup--card atlas-popup--{theme}" if theme else "")
+        self.default = default
+        self.extra = [str(k) for k in extra]
+
+    def to_js(self) -> dict:
+        return {
+            "css": self.css,
+            "title": self.title,
+            "title_key": self.title_key,
+            "prefix": self.prefix,
+            "labels": [label for label, _, _ in self.fields],
+            "suffixes": [suffix for _, _, suffix in self.fields],
+            "extra": self.extra,
+        }
+
+    def _text(self, v) -> str:
+        return self.default if v is None or v == "" else str(v)
+
+    def _keys(self) -> list:
+        return ([self.title_key] if self.title_key else []) + [key for _, key, _ in self.fields]
+
+    def columns(self) -> list:
+        """Chaves de atributo lidas pelo popup (título, campos e `extra`)."""
+        return self._keys() + self.extra
+
+    def values(self, props: dict) -> list:
+        """Valores de uma feição na ordem do esquema (o que vai para o navegador)."""
+        props = props or {}
+        out = [self._text(props.get(key)) for key in self._keys()]
+        out += ["" if props.get(key) in (None, "") else str(props.get(key)).strip() for key in self.extra]
+        return out
+
+    def frame_values(self, df: pd.DataFrame) -> list:
+        """`values` de todas as linhas de `df` de uma vez (coluna a coluna, não linha a linha)."""
+        columns = []
+        for key, default in [(k, self.default) for k in self._keys()] + [(k, "") for k in self.extra]:
+            if key not in df.columns:
+                columns.append([default] * len(df))
+                continue
+            text = df[key].astype("string").fillna("").str.strip()
+            columns.append(text.where(text != "", default).tolist() if default else text.tolist())
+        if not columns:
+            return [[] for _ in range(len(df))]
+        return [list(r) for r in zip(*columns)]
+
+    def render(self, values) -> str:
+        """HTML do popup a partir de `values` (modo marcadores, que não usa o JS)."""
+        i = 1 if self.title_key else 0
+        n = len(self.fields)
+        fields = [(label, values[i + k], suffix) for k, (label, _, suffix) in enumerate(self.fields)]
+        extra = [(k, v) for k, v in zip(self.extra, values[i + n:]) if v != ""]
+        return _POPUP_TEMPLATE.render(s=self, title=values[0] if self.title_key else None,
+                                      fields=fields, extra=extra)
+
+
+class PopupAssets(MacroElement):
+    """Injeta o CSS e a função `atlasPopup` no <head> do mapa (uma vez por mapa)."""
+
+    def __init__(self):
+        super().__init__()
+        self._name = "PopupAssets"
+
+    def render(self, **kwargs):
+        self.get_root().header.add_child(
+            Element(f"<style>{POPUP_CSS}</style><script>{POPUP_JS}</script>"),
+            name="atlas_popup_assets",
+        )
+        super().render(**kwargs)
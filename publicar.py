@@ -0,0 +1,210 @@
+# =====================================================
+# Atlas publicado: mapas pré-renderizados em HTML estático
+# =====================================================
+# Uso:
+#   python publicar.py                  # mapas padrão e combinações comuns em publicado/
+#   python publicar.py --out /srv/atlas  # outro diretório (ATLAS_STATIC_DIR no app)
+#   python publicar.py --so-padrao       # só a seleção padrão de cada aba
+#
+# O build roda o app via AppTest (como benchmark.py) para cada seleção de `combos()` e
+# grava o HTML de cada mapa num arquivo, com um manifest.json que o liga à chave do mapa
+# (conteúdo dos arquivos que o mapa lê + seleção da barra lateral) e a um hash do código
+# que desenha os mapas. A chave não depende de mtime: um clone ou cópia dos dados casa.
+# O app consulta o manifesto antes de construir um mapa: se a seleção da sessão bater, o
+# HTML vem pronto do disco ou, com ATLAS_STATIC_URL, o navegador o busca direto da CDN
+# (iframe com src) e o servidor não envia nem monta nada. Dados ou código novos mudam a
+# chave/o hash e o app volta a renderizar ao vivo até o próximo build.
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+STATIC_DIR = os.environ.get("ATLAS_STATIC_DIR", "publicado")
+STATIC_URL = os.environ.get("ATLAS_STATIC_URL", "").rstrip("/")
+MANIFEST = "manifest.json"
+
+# Arquivos cujo conteúdo muda o HTML dos mapas
+CODE_FILES = ("app.py", "mapas.py", "registro.py", "popups.py", "geometria.py", "camadas.py", "obras.py")
+
+
+def code_version(base: str = os.path.dirname(os.path.abspath(__file__))) -> str:
+    h = hashlib.sha1()
+    for name in CODE_FILES:
+        try:
+            with open(os.path.join(base, name), "rb") as f:
+                h.update(f.read())
+        except OSError:
+            h.update(name.encode("utf-8"))
+    return h.hexdigest()[:12]
+
+
+def key_digest(key) -> str:
+    """Nome estável de uma chave de mapa (tupla de str/int/float/bool)."""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+
+
+class StaticAtlas:
+    """Mapas publicados em `base_dir`; o manifesto é relido quando muda no disco."""
+
+    def __init__(self, base_dir: str = STATIC_DIR, base_url: str = STATIC_URL):
+        self.base_dir = base_dir
+        self.base_url = base_url
+        self.code = code_version()
+        self._maps = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _refresh(self):
+        path = os.path.join(self.base_dir, MANIFEST)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._maps, self._stamp = {}, None
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        # Publicado com outro código: o HTML pode não ser o que o app desenharia agora
+        self._maps = manifest.get("maps", {}) if manifest.get("code") == self.code else {}
+        self._stamp = stamp
+
+    def lookup(self, key):
+        """Entrada do manifesto para `key` (dict com "file"), ou None."""
+        if os.environ.get("ATLAS_STATIC", "1") == "0":
+            return None
+        with self._lock:
+            self._refresh()
+            entry = self._maps.get(key_digest(key))
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def url(self, entry) -> str:
+        return f"{self.base_url}/{entry['file']}" if self.base_url else ""
+
+    def html(self, entry):
+        try:
+            with open(os.path.join(self.base_dir, entry["file"]), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._maps), "hits": self.hits, "misses": self.misses, "url": self.base_url}
+
+
+# =====================================================
+# Build
+# =====================================================
+def combos(only_default: bool = False) -> dict:
+    """nome -> (aba, {chave do widget: valor}) das seleções a publicar."""
+    from benchmark import LAYER_KEYS
+    from registro import LAYERS
+
+    out = {"mapas-padrao": ("maps", {}), "obras-padrao": ("works", {})}
+    if only_default:
+        return out
+    for layer in LAYERS:
+        if not layer.default and "maps" in layer.pages:
+            out[f"mapas-com-{layer.key}"] = ("maps", {layer.widget_key: True})
+    out["mapas-tudo"] = ("maps", {k: True for k in LAYER_KEYS})
+    return out
+
+
+def _write(path: str, text: str):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _index_html(entries: dict) -> str:
+    rows = "".join(
+        f'<li><a href="{html.escape(e["file"])}">{html.escape(e["name"])}</a> '
+        f'<small>({e["bytes"] / 1024:.0f} KiB)</small></li>'
+        for e in sorted(entries.values(), key=lambda e: e["name"])
+    )
+    return (
+        '<!doctype html><html lang="pt-BR"><head><meta charset="utf-8"><title>ATLAS Milhã - mapas</title></head>'
+        f"<body><h1>ATLAS Geoespacial de Milhã</h1><ul>{rows}</ul></body></html>\n"
+    )
+
+
+def build(out_dir: str = STATIC_DIR, selections: dict = None, districts: bool = True) -> dict:
+    """Renderiza as seleções (e cada distrito na seleção padrão dos mapas) em `out_dir`."""
+    os.environ["ATLAS_STATIC"] = "0"  # o build sempre desenha ao vivo
+    from benchmark import apply_settings, session, walk
+    from camadas import DATA_DIR_CANDIDATES, DISTRICT_FILE, LayerStore, data_files
+
+    selections = dict(combos() if selections is None else selections)
+    if districts:
+        files = data_files(DATA_DIR_CANDIDATES)
+        gj = LayerStore().get(files[DISTRICT_FILE]) if DISTRICT_FILE in files else {}
+        for f in gj.get("features", []):
+            cd = (f.get("properties") or {}).get("CD_DIST")
+            if cd:
+                selections[f"mapas-distrito-{cd}"] = ("maps", {"sidebar_distrito": cd})
+
+    os.makedirs(out_dir, exist_ok=True)
+    entries = {}
+    for name, (tab, settings) in selections.items():
+        t0 = time.perf_counter()
+        at = session(tab, {})
+        apply_settings(at, settings)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{name}: exceção no app: {at.exception[0].value}")
+        frames = [n for n in walk(at._tree) if getattr(n, "type", None) == "iframe"]
+        key = at.session_state["mapa_chave"] if "mapa_chave" in at.session_state else None
+        if not frames or key is None:
+            print(f"{name:<32} sem mapa, ignorado")
+            continue
+        digest = key_digest(key)
+        if digest in entries:
+            print(f"{name:<32} mesmo mapa que {entries[digest]['name']}, ignorado")
+            continue
+        fname = f"{name}-{digest[:8]}.html"
+        doc = frames[-1].proto.srcdoc
+        _write(os.path.join(out_dir, fname), doc)
+        entries[digest] = {"file": fname, "name": name, "tab": tab, "settings": settings, "bytes": len(doc)}
+        print(f"{name:<32} {len(doc) / 1024:8.0f} KiB  {time.perf_counter() - t0:6.1f} s", flush=True)
+
+    manifest = {"code": code_version(), "built": time.strftime("%Y-%m-%dT%H:%M:%S"), "maps": entries}
+    _write(os.path.join(out_dir, "index.html"), _index_html(entries))
+    _write(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=1, ensure_ascii=False))
+    # Arquivos de builds anteriores que saíram do manifesto
+    keep = {e["file"] for e in entries.values()} | {"index.html", MANIFEST}
+    for old in os.listdir(out_dir):
+        if old.endswith(".html") and old not in keep:
+            os.unlink(os.path.join(out_dir, old))
+    return manifest
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Publica os mapas do ATLAS como HTML estático.")
+    p.add_argument("--out", default=STATIC_DIR, help="diretório de saída (ATLAS_STATIC_DIR no app)")
+    p.add_argument("--so-padrao", action="store_true", help="só a seleção padrão de cada aba")
+    p.add_argument("--sem-distritos", action="store_true", help="não publica a seleção de cada distrito")
+    args = p.parse_args(argv)
+    manifest = build(os.path.abspath(args.out), combos(args.so_padrao), not (args.so_padrao or args.sem_distritos))
+    print(f"\n{len(manifest['maps'])} mapa(s) publicados em {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
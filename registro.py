@@ -0,0 +1,254 @@
+# =====================================================
+# Registro de camadas: uma entrada declarativa por camada do ATLAS
+# =====================================================
+# Arquivo(s), tipo de geometria, estilo, popup, grupo da barra lateral e visibilidade
+# inicial de cada camada ficam aqui. O app monta a barra lateral e os mapas percorrendo
+# LAYERS, sem código próprio por camada: uma camada nova é só uma entrada nova.
+import copy
+
+import numpy as np
+import pandas as pd
+
+from mapas import PointLayer, custom_icon, marker_icon
+from obras import classify_text
+from popups import PopupSchema
+
+# Tipos de geometria, na ordem em que são desenhados (polígonos por baixo, pontos por cima)
+KINDS = ("poligono", "densidade", "linha", "ponto", "obras")
+SHAPE_KINDS = ("poligono", "linha")
+
+# Grupos da barra lateral: chave -> (título do expander, começa aberto?)
+GROUPS = {
+    "territorio": ("🗾 Território", True),
+    "infraestrutura": ("🏗️ Infraestrutura", True),
+    "hidricos": ("💧 Recursos Hídricos", False),
+}
+
+
+class Layer:
+    """Uma camada do atlas.
+
+    `kind` é um de KINDS. Polígonos e linhas usam `style` e os atributos `fields`/`aliases`
+    no tooltip (`fields=None`: os primeiros atributos preenchidos, pelo catálogo). Pontos
+    usam `tooltip` (chaves tentadas em ordem, depois `tooltip_default`), `popup` e o ícone
+    `icon` ou, com `icon_by=(chave, regras, padrão)`, o de `icons` escolhido por
+    `obras.classify_text`. No popup, a chave "__TOOLTIP__" é o texto do tooltip.
+    `by_page` troca atributos numa aba específica ({"works": {"style": ...}}).
+    """
+
+    def __init__(self, key, name, files, kind, group, default=False, label=None, pages=("maps",),
+                 style=None, fields=(), aliases=(), tooltip=(), tooltip_default="", popup=None,
+                 icon=None, icon_by=None, icons=None, density_label="", by_page=None):
+        self.key = key
+        self.name = name
+        self.files = (files,) if isinstance(files, str) else tuple(files)
+        self.kind = kind
+        self.group = group
+        self.default = default
+        self.label = label or name
+        self.pages = tuple(pages)
+        self.style = style or {}
+        self.fields = None if fields is None else tuple(fields)
+        self.aliases = tuple(aliases)
+        self.tooltip = tuple(tooltip)
+        self.tooltip_default = tooltip_default
+        self.popup = popup
+        self.icon_by = icon_by
+        self.icons = icons or {"padrao": icon or marker_icon()}
+        self.density_label = density_label
+        self.by_page = by_page or {}
+
+    @property
+    def file(self) -> str:
+        return self.files[0]
+
+    @property
+    def state_key(self) -> str:
+        return f"show_{self.key}"
+
+    @property
+    def widget_key(self) -> str:
+        return f"sidebar_{self.key}"
+
+    def variant(self, **changes) -> "Layer":
+        """Cópia com alguns atributos trocados (ex.: outro estilo no mapa de obras)."""
+        out = copy.copy(self)
+        out.__dict__.update(changes)
+        return out
+
+    def point_keys(self) -> list:
+        """Atributos que os pontos da camada usam (tooltip, popup e ícone)."""
+        keys = list(self.tooltip)
+        if self.popup:
+            keys += self.popup.columns()
+        if self.icon_by:
+            keys.append(self.icon_by[0])
+        return [k for k in dict.fromkeys(keys) if k != "__TOOLTIP__"]
+
+    def point_frame(self, features) -> pd.DataFrame:
+        """Uma linha por feição: __LAT__/__LON__, __TOOLTIP__, __ICON__ e as chaves do popup."""
+        keys = self.point_keys()
+        # dtype object: os valores chegam ao popup como no GeoJSON (3470, não 3470.0)
+        df = pd.DataFrame(
+            [[(f.get("properties") or {}).get(k) for k in keys] for f in features], columns=keys, dtype=object
+        )
+        xy = np.array(
+            [(f.get("geometry") or {}).get("coordinates", [np.nan, np.nan])[:2] for f in features], dtype=float
+        ).reshape(-1, 2)
+        return self._finish_points(df, xy)
+
+    def columnar_point_frame(self, layer, keep=None) -> pd.DataFrame:
+        """Como `point_frame`, lido dos arrays do cache colunar (`keep`: máscara de feições)."""
+        df = layer.properties_frame(self.point_keys())
+        xy = np.asarray(layer.point_xy())
+        if keep is not None:
+            df, xy = df[keep].reset_index(drop=True), xy[keep]
+        return self._finish_points(df, xy)
+
+    def _finish_points(self, df: pd.DataFrame, xy: np.ndarray) -> pd.DataFrame:
+        df["__LON__"], df["__LAT__"] = xy[:, 0], xy[:, 1]
+
+        tip = pd.Series(None, index=df.index, dtype=object)
+        for k in self.tooltip:
+            filled = df[k].notna() & (df[k] != "")
+            tip = tip.where(tip.notna(), df[k].where(filled))
+        df["__TOOLTIP__"] = tip.fillna(self.tooltip_default).astype(str)
+
+        if self.icon_by:
+            col, rules, default = self.icon_by
+            df["__ICON__"] = classify_text(df[col], rules, default)
+        else:
+            df["__ICON__"] = next(iter(self.icons))
+        return df
+
+    def point_layer(self, frame: pd.DataFrame) -> PointLayer:
+        """PointLayer de um frame de `point_frame`/`columnar_point_frame`."""
+        return PointLayer.from_frame(
+            frame, tooltip="__TOOLTIP__", popup=self.popup, icon_col="__ICON__", icon_specs=self.icons,
+        )
+
+
+# Cor do ícone das outorgas pelo tipo de uso (primeira regra que casar vence)
+OUTORGA_USE_COLORS = [
+    (("irrigacao",), "green"),
+    (("abastecimento_humano",), "blue"),
+    (("industria",), "red"),
+    (("servico_e_comercio",), "purple"),
+]
+
+LAYERS = [
+    # ---------- Território ----------
+    Layer(
+        "distritos", "Distritos", "milha_dist_polig.geojson", "poligono", "territorio", default=True,
+        pages=("maps", "works"),
+        style={"fillColor": "#9fe2fc", "fillOpacity": 0.2, "color": "#000000", "weight": 1},
+        by_page={"works": {"style": {"fillColor": "#9fe2fc", "fillOpacity": 0.1, "color": "#000000", "weight": 1}}},
+    ),
+    Layer(
+        "sede", "Sede Distritos", "Distritos_pontos.geojson", "ponto", "territorio", default=True,
+        pages=("maps", "works"),
+        tooltip=("nome_do_distrito",), tooltip_default="Sede", icon=marker_icon("green", "home"),
+        by_page={"works": {"icons": {"padrao": marker_icon("darkgreen", "home")}}},
+    ),
+    Layer(
+        "localidades", "Localidades", "Localidades.geojson", "ponto", "territorio",
+        tooltip=("Localidade",), tooltip_default="Localidade",
+        popup=PopupSchema(
+            [("📛 Nome", "Localidade"), ("📍 Distrito", "Distrito")],
+            title="🏘️ Localidade", theme="localidade",
+        ),
+        icon=custom_icon("https://i.ibb.co/kgbmmjWc/location-icon-242304.png", (18, 18), "#2E7D32"),
+    ),
+    Layer(
+        "estradas", "Estradas", "estradas_milha.geojson", "linha", "territorio",
+        style={"color": "#8B4513", "weight": 2, "opacity": 0.8}, fields=None,
+    ),
+    Layer(
+        "urbanas", "Áreas Urbanas", "milha_urbanas.geojson", "poligono", "territorio",
+        style={"fillColor": "#FF69B4", "fillOpacity": 0.3, "color": "#8B008B", "weight": 2, "opacity": 0.8},
+        fields=None,
+    ),
+    Layer(
+        "domicilios", "Domicílios", ("domicilios_cidade.geojson", "domicilios_rural_mil.geojson"), "densidade",
+        "territorio", density_label="domicílio(s)",
+    ),
+    # ---------- Infraestrutura ----------
+    Layer(
+        "escolas", "Escolas Públicas", "Escolas_publicas.geojson", "ponto", "infraestrutura",
+        tooltip=("no_entidad", "Name"), tooltip_default="Escola",
+        popup=PopupSchema(
+            [("📛 Nome", "nome_da_escola"), ("📍 Endereço", "endereco"), ("📞 Contato", "telefone"),
+             ("🧭 Modalidade", "modalidade")],
+            title="🏫 Escola Municipal", theme="escola",
+        ),
+        icon=custom_icon("https://i.ibb.co/pBsQcQws/education.png", (35, 35), "#2A4D9B"),
+    ),
+    Layer(
+        "unidades_saude", "Unidades de Saúde", "Unidades_saude.geojson", "ponto", "infraestrutura",
+        tooltip=("nome", "Name"), tooltip_default="Unidade",
+        popup=PopupSchema(
+            [("📛 Unidade", "unidade"), ("📍 Endereço", "endereeo"), ("📞 Bairro", "bairro"),
+             ("🧭 Município", "municipio")],
+            title="🏥 Unidades de Saúde", theme="escola",
+        ),
+        icon=custom_icon("https://i.ibb.co/rGdw6d71/hospital.png", (35, 35), "#D63E2A"),
+    ),
+    Layer(
+        "obras", "Obras Municipais", "milha_obras.csv", "obras", "infraestrutura", default=True,
+        pages=("works",),
+    ),
+    # ---------- Recursos hídricos ----------
+    Layer(
+        "tecnologias", "Tecnologias Sociais", "teclogias_sociais.geojson", "ponto", "hidricos",
+        tooltip=("Comunidade", "Name"), tooltip_default="Tecnologia Social",
+        popup=PopupSchema([("Local", "__TOOLTIP__")]), icon=marker_icon("orange", "tint"),
+    ),
+    Layer(
+        "pocos_cidade", "Poços Cidade", "pocos_cidade_mil.geojson", "ponto", "hidricos",
+        tooltip=("Localidade", "Name"), tooltip_default="Poço",
+        popup=PopupSchema(
+            [("Localidade", "__TOOLTIP__"), ("Profundidade", "Profundida"), ("Vazão (L/h)", "Vazão_LH_2")],
+            default="-",
+        ),
+        icon=marker_icon("blue", "tint"),
+    ),
+    Layer(
+        "pocos_rural", "Poços Zona Rural", "pocos_rural_mil.geojson", "ponto", "hidricos", label="Poços Rural",
+        tooltip=("Localidade",), tooltip_default="Poço Rural",
+        popup=PopupSchema(
+            [("📍 Localidade", "Localidade"), ("📏 Profundidade", "Profundida_m"), ("💦 Vazão (L/h)", "Vazão_LH"),
+             ("⚡ Energia", "Energia")],
+            title="💧 Poço Rural", theme="poco",
+        ),
+        icon=custom_icon("https://i.ibb.co/6JrpxXMT/water.png", (23, 23), "#0059b3"),
+    ),
+    Layer(
+        "espelhos", "Espelhos d'Água", "espelhos_dagua.geojson", "poligono", "hidricos",
+        style={"fillColor": "#1E90FF", "fillOpacity": 0.7, "color": "#000080", "weight": 2, "opacity": 0.8},
+        fields=("CODIGOES0", "AREA1"), aliases=("Código:", "Área (ha):"),
+    ),
+    Layer(
+        "outorgas", "Outorgas Vigentes", "outorgas_milha.geojson", "ponto", "hidricos",
+        tooltip=("REQUERENTE",), tooltip_default="Outorga",
+        popup=PopupSchema(
+            [("Requerente", "REQUERENTE"), ("Tipo Manancial", "TIPO MANANCIAL"), ("Tipo de Uso", "TIPO DE USO"),
+             ("Manancial", "MANANCIAL"), ("Fim da Vigência", "FIM DA VIGÊNCIA"),
+             ("Volume Outorgado", "VOLUME OUTORGADO (m³)", " m³")],
+            default="N/A",
+        ),
+        icon_by=("TIPO DE USO", OUTORGA_USE_COLORS, "gray"),
+        icons={c: marker_icon(c, "file-text", prefix="fa") for c in ["gray", *(c for _, c in OUTORGA_USE_COLORS)]},
+    ),
+]
+
+LAYER_BY_KEY = {layer.key: layer for layer in LAYERS}
+
+
+def page_layers(page: str) -> list:
+    """Camadas de uma aba (com os ajustes de `by_page`), na ordem de desenho (KINDS)."""
+    layers = [l.variant(**l.by_page[page]) if page in l.by_page else l for l in LAYERS if page in l.pages]
+    return sorted(layers, key=lambda l: KINDS.index(l.kind))
+
+
+def group_layers(group: str) -> list:
+    return [l for l in LAYERS if l.group == group]
@@ -0,0 +1,292 @@
+# =====================================================
+# Dados sintéticos: as camadas de `dados/` em qualquer escala, com o mesmo esquema
+# =====================================================
+# Cada ponto sintético parte de um registro real sorteado (bootstrap): herda os atributos
+# dele e ganha uma posição sorteada em volta da original (kernel gaussiano com a largura
+# de banda de Scott), sorteada de novo enquanto cair fora dos distritos. Assim a
+# distribuição espacial e a relação entre os atributos se mantêm. Além disso:
+#   - identificadores (inteiros/códigos todos distintos) recebem valores novos e únicos;
+#   - colunas que são função afim da posição (lat/lon, UTM) são recalculadas;
+#   - números de alta cardinalidade levam um ruído multiplicativo (~10%), para que o
+#     número de valores distintos cresça com a escala como cresceria nos dados reais.
+# Camadas de polígonos e linhas e os demais arquivos são copiados como estão.
+#
+# Uso:
+#   python sintetico.py /tmp/milha-x100 --scale 100
+#   ATLAS_DATA_DIR=/tmp/milha-x100 streamlit run app.py
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from camadas import DATA_DIR_CANDIDATES, DISTRICT_FILE
+from geometria import PolygonIndex
+from obras import norm_col
+
+# Ruído multiplicativo (desvio do log) aplicado aos números de alta cardinalidade
+NOISE_SIGMA = 0.1
+# Fração mínima de valores distintos para uma coluna numérica ser tratada como medida
+HIGH_CARDINALITY = 0.3
+# Tentativas de sortear uma posição dentro dos distritos antes de ficar com a original
+MAX_REJECTIONS = 20
+
+_ID_NAME = re.compile(r"(^|_)(id|cod|codigo|ordem|numero|n|telefone|fone)(_|$)")
+_BR_NUMBER = re.compile(r"^-?(\d{1,3}(\.\d{3})+|\d+)(,\d+)?$")
+
+
+# =====================================================
+# Posições
+# =====================================================
+def _bandwidth(xy: np.ndarray) -> np.ndarray:
+    ok = xy[~np.isnan(xy).any(axis=1)]
+    projected = len(ok) and np.abs(ok).max() > 180
+    floor = 50.0 if projected else 0.0005
+    if len(ok) < 2:
+        return np.array([floor * 10, floor * 10])
+    return np.maximum(ok.std(axis=0) * len(ok) ** (-1 / 6), floor)
+
+
+def sample_positions(xy: np.ndarray, n: int, rng, inside=None):
+    """(índices dos registros de origem, posições novas) para `n` pontos.
+
+    `inside(xy) -> bool[]` restringe as posições a uma região; só vale para registros
+    cuja posição original já está dentro dela. Registros sem posição continuam sem.
+    """
+    xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+    src = rng.integers(0, len(xy), size=n)
+    base = xy[src]
+    bw = _bandwidth(xy)
+    out = base + rng.normal(0.0, 1.0, size=(n, 2)) * bw
+    if inside is None:
+        return src, out
+
+    valid = ~np.isnan(base).any(axis=1)
+    constrained = np.zeros(n, dtype=bool)
+    constrained[valid] = inside(base[valid])
+    pending = np.flatnonzero(constrained)
+    for _ in range(MAX_REJECTIONS):
+        if not len(pending):
+            break
+        pending = pending[~inside(out[pending])]
+        out[pending] = base[pending] + rng.normal(0.0, 1.0, size=(len(pending), 2)) * bw
+    if len(pending):
+        out[pending] = base[pending]
+    return src, out
+
+
+def district_mask(src_dir: str):
+    """Função que diz se cada (lon, lat) cai em algum distrito de `src_dir` (None sem o arquivo)."""
+    path = os.path.join(src_dir, DISTRICT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        index = PolygonIndex(json.load(f).get("features", []))
+    return lambda xy: index.locate(xy) >= 0
+
+
+# =====================================================
+# Atributos
+# =====================================================
+def _decimals(values) -> int:
+    best = 0
+    for v in values:
+        if isinstance(v, float):
+            s = repr(v)
+            if "e" not in s and "." in s:
+                best = max(best, len(s.split(".")[1]))
+    return min(best, 8)
+
+
+def _br_to_float(s: str) -> float:
+    return float(s.replace(".", "").replace(",", ".")) if "," in s or re.search(r"\.\d{3}$", s) else float(s)
+
+
+def _format_br(v: float, like: str) -> str:
+    dec = len(like.split(",")[1]) if "," in like else 0
+    s = f"{v:,.{dec}f}" if "." in like.split(",")[0] else f"{v:.{dec}f}"
+    return s.replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _is_number(v) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _column_kind(name: str, values: list, xy: np.ndarray):
+    """("derivada", (coeficientes, decimais, int?)), ("id", None), ("medida", None) ou ("copia", None)."""
+    present = [v for v in values if v not in (None, "")]
+    if not present:
+        return "copia", None
+
+    if all(_is_number(v) for v in present) and len(present) == len(values) and len(values) >= 4:
+        A = np.column_stack([xy, np.ones(len(xy))])
+        v = np.asarray(values, dtype=float)
+        ok = ~np.isnan(A).any(axis=1)
+        if ok.sum() >= 4 and v[ok].var() > 0:
+            coef, *_ = np.linalg.lstsq(A[ok], v[ok], rcond=None)
+            resid = v[ok] - A[ok] @ coef
+            if resid.var() < 1e-5 * v[ok].var():
+                return "derivada", (coef, _decimals(present), all(isinstance(x, int) for x in present))
+
+    digits = all(isinstance(v, int) or (isinstance(v, str) and v.isdigit()) for v in present)
+    distinct = len(set(map(str, present))) == len(present)
+    same_width = len({len(str(v)) for v in present}) == 1
+    if digits and distinct and len(present) > 1 and (same_width or _ID_NAME.search(norm_col(name))):
+        return "id", None
+
+    numeric = all(_is_number(v) or (isinstance(v, str) and _BR_NUMBER.match(v)) for v in present)
+    if numeric and len(set(map(str, present))) >= HIGH_CARDINALITY * len(present):
+        return "medida", None
+    return "copia", None
+
+
+def _ids(values: list, n: int) -> list:
+    present = [v for v in values if v not in (None, "")]
+    start = min(int(v) for v in present)
+    if all(isinstance(v, int) for v in present):
+        return list(range(start, start + n))
+    width = max(len(v) for v in present)
+    return [str(i).zfill(width) for i in range(start, start + n)]
+
+
+def _vary(v, factor: float):
+    if v in (None, ""):
+        return v
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, int):
+        return int(round(v * factor))
+    if isinstance(v, float):
+        return round(v * factor, _decimals([v]))
+    return _format_br(_br_to_float(v) * factor, v)
+
+
+def synthesize_records(records: list, xy: np.ndarray, n: int, rng, inside=None):
+    """`n` registros sintéticos (dicts com as chaves de `records`) e suas posições."""
+    src, new_xy = sample_positions(xy, n, rng, inside)
+    columns = list(dict.fromkeys(k for r in records for k in r))
+    out = [dict(records[i]) for i in src]
+    for name in columns:
+        values = [r.get(name) for r in records]
+        kind, info = _column_kind(name, values, xy)
+        if kind == "derivada":
+            coef, dec, as_int = info
+            calc = np.column_stack([new_xy, np.ones(n)]) @ coef
+            for r, v, ok in zip(out, calc.tolist(), ~np.isnan(new_xy).any(axis=1)):
+                if ok:
+                    r[name] = int(round(v)) if as_int else round(v, dec)
+        elif kind == "id":
+            for r, v in zip(out, _ids(values, n)):
+                if r.get(name) not in (None, ""):
+                    r[name] = v
+        elif kind == "medida":
+            for r, f in zip(out, np.exp(rng.normal(0.0, NOISE_SIGMA, size=n)).tolist()):
+                r[name] = _vary(r.get(name), f)
+    return out, new_xy
+
+
+# =====================================================
+# Arquivos
+# =====================================================
+def synthesize_geojson(src: str, dst: str, scale: float, rng, inside=None) -> bool:
+    """Gera `dst` a partir de uma camada de pontos; False (nada escrito) para outras geometrias."""
+    with open(src, "r", encoding="utf-8") as f:
+        gj = json.load(f)
+    feats = gj.get("features", [])
+    if not feats or any((ft.get("geometry") or {}).get("type") != "Point" for ft in feats):
+        return False
+    xy = np.asarray([ft["geometry"]["coordinates"][:2] for ft in feats], dtype=float)
+    projected = np.nanmax(np.abs(xy), initial=0.0) > 180
+    n = max(1, int(round(len(feats) * scale)))
+    props, new_xy = synthesize_records(
+        [ft.get("properties") or {} for ft in feats], xy, n, rng, None if projected else inside
+    )
+    dec = _decimals(xy.ravel().tolist())
+    out = [
+        {"type": "Feature", "properties": p, "geometry": {"type": "Point", "coordinates": [round(x, dec), round(y, dec)]}}
+        for p, (x, y) in zip(props, new_xy.tolist())
+    ]
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump({**gj, "features": out}, f, ensure_ascii=False)
+    return True
+
+
+def _parse_coord(s: str) -> float:
+    try:
+        return float(str(s).strip().replace(",", "."))
+    except ValueError:
+        return np.nan
+
+
+def synthesize_csv(src: str, dst: str, scale: float, rng, inside=None):
+    """Como `synthesize_geojson` para um CSV com colunas de latitude/longitude (ex.: obras)."""
+    with open(src, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        sep = ";" if sample.count(";") > sample.count(",") else ","
+        reader = csv.DictReader(f, delimiter=sep)
+        header = reader.fieldnames or []
+        rows = list(reader)
+    if not rows:
+        shutil.copy2(src, dst)
+        return
+    normed = {norm_col(c): c for c in header}
+    lat_col = next((normed[c] for c in ("latitude", "lat") if c in normed), None)
+    lon_col = next((normed[c] for c in ("longitude", "long", "lon") if c in normed), None)
+    if lat_col and lon_col:
+        xy = np.asarray([[_parse_coord(r[lon_col]), _parse_coord(r[lat_col])] for r in rows])
+    else:
+        xy = np.full((len(rows), 2), np.nan)
+
+    attrs = [{k: v for k, v in r.items() if k not in (lat_col, lon_col)} for r in rows]
+    n = max(1, int(round(len(rows) * scale)))
+    out, new_xy = synthesize_records(attrs, xy, n, rng, inside)
+    if lat_col and lon_col:
+        dec = max((len(str(r[lat_col]).split(".")[-1]) for r in rows if "." in str(r[lat_col])), default=6)
+        for r, (x, y) in zip(out, new_xy.tolist()):
+            ok = not (np.isnan(x) or np.isnan(y))
+            r[lat_col], r[lon_col] = (f"{y:.{dec}f}", f"{x:.{dec}f}") if ok else ("", "")
+    with open(dst, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=header, delimiter=sep)
+        writer.writeheader()
+        writer.writerows(out)
+
+
+def generate(src_dir: str, dst_dir: str, scale: float, seed: int = 0, only=None):
+    """Copia `src_dir` para `dst_dir` trocando as camadas de pontos e CSVs por versões sintéticas.
+
+    `scale` multiplica o número de registros de cada camada; `only` (nomes de arquivo)
+    limita quais são sintetizadas, as demais são copiadas.
+    """
+    os.makedirs(dst_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    inside = district_mask(src_dir)
+    for name in sorted(os.listdir(src_dir)):
+        src, dst = os.path.join(src_dir, name), os.path.join(dst_dir, name)
+        if not os.path.isfile(src):
+            continue
+        lower = name.lower()
+        if only and name not in only:
+            shutil.copy2(src, dst)
+        elif lower.endswith(".csv"):
+            synthesize_csv(src, dst, scale, rng, inside)
+        elif not (lower.endswith(".geojson") and synthesize_geojson(src, dst, scale, rng, inside)):
+            shutil.copy2(src, dst)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Gera um diretório de dados sintéticos no esquema de dados/.")
+    p.add_argument("dst", help="diretório de saída (use com ATLAS_DATA_DIR)")
+    p.add_argument("--src", default=DATA_DIR_CANDIDATES[0], help="diretório de dados de origem")
+    p.add_argument("--scale", type=float, default=10.0, help="multiplicador do número de registros")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--only", nargs="*", help="sintetiza só estes arquivos (os demais são copiados)")
+    args = p.parse_args(argv)
+    generate(args.src, args.dst, args.scale, args.seed, args.only)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import sys
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["camadas", "colunar", "publicar", "registro", "mapas", "tiles", "obras", "exportar", "geometria", "perf"]
+
+
+@pytest.fixture
+def atlas(tmp_path, monkeypatch):
+    """AppTest do app na seção de mapas, lendo uma cópia de dados/ em `tmp_path`."""
+    dados = tmp_path / "dados"
+    shutil.copytree(os.path.join(ROOT, "dados"), dados)
+    monkeypatch.setenv("ATLAS_DATA_DIR", str(dados))
+    monkeypatch.setenv("ATLAS_COLUMNAR_DIR", str(tmp_path / "colunar"))
+    monkeypatch.setenv("ATLAS_STATIC_DIR", str(tmp_path / "publicado"))
+    monkeypatch.setenv("ATLAS_COLUMNAR_MIN_KB", "64")
+    # As configurações são lidas na importação: o app reimporta os módulos com o ambiente acima
+    for name in MODULES:
+        if name in sys.modules:
+            monkeypatch.delitem(sys.modules, name)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+    def make():
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+        at.query_params["page"] = "maps"
+        at.query_params["tab"] = "maps"
+        return at
+
+    make.dados = dados
+    yield make
+    st.cache_resource.clear()
+    st.cache_data.clear()
+
+
+@pytest.mark.parametrize("copies", [1, 30], ids=["geojson", "colunar"])
+def test_broken_point_layer_warns(atlas, copies):
+    # Arquivo cortado ao meio; com 30 cópias passa do limite do cache colunar
+    path = atlas.dados / "Escolas_publicas.geojson"
+    data = path.read_bytes() * copies
+    path.write_bytes(data[: len(data) // 2])
+    at = atlas()
+    at.run()
+    at.checkbox(key="sidebar_escolas").check().run()
+    assert not at.exception
+    assert any("Escolas_publicas.geojson" in w.value for w in at.warning)
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import colunar
+from camadas import DistrictJoin, properties_frame
+from registro import LAYER_BY_KEY
+
+DISTRICTS = {"type": "FeatureCollection", "features": [
+    {"type": "Feature", "properties": {"CD_DIST": "1", "NM_DIST": "Norte"},
+     "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]]]}},
+    {"type": "Feature", "properties": {"CD_DIST": "2", "NM_DIST": "Sul"},
+     "geometry": {"type": "Polygon", "coordinates": [[[0, -2], [2, -2], [2, 0], [0, 0], [0, -2]]]}},
+]}
+
+
+def _points():
+    feats = []
+    for i in range(40):
+        props = {"REQUERENTE": f"R{i}", "TIPO DE USO": ["irrigacao", "industria", None][i % 3],
+                 "VOLUME OUTORGADO (m³)": 3470 if i % 2 else 12.5}
+        if i % 5 == 0:
+            del props["TIPO DE USO"]  # chave ausente
+        geom = None if i == 7 else {"type": "Point", "coordinates": [0.05 * i, 1.5 - 0.08 * i]}
+        feats.append({"type": "Feature", "properties": None if i == 11 else props, "geometry": geom})
+    return {"type": "FeatureCollection", "features": feats}
+
+
+@pytest.fixture
+def cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(colunar, "MIN_BYTES", 0)
+    path = tmp_path / "pontos.geojson"
+    gj = _points()
+    path.write_text(json.dumps(gj), encoding="utf-8")
+    layer = colunar.load_points(str(path), str(tmp_path / "cache"))
+    assert layer is not None
+    return gj, layer
+
+
+def test_point_xy_matches_geometries(cached):
+    gj, layer = cached
+    xy = layer.point_xy()
+    assert np.isnan(xy[7]).all()
+    expected = [f["geometry"]["coordinates"] for f in gj["features"] if f["geometry"]]
+    np.testing.assert_array_equal(np.delete(xy, 7, axis=0), expected)
+
+
+def test_properties_frame_matches_geojson(cached):
+    gj, layer = cached
+    fields = ["REQUERENTE", "TIPO DE USO", "VOLUME OUTORGADO (m³)", "inexistente"]
+    got = layer.properties_frame(fields)
+    expected = properties_frame(gj, fields)
+    pd.testing.assert_frame_equal(got, expected.astype(object).where(expected.notna(), None))
+    assert got.loc[1, "VOLUME OUTORGADO (m³)"] == 3470 and isinstance(got.loc[1, "VOLUME OUTORGADO (m³)"], int)
+
+
+def test_columnar_point_frame_matches_features(cached):
+    gj, layer = cached
+    outorgas = LAYER_BY_KEY["outorgas"]
+    keep = np.arange(40) % 4 != 0
+    got = outorgas.columnar_point_frame(layer, keep)
+    expected = outorgas.point_frame([f for f, k in zip(gj["features"], keep) if k])
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_tag_xy_matches_tag_layer(cached):
+    gj, layer = cached
+    join = DistrictJoin(DISTRICTS)
+    pd.testing.assert_frame_equal(join.tag_xy(layer.point_xy()), join.tag_layer(gj))
+
+
+def test_non_point_layers_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(colunar, "MIN_BYTES", 0)
+    path = tmp_path / "distritos.geojson"
+    path.write_text(json.dumps(DISTRICTS), encoding="utf-8")
+    assert colunar.load_points(str(path), str(tmp_path / "cache")) is None
+
+
+def test_stale_cache_is_rebuilt(cached, tmp_path):
+    gj, _ = cached
+    path = tmp_path / "pontos.geojson"
+    gj["features"] = gj["features"][:3]
+    path.write_text(json.dumps(gj), encoding="utf-8")
+    assert len(colunar.load_points(str(path), str(tmp_path / "cache"))) == 3
@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+import struct
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+from exportar import FrameFeatures, write_csv, write_geojson, write_kml, write_shapefile
+
+# Anel externo anti-horário com buraco horário (sentidos do GeoJSON/RFC 7946)
+OUTER = [[0, 0], [4, 0], [4, 4], [0, 4], [0, 0]]
+HOLE = [[1, 1], [1, 2], [2, 2], [2, 1], [1, 1]]
+FEATURES = [
+    {"type": "Feature", "properties": {"nome": "Açude", "area": 12.5, "cod": 7},
+     "geometry": {"type": "Polygon", "coordinates": [OUTER, HOLE]}},
+    {"type": "Feature", "properties": {"nome": "Lagoa", "area": 3, "cod": 8},
+     "geometry": {"type": "MultiPolygon", "coordinates": [[[[5, 5], [6, 5], [6, 6], [5, 5]]], [OUTER]]}},
+    {"type": "Feature", "properties": {"nome": "Poço", "area": None, "cod": 9},
+     "geometry": {"type": "Point", "coordinates": [-39.2, -5.7]}},
+    {"type": "Feature", "properties": {"nome": "Sem local", "area": 1.25, "cod": 10}, "geometry": None},
+]
+
+
+def _signed_area(xy):
+    x, y = xy[:, 0], xy[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _read_shp(data: bytes):
+    """(tipo, [(offset em words, registro)]) de um .shp."""
+    code, length = struct.unpack(">7i", data[:28])[6], len(data)
+    assert struct.unpack(">i", data[24:28])[0] * 2 == length
+    shape_type = struct.unpack("<i", data[32:36])[0]
+    records, pos = [], 100
+    while pos < length:
+        n, words = struct.unpack(">ii", data[pos:pos + 8])
+        records.append((pos // 2, data[pos + 8:pos + 8 + words * 2]))
+        pos += 8 + words * 2
+    return shape_type, records
+
+
+def _polygon_rings(content: bytes):
+    code, *_bbox, nparts, npoints = struct.unpack("<i4dii", content[:44])
+    assert code == 5
+    starts = list(struct.unpack(f"<{nparts}i", content[44:44 + 4 * nparts])) + [npoints]
+    xy = np.frombuffer(content[44 + 4 * nparts:], dtype="<f8").reshape(-1, 2)
+    return [xy[a:b] for a, b in zip(starts, starts[1:])]
+
+
+def _shapefile(features, **kw):
+    buf = io.BytesIO()
+    write_shapefile(features, buf, **kw)
+    return zipfile.ZipFile(io.BytesIO(buf.getvalue()))
+
+
+def test_shapefile_splits_geometry_types_and_orients_rings():
+    zf = _shapefile(FEATURES, name="espelhos")
+    assert sorted(zf.namelist()) == sorted(
+        f"espelhos_{s}.{e}" for s in ("poligonos", "pontos") for e in ("shp", "shx", "dbf", "cpg", "prj")
+    )
+    shape_type, records = _read_shp(zf.read("espelhos_poligonos.shp"))
+    assert shape_type == 5
+    # Polígono, multipolígono e a feição sem geometria (registro nulo no primeiro conjunto)
+    assert len(records) == 3 and records[2][1] == struct.pack("<i", 0)
+    rings = _polygon_rings(records[0][1])
+    assert _signed_area(rings[0]) < 0 < _signed_area(rings[1])  # externo horário, buraco anti-horário
+    assert all(_signed_area(r) < 0 for r in _polygon_rings(records[1][1]))
+
+    shape_type, records = _read_shp(zf.read("espelhos_pontos.shp"))
+    assert shape_type == 1 and struct.unpack("<i2d", records[0][1]) == (1, -39.2, -5.7)
+
+
+def test_shx_offsets_point_at_shp_records():
+    zf = _shapefile(FEATURES, name="espelhos")
+    for stem in ("espelhos_poligonos", "espelhos_pontos"):
+        _, records = _read_shp(zf.read(f"{stem}.shp"))
+        shx = zf.read(f"{stem}.shx")
+        assert struct.unpack(">i", shx[24:28])[0] * 2 == len(shx) == 100 + 8 * len(records)
+        index = np.frombuffer(shx[100:], dtype=">i4").reshape(-1, 2)
+        assert index.tolist() == [[off, len(content) // 2] for off, content in records]
+
+
+def test_shapefile_dbf_records_match_features():
+    zf = _shapefile(FEATURES[:2], name="espelhos")
+    dbf = zf.read("espelhos.dbf")
+    n, header_len, record_len = struct.unpack("<IHH", dbf[4:12])
+    fields = [dbf[32 + 32 * i:64 + 32 * i] for i in range((header_len - 33) // 32)]
+    names = [f[:11].rstrip(b"\x00").decode() for f in fields]
+    kinds = [f[11:12].decode() for f in fields]
+    assert n == 2 and names == ["nome", "area", "cod"] and kinds == ["C", "N", "N"]
+    rows = [dbf[header_len + i * record_len:header_len + (i + 1) * record_len] for i in range(n)]
+    widths = [f[16] for f in fields]
+    values = []
+    for row in rows:
+        pos, out = 1, []
+        for w in widths:
+            out.append(row[pos:pos + w].decode("utf-8").strip())
+            pos += w
+        values.append(out)
+    assert values == [["Açude", "12.5", "7"], ["Lagoa", "3.0", "8"]]
+    assert dbf.endswith(b"\x1a") and len(dbf) == header_len + n * record_len + 1
+
+
+def test_geojson_round_trip():
+    buf = io.BytesIO()
+    write_geojson(FEATURES, buf, name="espelhos", crs="urn:ogc:def:crs:EPSG::4674")
+    gj = json.loads(buf.getvalue())
+    assert gj["crs"]["properties"]["name"] == "urn:ogc:def:crs:EPSG::4674"
+    assert [f["geometry"] for f in gj["features"]] == [f["geometry"] for f in FEATURES]
+    assert [f["properties"] for f in gj["features"]] == [f["properties"] for f in FEATURES]
+
+
+def test_csv_has_center_and_wkt():
+    buf = io.BytesIO()
+    write_csv(FEATURES, buf)
+    rows = list(csv.reader(io.StringIO(buf.getvalue().decode("utf-8-sig"))))
+    assert rows[0] == ["nome", "area", "cod", "longitude", "latitude", "wkt"]
+    assert rows[1][3:5] == ["1.5", "1.5"]  # média de todos os vértices, buraco incluso
+    assert rows[1][5].startswith("POLYGON ((0 0, 4 0")
+    assert rows[3][:5] == ["Poço", "", "9", "-39.2", "-5.7"] and rows[3][5] == "POINT (-39.2 -5.7)"
+    assert rows[4][3:] == ["", "", ""]
+
+
+def test_kml_is_valid_and_keeps_attributes():
+    buf = io.BytesIO()
+    write_kml(FEATURES, buf, name="Espelhos", label_fields=("nome",), style={"color": "#000080"})
+    ns = {"k": "http://www.opengis.net/kml/2.2"}
+    root = ET.fromstring(buf.getvalue())
+    marks = root.findall(".//k:Placemark", ns)
+    assert [m.find("k:name", ns).text for m in marks] == ["Açude", "Lagoa", "Poço", "Sem local"]
+    assert marks[0].find(".//k:innerBoundaryIs", ns) is not None
+    assert len(marks[1].findall(".//k:Polygon", ns)) == 2
+    assert marks[3].find(".//k:Point", ns) is None
+    assert root.find(".//k:LineStyle/k:color", ns).text == "ff800000"
+
+
+def test_frame_features_rows_without_coordinates_have_no_geometry():
+    df = pd.DataFrame({"obra": ["A", "B", "C"], "valor": [1.5, np.nan, 3.0],
+                       "__LAT__": [-5.7, np.nan, -5.6], "__LON__": [-39.2, -39.1, -39.0]})
+    feats = list(FrameFeatures(df, ["obra", "valor"], chunk=2))
+    assert [f["geometry"] for f in feats] == [
+        {"type": "Point", "coordinates": [-39.2, -5.7]}, None, {"type": "Point", "coordinates": [-39.0, -5.6]},
+    ]
+    assert feats[1]["properties"] == {"obra": "B", "valor": None}
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from geometria import clip_line, clip_ring, simplify_geojson
+
+
+def _ring_area(xy):
+    xy = np.asarray(xy, dtype=float)
+    x, y = xy[:, 0], xy[:, 1]
+    return 0.5 * abs(float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)))
+
+
+def _neighbours():
+    """Dois polígonos que dividem uma fronteira sinuosa (x ~ 1) de 200 vértices."""
+    rng = np.random.default_rng(0)
+    ys = np.linspace(0, 1, 200)
+    border = np.c_[1 + 0.002 * rng.standard_normal(200), ys]
+    border[[0, -1], 0] = 1
+    west = [[0, 0], *border.tolist(), [0, 1], [0, 0]]
+    east = [[2, 0], [2, 1], *border[::-1].tolist(), [2, 0]]
+    feats = [
+        {"type": "Feature", "properties": {"nome": "Oeste", "x": 1}, "geometry": {"type": "Polygon", "coordinates": [west]}},
+        {"type": "Feature", "properties": {"nome": "Leste", "x": 2}, "geometry": {"type": "Polygon", "coordinates": [east]}},
+    ]
+    return {"type": "FeatureCollection", "features": feats}
+
+
+def _border_vertices(geom):
+    ring = np.asarray(geom["coordinates"][0])
+    return {tuple(p) for p in ring if 0.5 < p[0] < 1.5}
+
+
+@pytest.mark.parametrize("tolerance, precision", [(0.00002, 6), (0.0001, 5), (0.0005, 4), (0.01, 4)])
+def test_simplify_keeps_shared_border_identical(tolerance, precision):
+    gj = _neighbours()
+    out = simplify_geojson(gj, tolerance, precision)
+    west, east = (f["geometry"] for f in out["features"])
+    assert _border_vertices(west) == _border_vertices(east)
+    for geom in (west, east):
+        ring = geom["coordinates"][0]
+        assert ring[0] == ring[-1] and len(ring) >= 4
+    # As junções (cantos onde a fronteira encontra o contorno) ficam fixas
+    assert {(1.0, 0.0), (1.0, 1.0)} <= _border_vertices(west)
+
+
+def test_simplify_reduces_vertices_and_keeps_area():
+    gj = _neighbours()
+    out = simplify_geojson(gj, 0.01, 4)
+    for before, after in zip(gj["features"], out["features"]):
+        b, a = before["geometry"]["coordinates"][0], after["geometry"]["coordinates"][0]
+        assert len(a) < len(b) / 10
+        assert _ring_area(a) == pytest.approx(_ring_area(b), rel=0.01)
+
+
+def test_simplify_drops_tiny_features_and_filters_properties():
+    gj = _neighbours()
+    gj["features"].append({"type": "Feature", "properties": {"nome": "Ilhota"}, "geometry": {
+        "type": "Polygon", "coordinates": [[[5, 5], [5.001, 5], [5.001, 5.001], [5, 5]]]}})
+    out = simplify_geojson(gj, 0.01, 4, keep_properties=["nome"])
+    assert [f["properties"] for f in out["features"]] == [{"nome": "Oeste"}, {"nome": "Leste"}]
+
+
+def test_simplify_lines_keep_endpoints():
+    line = [[0, 0], [0.5, 0.0001], [1, 0], [1.5, 0.3], [2, 0]]
+    gj = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": line}}]}
+    out = simplify_geojson(gj, 0.01, 5)["features"][0]["geometry"]["coordinates"]
+    assert out == [[0, 0], [1, 0], [1.5, 0.3], [2, 0]]
+
+
+BOX = (0.0, 0.0, 1.0, 1.0)
+
+
+@pytest.mark.parametrize("ring, area", [
+    ([[0.2, 0.2], [0.8, 0.2], [0.8, 0.8], [0.2, 0.8]], 0.36),     # inteiro dentro
+    ([[-1, -1], [2, -1], [2, 2], [-1, 2]], 1.0),                   # envolve o retângulo
+    ([[0.5, -1], [2, -1], [2, 2], [0.5, 2]], 0.5),                 # corta uma aresta
+    ([[0, 0], [1, 0], [1, 1], [0, 1]], 1.0),                       # exatamente na borda
+    ([[0.5, 0.5], [1.5, 0.5], [1.5, 1.5], [0.5, 1.5]], 0.25),      # canto
+    ([[0.5, -0.3], [1.3, 0.5], [0.5, 1.3], [-0.3, 0.5]], 0.92),    # losango cortado nos quatro cantos
+])
+def test_clip_ring_area(ring, area):
+    out = clip_ring(np.array(ring, dtype=float), *BOX)
+    assert _ring_area(out) == pytest.approx(area)
+    assert (out >= -1e-12).all() and (out <= 1 + 1e-12).all()
+
+
+@pytest.mark.parametrize("ring", [
+    [[2, 2], [3, 2], [3, 3], [2, 3]],              # fora
+    [[1, 0.2], [2, 0.2], [2, 0.8], [1, 0.8]],      # encosta só na borda de fora
+])
+def test_clip_ring_outside_is_empty(ring):
+    out = clip_ring(np.array(ring, dtype=float), *BOX)
+    assert len(out) == 0 or _ring_area(out) == pytest.approx(0.0)
+
+
+def test_clip_ring_empty_input():
+    assert len(clip_ring(np.empty((0, 2)), *BOX)) == 0
+
+
+def test_clip_line_parts():
+    # Entra, sai pela direita, volta e sai por cima
+    line = np.array([[-0.5, 0.5], [1.5, 0.5], [1.5, 0.8], [0.5, 0.8], [0.5, 1.5]])
+    parts = clip_line(line, *BOX)
+    assert [p.tolist() for p in parts] == [[[0.0, 0.5], [1.0, 0.5]], [[1.0, 0.8], [0.5, 0.8], [0.5, 1.0]]]
+
+
+def test_clip_line_inside_outside_and_degenerate():
+    inside = np.array([[0.1, 0.1], [0.5, 0.9], [0.9, 0.1]])
+    parts = clip_line(inside, *BOX)
+    assert len(parts) == 1 and np.allclose(parts[0], inside)
+    assert clip_line(np.array([[2, 2], [3, 3]]), *BOX) == []
+    assert clip_line(np.array([[0.5, 0.5]]), *BOX) == []
+    # Segmento paralelo à borda, fora do retângulo
+    assert clip_line(np.array([[-1, 2], [2, 2]]), *BOX) == []
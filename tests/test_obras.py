@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from obras import (COORD_VARIANTS, format_brl, ingest_obras, on_uniques, parse_br_date, parse_br_number,
+                   parse_decimal, read_csv_bytes)
+
+# Pontos dentro de Milhã (lat, lon)
+LAT = [-5.67, -5.70, -5.75]
+LON = [-39.19, -39.25, -39.10]
+
+
+def _raw(**coords):
+    return pd.DataFrame({"Obra": ["A", "B", "C"], "Status": ["CONCLUÍDA", "CADASTRADO", "CONCLUÍDA"],
+                         "Valor": ["R$ 1.000,00", "2.500", "R$ 3,5"], **coords})
+
+
+@pytest.mark.parametrize("coords", [
+    {"Latitude": LAT, "Longitude": LON},
+    {"lat": [str(v).replace(".", ",") for v in LAT], "lon": LON},
+    {"Y": LAT, "X": LON},
+    {"Coordenadas": [f"{a}, {b}" for a, b in zip(LAT, LON)]},
+])
+def test_ingest_obras_coordinate_columns(coords):
+    df, cols = ingest_obras(_raw(**coords))
+    assert cols["coords"] in COORD_VARIANTS
+    np.testing.assert_allclose(df["__LAT__"], LAT)
+    np.testing.assert_allclose(df["__LON__"], LON)
+
+
+def test_ingest_obras_fixes_swapped_coordinates():
+    df, cols = ingest_obras(_raw(Latitude=LON, Longitude=LAT))
+    assert cols["coords"] == "swap"
+    np.testing.assert_allclose(df["__LAT__"], LAT)
+
+
+def test_ingest_obras_reuses_variant_for_new_rows():
+    # Linhas avulsas (recarga incremental) seguem a variante do cadastro já ingerido
+    _, cols = ingest_obras(_raw(Y=LON, X=LAT))
+    df, again = ingest_obras(_raw(Y=LON, X=LAT).iloc[:1], cols["coords"])
+    assert again["coords"] == cols["coords"] == "swap"
+    np.testing.assert_allclose(df["__LAT__"], LAT[:1])
+
+
+def test_ingest_obras_without_coordinates():
+    df, cols = ingest_obras(_raw())
+    assert cols["lat"] is None and "__LAT__" not in df
+
+
+def test_ingest_obras_values():
+    df, _ = ingest_obras(_raw(Latitude=LAT, Longitude=LON))
+    assert df["__VALOR__"].tolist() == [1000.0, 2500.0, 3.5]
+
+
+@pytest.mark.parametrize("text, value", [
+    ("R$ 3.549.250,74", 3549250.74),
+    ("1.816.525", 1816525.0),
+    ("2198371", 2198371.0),
+    ("3,5", 3.5),
+    (" R$ 12,00 ", 12.0),
+    ("1234.5", 1234.5),
+    ("-", np.nan),
+    (None, np.nan),
+])
+def test_parse_br_number(text, value):
+    out = parse_br_number(pd.Series([text, "10"], dtype=object))
+    np.testing.assert_equal(out.iloc[0], value)
+    assert out.dtype == float
+
+
+def test_parse_br_number_numeric_passthrough():
+    assert parse_br_number(pd.Series([1, 2])).tolist() == [1.0, 2.0]
+
+
+def test_parse_decimal():
+    out = parse_decimal(pd.Series(["-5,67", "-39.19", "lat -5,7 aprox", "", None]))
+    np.testing.assert_equal(out.to_numpy(), [-5.67, -39.19, -5.7, np.nan, np.nan])
+
+
+def test_parse_br_date():
+    out = parse_br_date(pd.Series(["03/02/2024", "2023-11-30", "31/12/22", "sem data", None]))
+    assert out.iloc[0] == pd.Timestamp(2024, 2, 3)
+    assert out.iloc[1] == pd.Timestamp(2023, 11, 30)
+    assert out.iloc[2] == pd.Timestamp(2022, 12, 31)
+    assert out.iloc[3:].isna().all()
+
+
+def test_format_brl():
+    out = format_brl(pd.Series(["3549250,74", "1.816.525", "a definir", "3549250,74"]))
+    assert out.tolist() == ["R$ 3.549.250,74", "R$ 1.816.525,00", "a definir", "R$ 3.549.250,74"]
+
+
+def test_on_uniques_spreads_result():
+    calls = []
+
+    def fn(v):
+        calls.append(len(v))
+        return v.str.upper()
+
+    s = pd.Series(["a", "b", "a", None, "b"], dtype=object)
+    out = on_uniques(s, fn)
+    assert calls == [3]
+    assert out.tolist()[:3] == ["A", "B", "A"] and pd.isna(out.iloc[3]) and out.iloc[4] == "B"
+
+
+@pytest.mark.parametrize("data", [
+    "Obra;Valor\nA;1.000,50\nB;2,5\n".encode("utf-8-sig"),
+    "Obra,Valor\nA,\"1.000,50\"\nB,\"2,5\"\n".encode(),
+    "Obra;Valor\r\nA;1.000,50\r\nB;2,5\r\n".encode(),
+])
+def test_read_csv_bytes_sniffs_separator(data):
+    df = read_csv_bytes(data)
+    assert df.columns.tolist() == ["Obra", "Valor"]
+    assert parse_br_number(df["Valor"]).tolist() == [1000.5, 2.5]
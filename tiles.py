@@ -0,0 +1,422 @@
+# =====================================================
+# Tiles vetoriais (Mapbox Vector Tile) das camadas GeoJSON de `dados/`
+# =====================================================
+import argparse
+import gzip
+import json
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from camadas import (
+    DATA_DIR_CANDIDATES, DISTRICT_FILE, DistrictJoin, LayerStore, data_files, data_version,
+)
+from geometria import (
+    SIMPLIFY_LEVELS, GridIndex, clip_line, clip_ring, feature_bboxes, positions_array, simplify_geojson,
+    union_bbox,
+)
+from mapas import level_for_zoom
+
+EXTENT = 4096        # resolução interna de cada tile
+BUFFER = 64          # margem (em unidades do tile) para não cortar traços na borda
+MAX_ZOOM = 16        # acima disso o cliente amplia os tiles do zoom 16
+TILE_CACHE_MB = int(os.environ.get("ATLAS_TILE_CACHE_MB", "64"))
+
+
+# =====================================================
+# Codificação protobuf (vector_tile.proto v2)
+# =====================================================
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _field(num: int, wire: int, payload: bytes) -> bytes:
+    if wire == 2:
+        return _varint(num << 3 | 2) + _varint(len(payload)) + payload
+    return _varint(num << 3 | wire) + payload
+
+
+def _packed(num: int, values) -> bytes:
+    return _field(num, 2, b"".join(_varint(int(v)) for v in values))
+
+
+def _zigzag(a: np.ndarray) -> np.ndarray:
+    a = np.asarray(a, dtype=np.int64)
+    return (a << 1) ^ (a >> 63)
+
+
+def _value(v) -> bytes:
+    if isinstance(v, bool):
+        return _field(7, 0, _varint(int(v)))
+    if isinstance(v, int):
+        return _field(6, 0, _varint(int(_zigzag(v))))
+    if isinstance(v, float):
+        return _field(3, 1, struct.pack("<d", v))
+    return _field(1, 2, str(v).encode("utf-8"))
+
+
+def _commands(paths, closed: bool) -> list:
+    """MoveTo/LineTo(/ClosePath) com deltas zigzag; o cursor continua entre as partes."""
+    cmds = []
+    cursor = np.zeros((1, 2), dtype=np.int64)
+    for p in paths:
+        zz = _zigzag(np.diff(np.vstack([cursor, p]), axis=0))
+        cmds.append(1 | (1 << 3))
+        cmds.extend(zz[0].tolist())
+        if len(p) > 1:
+            cmds.append(2 | ((len(p) - 1) << 3))
+            cmds.extend(zz[1:].ravel().tolist())
+        if closed:
+            cmds.append(7 | (1 << 3))
+        cursor = p[-1:]
+    return cmds
+
+
+def encode_layer(name: str, features) -> bytes:
+    """Uma camada MVT a partir de [(tipo, comandos, propriedades)] (tipo: 1 ponto, 2 linha, 3 polígono)."""
+    keys, values = {}, {}
+    body = bytearray()
+    for geom_type, cmds, props in features:
+        tags = []
+        for k, v in props.items():
+            if v is None:
+                continue
+            if isinstance(v, (list, dict)):
+                v = json.dumps(v, ensure_ascii=False)
+            tags.append(keys.setdefault(k, len(keys)))
+            vkey = (type(v).__name__, v)
+            tags.append(values.setdefault(vkey, len(values)))
+        feat = _packed(2, tags) + _field(3, 0, _varint(geom_type)) + _packed(4, cmds)
+        body += _field(2, 2, feat)
+    layer = _field(15, 0, _varint(2)) + _field(1, 2, name.encode("utf-8")) + bytes(body)
+    layer += b"".join(_field(3, 2, k.encode("utf-8")) for k in keys)
+    layer += b"".join(_field(4, 2, _value(v)) for _, v in values)
+    layer += _field(5, 0, _varint(EXTENT))
+    return _field(3, 2, layer)
+
+
+# =====================================================
+# Projeção e recorte por tile
+# =====================================================
+def tile_lonlat_bbox(z: int, x: int, y: int, margin: float = 0.0):
+    """(minx, miny, maxx, maxy) em graus do tile z/x/y, com `margin` em fração do tile."""
+    n = 2 ** z
+    def lon(tx):
+        return tx / n * 360.0 - 180.0
+    def lat(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+    return lon(x - margin), lat(y + 1 + margin), lon(x + 1 + margin), lat(y - margin)
+
+
+def tiles_covering(bbox, z: int):
+    """Índices (x, y) dos tiles do zoom `z` que cobrem `bbox` (minx, miny, maxx, maxy)."""
+    n = 2 ** z
+    def tx(lon):
+        return min(n - 1, max(0, int((lon + 180.0) / 360.0 * n)))
+    def ty(lat):
+        lat = math.radians(max(-85.0511, min(85.0511, lat)))
+        return min(n - 1, max(0, int((1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2 * n)))
+    minx, miny, maxx, maxy = bbox
+    for x in range(tx(minx), tx(maxx) + 1):
+        for y in range(ty(maxy), ty(miny) + 1):
+            yield x, y
+
+
+def _project(coords, z: int, x: int, y: int) -> np.ndarray:
+    xy = positions_array(coords)
+    n = 2 ** z
+    lat = np.radians(np.clip(xy[:, 1], -85.0511, 85.0511))
+    px = ((xy[:, 0] + 180.0) / 360.0 * n - x) * EXTENT
+    py = ((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * n - y) * EXTENT
+    return np.column_stack([px, py])
+
+
+def _dedupe(q: np.ndarray) -> np.ndarray:
+    if len(q) < 2:
+        return q
+    return q[np.r_[True, np.any(np.diff(q, axis=0) != 0, axis=1)]]
+
+
+def _ring(coords, z, x, y, exterior: bool):
+    p = _project(coords, z, x, y)
+    if len(p) > 1 and (p[0] == p[-1]).all():
+        p = p[:-1]
+    p = clip_ring(p, -BUFFER, -BUFFER, EXTENT + BUFFER, EXTENT + BUFFER)
+    q = _dedupe(np.round(p).astype(np.int64))
+    if len(q) > 1 and (q[0] == q[-1]).all():
+        q = q[:-1]
+    if len(q) < 3:
+        return None
+    # MVT: anel externo com área positiva (eixo y para baixo), buracos negativa
+    area = np.sum(q[:, 0] * np.roll(q[:, 1], -1) - np.roll(q[:, 0], -1) * q[:, 1])
+    if area == 0:
+        return None
+    return q if (area > 0) == exterior else q[::-1]
+
+
+def encode_geometry(geom, z: int, x: int, y: int):
+    """(tipo MVT, comandos) da geometria recortada ao tile, ou None se nada sobrar."""
+    t = geom.get("type") if geom else None
+    c = geom.get("coordinates") if geom else None
+    lo, hi = -BUFFER, EXTENT + BUFFER
+    if t in ("Point", "MultiPoint"):
+        q = np.round(_project([c] if t == "Point" else c, z, x, y)).astype(np.int64)
+        q = q[((q >= 0) & (q < EXTENT)).all(axis=1)]
+        if not len(q):
+            return None
+        d = _zigzag(np.diff(np.vstack([[0, 0], q]), axis=0))
+        return 1, [1 | (len(q) << 3), *d.ravel().tolist()]
+    if t in ("LineString", "MultiLineString"):
+        parts = []
+        for line in ([c] if t == "LineString" else c):
+            for part in clip_line(_project(line, z, x, y), lo, lo, hi, hi):
+                q = _dedupe(np.round(part).astype(np.int64))
+                if len(q) >= 2:
+                    parts.append(q)
+        return (2, _commands(parts, closed=False)) if parts else None
+    if t in ("Polygon", "MultiPolygon"):
+        rings = []
+        for poly in ([c] if t == "Polygon" else c):
+            ext = _ring(poly[0], z, x, y, exterior=True) if poly else None
+            if ext is None:
+                continue
+            rings.append(ext)
+            for hole in poly[1:]:
+                h = _ring(hole, z, x, y, exterior=False)
+                if h is not None:
+                    rings.append(h)
+        return (3, _commands(rings, closed=True)) if rings else None
+    return None
+
+
+# =====================================================
+# Conjunto de tiles com cache
+# =====================================================
+class TileSet:
+    """Tiles MVT das camadas GeoJSON (lon/lat) de `dados/`, gerados sob demanda.
+
+    Cada camada é simplificada no nível adequado ao zoom (geometria.SIMPLIFY_LEVELS)
+    e indexada por bbox uma vez por versão dos dados; os tiles prontos ficam num LRU.
+    """
+
+    def __init__(self, dir_candidates=DATA_DIR_CANDIDATES, store: LayerStore = None,
+                 budget_mb: int = TILE_CACHE_MB, max_prepared: int = 32):
+        self.dir_candidates = dir_candidates
+        self.store = store or LayerStore()
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.max_prepared = max_prepared
+        self._prepared = OrderedDict()
+        self._joins = {}
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def layers(self) -> dict:
+        """Nome da camada (arquivo sem extensão) -> caminho do GeoJSON."""
+        return {
+            os.path.splitext(name)[0]: path
+            for name, path in data_files(self.dir_candidates).items()
+            if name.lower().endswith(".geojson")
+        }
+
+    def _district_join(self, version: str, files: dict):
+        if version not in self._joins and DISTRICT_FILE in files:
+            self._joins = {version: DistrictJoin(self.store.get(files[DISTRICT_FILE]))}
+        return self._joins.get(version)
+
+    def _prepare(self, version: str, name: str, level: str, fields, distrito: str):
+        key = (version, name, level, fields, distrito)
+        with self._lock:
+            if key in self._prepared:
+                self._prepared.move_to_end(key)
+                return self._prepared[key]
+        files = data_files(self.dir_candidates)
+        fname = name + ".geojson"
+        gj = self.store.get(files[fname])
+        features = gj.get("features", [])
+        if distrito:
+            if fname == DISTRICT_FILE:
+                features = [f for f in features if (f.get("properties") or {}).get("CD_DIST") == distrito]
+            else:
+                join = self._district_join(version, files)
+                if join is not None:
+                    keep = (join.tag_features(features)["CD_DIST"] == distrito).to_numpy()
+                    features = [f for f, k in zip(features, keep) if k]
+        tolerance, precision = SIMPLIFY_LEVELS[level]
+        simplified = simplify_geojson(
+            {"type": "FeatureCollection", "features": features}, tolerance, precision,
+            list(fields) if fields is not None else None,
+        )
+        feats = simplified["features"]
+        prepared = (feats, GridIndex(feature_bboxes(feats)))
+        with self._lock:
+            self._prepared[key] = prepared
+            while len(self._prepared) > self.max_prepared:
+                self._prepared.popitem(last=False)
+        return prepared
+
+    def tile(self, name: str, z: int, x: int, y: int, fields=None, distrito: str = "") -> bytes:
+        """Bytes do tile (vazio se nenhuma feição o toca). `fields=None` mantém todos os atributos."""
+        layers = self.layers()
+        if name not in layers:
+            raise KeyError(name)
+        version = data_version(data_files(self.dir_candidates))
+        fields = tuple(fields) if fields is not None else None
+        key = (version, name, z, x, y, fields, distrito)
+        with self._lock:
+            data = self._tiles.get(key)
+            if data is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return data
+        feats, index = self._prepare(version, name, level_for_zoom(z), fields, distrito)
+        encoded = []
+        for i in index.query_bbox(tile_lonlat_bbox(z, x, y, BUFFER / EXTENT)):
+            geom = encode_geometry(feats[i].get("geometry"), z, x, y)
+            if geom is not None:
+                encoded.append((geom[0], geom[1], feats[i].get("properties") or {}))
+        data = encode_layer(name, encoded) if encoded else b""
+        with self._lock:
+            self.misses += 1
+            self._tiles[key] = data
+            total = sum(len(d) for d in self._tiles.values())
+            while total > self.budget_bytes and len(self._tiles) > 1:
+                _, old = self._tiles.popitem(last=False)
+                total -= len(old)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tiles": len(self._tiles),
+                "bytes": sum(len(d) for d in self._tiles.values()),
+                "budget_bytes": self.budget_bytes,
+                "prepared_layers": len(self._prepared),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# =====================================================
+# Servidor HTTP: /<camada>/<z>/<x>/<y>.pbf[?fields=a,b&distrito=CD_DIST]
+# =====================================================
+class TileRequestHandler(BaseHTTPRequestHandler):
+    tileset: TileSet = None
+
+    def _send(self, status: int, body: bytes, content_type: str, gzip_ok: bool = False):
+        if gzip_ok and body:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=300")
+        if gzip_ok and body:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split("/") if p]
+        if not parts:
+            index = {"layers": sorted(self.tileset.layers()), "max_zoom": MAX_ZOOM, "stats": self.tileset.stats()}
+            return self._send(200, json.dumps(index).encode("utf-8"), "application/json")
+        try:
+            name, z, x, y = parts[0], int(parts[1]), int(parts[2]), int(parts[3].removesuffix(".pbf"))
+            if len(parts) != 4 or not parts[3].endswith(".pbf") or not (0 <= z <= MAX_ZOOM):
+                raise ValueError
+            if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+                raise ValueError
+        except (ValueError, IndexError):
+            return self._send(400, b"tile invalido", "text/plain")
+        query = parse_qs(url.query)
+        fields = query["fields"][0].split(",") if query.get("fields") else None
+        distrito = query.get("distrito", [""])[0]
+        try:
+            data = self.tileset.tile(name, z, x, y, fields=fields, distrito=distrito)
+        except KeyError:
+            return self._send(404, b"camada inexistente", "text/plain")
+        gzip_ok = "gzip" in self.headers.get("Accept-Encoding", "")
+        self._send(200, data, "application/vnd.mapbox-vector-tile", gzip_ok)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port: int, host: str = "127.0.0.1", tileset: TileSet = None) -> ThreadingHTTPServer:
+    handler = type("Handler", (TileRequestHandler,), {"tileset": tileset or TileSet()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_background(port: int, host: str = "127.0.0.1", tileset: TileSet = None) -> ThreadingHTTPServer:
+    """Sobe o servidor numa thread daemon (usado pelo app com ATLAS_TILES_PORT)."""
+    server = make_server(port, host, tileset)
+    threading.Thread(target=server.serve_forever, name="atlas-tiles", daemon=True).start()
+    return server
+
+
+def export_tiles(out_dir: str, names=None, min_zoom: int = 8, max_zoom: int = 14, tileset: TileSet = None) -> int:
+    """Grava <out_dir>/<camada>/<z>/<x>/<y>.pbf para servir como arquivos estáticos."""
+    tileset = tileset or TileSet()
+    layers = tileset.layers()
+    written = 0
+    for name in names or sorted(layers):
+        bbox = union_bbox(feature_bboxes(tileset.store.get(layers[name]).get("features", [])))
+        if bbox is None:
+            continue
+        for z in range(min_zoom, max_zoom + 1):
+            for x, y in tiles_covering(bbox, z):
+                data = tileset.tile(name, z, x, y)
+                if not data:
+                    continue
+                path = os.path.join(out_dir, name, str(z), str(x), f"{y}.pbf")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+                written += 1
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiles vetoriais (MVT) das camadas de dados/ do ATLAS.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_serve = sub.add_parser("serve", help="servidor local de tiles sob demanda")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=8765)
+    p_export = sub.add_parser("export", help="pré-gera os tiles em disco")
+    p_export.add_argument("out_dir")
+    p_export.add_argument("layers", nargs="*", help="camadas (arquivo sem .geojson); padrão: todas")
+    p_export.add_argument("--min-zoom", type=int, default=8)
+    p_export.add_argument("--max-zoom", type=int, default=14)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "serve":
+        server = make_server(args.port, args.host)
+        print(f"Tiles em http://{args.host}:{args.port}/<camada>/{{z}}/{{x}}/{{y}}.pbf")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    else:
+        n = export_tiles(args.out_dir, args.layers or None, args.min_zoom, args.max_zoom)
+        print(f"{n} tile(s) gravado(s) em {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()